@@ -106,6 +106,8 @@ admin.site.register(Campaign,CampaignAdmin)
 admin.site.register(AdsCreatives,AdsCreativesAdmin)
 admin.site.register(AudienceSegment)
 admin.site.register(OptimizationLog)
+admin.site.register(TargetingEntity)
 admin.site.register(PromptLog)
+admin.site.register(AgentJob)
 admin.site.register(Lead,LeadAdmin)
 
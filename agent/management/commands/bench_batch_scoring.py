@@ -0,0 +1,72 @@
+import time
+from unittest import mock
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from agent.tools.optimization import batch_scoring
+
+
+def _random_columns(rows: int, seed: int) -> dict:
+    """Metric snapshots spread across every rule threshold."""
+    rng = np.random.default_rng(seed)
+    return {
+        "ctr": rng.uniform(0, 3.5, rows).round(2),
+        "purchase_roas": np.where(rng.random(rows) < 0.2, 0, rng.uniform(0, 7, rows).round(2)),
+        "cpc": rng.uniform(0.1, 3, rows).round(2),
+        "spend": rng.uniform(0, 60, rows).round(2),
+        "purchases": np.where(rng.random(rows) < 0.3, 0, rng.integers(0, 12, rows)),
+        "frequency": rng.uniform(0.8, 4.5, rows).round(2),
+        "impressions": rng.integers(100, 20000, rows),
+        "clicks": rng.integers(0, 400, rows),
+        "days_running": rng.integers(1, 14, rows),
+        # As attached by the fetcher, so the scalar path doesn't look up local history per row
+        "ctr_trend_pct": rng.uniform(-50, 30, rows).round(1),
+    }
+
+
+class Command(BaseCommand):
+    help = ("Benchmark: scalar analyze_campaign_metrics + decide_campaign_action vs the vectorized batch_scoring "
+            "engine over random metric snapshots, with a row-for-row parity check.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000, help="Metric snapshots to score")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        from agent.tools import alert_outbox
+        from agent.tools.optimization import decision_maker, metrics_analyzer
+
+        rows = options["rows"]
+        columns = _random_columns(rows, options["seed"])
+        as_python = {column: values.tolist() for column, values in columns.items()}
+        metrics_list = [{"meta_campaign_id": f"bench-{i}", **{column: values[i] for column, values in as_python.items()}}
+                        for i in range(rows)]
+
+        # Alerts and the (unused) Campaign lookup are side effects, not scoring; keep them out of the timing
+        with mock.patch.object(alert_outbox, "queue_alert"), \
+                mock.patch.object(metrics_analyzer.agent_models.Campaign.objects, "get", side_effect=Exception):
+            start = time.perf_counter()
+            analyses = [metrics_analyzer.analyze_campaign_metrics.func(metrics) for metrics in metrics_list]
+            decisions = [decision_maker.decide_campaign_action.func(metrics, analysis)
+                         for metrics, analysis in zip(metrics_list, analyses)]
+            scalar = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scores = batch_scoring.score_metrics(columns)
+        batch_scoring.decide_actions(columns, scores)
+        columnar = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch_analyses = batch_scoring.analyze_metrics_batch(metrics_list)
+        batch_decisions = batch_scoring.decide_actions_batch(metrics_list, batch_analyses)
+        records = time.perf_counter() - start
+
+        mismatches = sum(expected != actual for expected, actual in zip(analyses, batch_analyses))
+        mismatches += sum(expected != actual for expected, actual in zip(decisions, batch_decisions))
+
+        self.stdout.write(f"{rows:,} metric snapshots")
+        self.stdout.write(f"  scalar (one dict at a time)  : {scalar:8.3f}s")
+        self.stdout.write(f"  batch, columnar arrays       : {columnar:8.3f}s ({scalar / columnar:,.0f}x)")
+        self.stdout.write(f"  batch, same dicts as scalar  : {records:8.3f}s ({scalar / records:,.1f}x)")
+        self.stdout.write(f"  rows differing from scalar   : {mismatches}")
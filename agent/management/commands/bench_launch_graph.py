@@ -0,0 +1,81 @@
+import time
+import uuid
+from contextlib import ExitStack
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+
+from agent import models as agent_models
+from agent.tools.agent_jobs import graph_events
+
+
+# Latency (seconds) given to each launch tool, roughly what the LLM and Meta calls take
+TOOL_LATENCY = {
+    "fetch_product": 0.05,
+    "analyze_product_audience": 0.6,
+    "create_campaign_from_analysis": 0.3,
+    "generate_product_adcopy_and_headline_cta": 0.6,
+    "resolve_audience_targeting": 0.4,
+    "prepare_ad_creative": 0.05,
+    "create_campaign_on_meta": 0.3,
+    "ads_set_meta": 0.3,
+    "create_ad_creative": 0.5,
+    "create_ad": 0.3,
+}
+
+TOOL_RESULTS = {
+    "fetch_product": {"title": "Bench Product", "description": '{"audience": "small businesses"}'},
+    "analyze_product_audience": {"product_id": "bench"},
+    "create_campaign_from_analysis": {"campaign_id": "bench"},
+    "generate_product_adcopy_and_headline_cta": {"headline": "Bench"},
+    "resolve_audience_targeting": {"interests": [], "behaviors": []},
+    "prepare_ad_creative": ({"name": "Creative for Bench"}, "Bench"),
+    "create_campaign_on_meta": {"meta_campaign_id": "bench"},
+    "ads_set_meta": "bench-adset",
+    "create_ad_creative": ("bench-creative", "Bench"),
+    "create_ad": {"id": "bench-ad"},
+}
+
+
+def _slow_tool(name, scale):
+    def tool(*args, **kwargs):
+        time.sleep(TOOL_LATENCY[name] * scale)
+        return TOOL_RESULTS[name]
+    return tool
+
+
+class Command(BaseCommand):
+    help = ("Benchmark: runs the launch graph with sleeping stand-ins for the LLM/Meta tools and prints "
+            "the per-node timing trace, the wall time (critical path) and the time if run one node at a time.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for every tool latency")
+
+    def handle(self, *args, **options):
+        from agent.tools import langgraph
+
+        thread_id = f"bench-{uuid.uuid4().hex}"
+        result = None
+        with ExitStack() as stack:
+            for name in TOOL_LATENCY:
+                stack.enter_context(mock.patch.object(langgraph, name, _slow_tool(name, options["scale"])))
+            initial_state = {"user_input": "launch campaign for Bench Product", "detected_intent": "launch_campaign",
+                             "product_name": "Bench Product", "budget": 10.0}
+            for event in graph_events(initial_state, thread_id=thread_id):
+                if event["event"] == "result":
+                    result = event
+
+        # The run's checkpoints are of no use once measured
+        agent_models.AgentCheckpointWrite.objects.filter(thread_id=thread_id).delete()
+        agent_models.AgentCheckpoint.objects.filter(thread_id=thread_id).delete()
+
+        if result["error"]:
+            self.stderr.write(f"Launch stopped early: {result['error']}")
+        trace = result["timings"]
+        self.stdout.write(f"{'node':<26}{'start':>10}{'ms':>10}")
+        for node in trace["nodes"]:
+            self.stdout.write(f"{node['node']:<26}{node['offset_ms']:>10.1f}{node['ms']:>10.1f}")
+        self.stdout.write(f"  wall time (critical path) : {trace['wall_ms']:.0f} ms")
+        self.stdout.write(f"  one node at a time        : {trace['sequential_ms']:.0f} ms")
+        saved = trace["sequential_ms"] - trace["wall_ms"]
+        self.stdout.write(f"  saved by parallel branches: {saved:.0f} ms ({saved / trace['sequential_ms']:.0%})")
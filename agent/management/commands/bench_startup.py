@@ -0,0 +1,84 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Runs in a fresh interpreter so nothing is already imported
+PROBE = """
+import importlib, json, os, sys, time
+import django
+
+def rss_mb():
+    # Current resident set size; ru_maxrss would include the parent's high-water mark after fork
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+django.setup()
+rss_before = rss_mb()
+modules_before = len(sys.modules)
+start = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - start
+rss_after = rss_mb()
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss_after, "rss_delta_mb": rss_after - rss_before,
+                  "modules": len(sys.modules) - modules_before}}))
+"""
+
+# Before tools were loaded lazily, importing the graph imported every tool module up front
+EAGER_TOOLS = (
+    "from agent.tools.registry import TOOL_MODULES\n"
+    "for tool_module in sorted(set(TOOL_MODULES.values())): importlib.import_module(tool_module)"
+)
+
+
+class Command(BaseCommand):
+    # System checks load the URLconf (and with it agent.views) in this process; not needed here
+    requires_system_checks = []
+    help = ("Benchmark: wall time, RSS and modules loaded by importing agent.views (or --module) in a fresh "
+            "process, as loaded now (tools on first call) and with every graph tool module imported eagerly "
+            "as before. Baseline when tools moved to the registry: 6.22s / +253 MB / +3869 modules eager, "
+            "3.04s / +85 MB / +2244 lazy.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--module", default="agent.views", help="Module to import")
+        parser.add_argument("--runs", type=int, default=3, help="Fresh processes to time")
+
+    def _measure(self, imports, runs):
+        """Median of the probe's measurements over fresh processes, or None if the import failed."""
+        env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+        results = []
+        for _ in range(runs):
+            proc = subprocess.run(
+                [sys.executable, "-c", PROBE.format(imports=imports)],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                self.stderr.write(proc.stderr)
+                return None
+            # Modules may print while importing; the measurement is the last line
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        return {key: statistics.median(result[key] for result in results) for key in results[0]}
+
+    def handle(self, *args, **options):
+        lazy_imports = f"import {options['module']}"
+        rows = {"lazy tools": self._measure(lazy_imports, options["runs"]),
+                "eager tools": self._measure(f"{lazy_imports}\n{EAGER_TOOLS}", options["runs"])}
+        if None in rows.values():
+            return
+
+        self.stdout.write(f"import {options['module']} ({options['runs']} fresh processes, median)")
+        for label, row in rows.items():
+            self.stdout.write(f"  {label:<12}: {row['seconds']:.2f}s, {row['rss_mb']:.0f} MB RSS "
+                              f"(+{row['rss_delta_mb']:.0f} MB from the import), +{row['modules']:.0f} modules")
+        lazy, eager = rows["lazy tools"], rows["eager tools"]
+        self.stdout.write(f"  saved       : {eager['seconds'] - lazy['seconds']:.2f}s, "
+                          f"{eager['rss_delta_mb'] - lazy['rss_delta_mb']:.0f} MB, "
+                          f"{eager['modules'] - lazy['modules']:.0f} modules")
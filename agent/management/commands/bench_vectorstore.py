@@ -0,0 +1,62 @@
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from agent.tools.vector_store import get_vectorstore, invalidate_vectorstores
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark: cold (reopen per lookup) vs warm (shared handle) product lookups on a local fixture collection."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=500, help="Fixture documents to index")
+        parser.add_argument("--lookups", type=int, default=50, help="Lookups to time per mode")
+
+    def handle(self, *args, **options):
+        # Fake embeddings keep the benchmark offline and measure only the store overhead
+        embeddings = DeterministicFakeEmbedding(size=256)
+        docs = [
+            Document(
+                page_content=f"Name: Fixture Product {i}\nDescription: Prompt pack number {i}",
+                metadata={"name": f"Fixture Product {i}", "product_id": f"fx{i:05d}"},
+            )
+            for i in range(options["products"])
+        ]
+        queries = [f"Fixture Product {i % options['products']}" for i in range(options["lookups"])]
+
+        with tempfile.TemporaryDirectory() as persist_dir:
+            Chroma.from_documents(docs, embedding=embeddings, persist_directory=persist_dir)
+
+            # Cold: what fetch_product_by_name used to do on every call
+            cold = []
+            for query in queries:
+                start = time.perf_counter()
+                vectorstore = Chroma(persist_directory=persist_dir, embedding_function=embeddings)
+                vectorstore.similarity_search(query, k=1)
+                cold.append(time.perf_counter() - start)
+
+            # Warm: one shared handle from the registry
+            invalidate_vectorstores(persist_dir)
+            warm = []
+            for query in queries:
+                start = time.perf_counter()
+                get_vectorstore(persist_dir, embeddings).similarity_search(query, k=1)
+                warm.append(time.perf_counter() - start)
+            invalidate_vectorstores(persist_dir)
+
+        self._report("cold", cold)
+        self._report("warm", warm)
+        speedup = statistics.median(cold) / max(statistics.median(warm), 1e-9)
+        self.stdout.write(self.style.SUCCESS(f"✅ Median speedup: {speedup:.1f}x"))
+
+    def _report(self, label, samples):
+        ms = sorted(s * 1000 for s in samples)
+        p95 = ms[int(len(ms) * 0.95) - 1] if len(ms) > 1 else ms[0]
+        self.stdout.write(
+            f"{label:>5}: first={samples[0] * 1000:.2f}ms median={statistics.median(ms):.2f}ms p95={p95:.2f}ms"
+        )
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from agent.tools.product_import import import_products, read_products
+
+
+class Command(BaseCommand):
+    help = ("Bulk-import products from a CSV (with a header row) or JSONL file. List columns (features, useCases, "
+            "benefits, tags) take a JSON array or 'a|b|c'.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSONL file")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Default: from the file extension")
+        parser.add_argument("--embed", action="store_true",
+                            help="Embed the imported products into the vector DB before exiting")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        # A background embedding thread would die with the command, so embedding runs here when asked
+        result = import_products(read_products(options["path"], options["format"]), embed=False)
+        elapsed = time.perf_counter() - start
+
+        for error in result["errors"]:
+            self.stderr.write(f"⚠️ Row {error['row']} skipped: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Imported {result['created']} products ({result['tags_created']} new tags) in {elapsed:.2f}s"
+        ))
+
+        if options["embed"] and result["product_ids"]:
+            from agent.tools.rag_setup import sync_product_embeddings
+
+            synced = sync_product_embeddings(result["product_ids"])
+            self.stdout.write(self.style.SUCCESS(f"✅ Embedded {synced['embedded']} chunks"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from agent.tools.agent_jobs import AGENT_CHECKPOINT_RETENTION_DAYS
+from agent.tools.checkpointer import prune_checkpoints
+
+
+class Command(BaseCommand):
+    help = ("Deletes LangGraph checkpoints of agent runs idle for longer than the retention period; those "
+            "runs can no longer be resumed. Finished runs also prune hourly; use it from cron when the "
+            "agent is idle.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=AGENT_CHECKPOINT_RETENTION_DAYS,
+                            help=f"Keep runs with a checkpoint newer than this (default {AGENT_CHECKPOINT_RETENTION_DAYS})")
+
+    def handle(self, *args, **options):
+        removed = prune_checkpoints(options["days"])
+        self.stdout.write(f"🧹 Checkpoints of {removed} agent runs older than {options['days']} days deleted")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from agent.tools.history_digest import rebuild_history_digests
+
+
+class Command(BaseCommand):
+    help = ("Recompute product history digests from stored campaigns and optimization logs. Digests stay current "
+            "on their own once built; run this once to backfill, or to pick up a changed HISTORY_* setting.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("product_ids", nargs="*", type=int, help="Product primary keys (default: every product)")
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_history_digests(options["product_ids"] or None)
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt {rebuilt} product history digests"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from agent.tools.optimization.metric_history import rollup_metrics
+
+
+class Command(BaseCommand):
+    help = ("Rolls completed hours of campaign metric snapshots into hourly and daily rollups and prunes "
+            "history past its retention. Also runs after every metrics collection; use it from cron when "
+            "collection is paused.")
+
+    def handle(self, *args, **options):
+        result = rollup_metrics()
+        self.stdout.write(f"📈 {result['hourly']} hourly and {result['daily']} daily rollups written, "
+                          f"{result['pruned']} expired rows pruned")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from agent.tools.rag_setup import sync_product_embeddings, EMBED_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Incrementally sync product chunks into the product vector DB (only new or changed chunks are embedded)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("product_ids", nargs="*", type=int, help="Product primary keys to sync (default: whole catalog)")
+        parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks per embedding call")
+
+    def handle(self, *args, **options):
+        result = sync_product_embeddings(options["product_ids"] or None, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Embedded {result['embedded']}, deleted {result['deleted']}, unchanged {result['unchanged']}"
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from agent.tools.targeting_cache import warm_targeting_cache
+
+
+class Command(BaseCommand):
+    help = "Seed the interest/behavior ID cache from the targeting of previously launched ad sets."
+
+    def handle(self, *args, **options):
+        stored = warm_targeting_cache()
+        self.stdout.write(self.style.SUCCESS(f"✅ Cached {stored} targeting entries"))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:08
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agent', '0042_lead_address'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TargetingEntity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('interest', 'Interest'), ('behavior', 'Behavior')], max_length=20)),
+                ('normalized_name', models.CharField(max_length=255)),
+                ('name', models.CharField(max_length=255)),
+                ('meta_id', models.CharField(blank=True, max_length=50, null=True)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'unique_together': {('kind', 'normalized_name')},
+            },
+        ),
+    ]
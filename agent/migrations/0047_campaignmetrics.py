@@ -0,0 +1,58 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agent', '0046_alertoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignMetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('period_start', models.DateTimeField()),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('impressions', models.PositiveIntegerField(default=0)),
+                ('reach', models.PositiveIntegerField(default=0)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('purchases', models.PositiveIntegerField(default=0)),
+                ('spend', models.FloatField(default=0.0)),
+                ('frequency', models.FloatField(default=0.0)),
+                ('frequency_max', models.FloatField(default=0.0)),
+                ('ctr', models.FloatField(default=0.0)),
+                ('cpc', models.FloatField(default=0.0)),
+                ('purchase_roas', models.FloatField(default=0.0)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metric_rollups', to='agent.campaign')),
+            ],
+            options={
+                'unique_together': {('campaign', 'period', 'period_start')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CampaignMetricSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('impressions', models.PositiveIntegerField(default=0)),
+                ('reach', models.PositiveIntegerField(default=0)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('purchases', models.PositiveIntegerField(default=0)),
+                ('spend', models.FloatField(default=0.0)),
+                ('frequency', models.FloatField(default=0.0)),
+                ('ctr', models.FloatField(default=0.0)),
+                ('cpc', models.FloatField(default=0.0)),
+                ('purchase_roas', models.FloatField(default=0.0)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metric_snapshots', to='agent.campaign')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['campaign', 'fetched_at'], name='agent_campa_campaig_b5ad4a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agent', '0047_campaignmetrics'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='campaign',
+            name='meta_campaign_id',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='campaign',
+            index=models.Index(fields=['status', '-created_at'], name='agent_campa_status_72e8ac_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='optimizationlog',
+            index=models.Index(fields=['product', '-timestamp'], name='agent_optim_product_3ffcdf_idx'),
+        ),
+    ]
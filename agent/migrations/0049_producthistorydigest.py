@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agent', '0048_campaign_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductHistoryDigest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('top_campaigns', models.JSONField(blank=True, default=list)),
+                ('recent_actions', models.JSONField(blank=True, default=list)),
+                ('campaign_totals', models.JSONField(blank=True, default=dict)),
+                ('impressions', models.PositiveIntegerField(default=0)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('purchases', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='history_digest', to='agent.product')),
+            ],
+        ),
+    ]
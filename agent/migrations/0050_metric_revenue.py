@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:59
+
+from django.db import migrations, models
+
+
+def backfill_revenue(apps, schema_editor):
+    for model_name in ("CampaignMetricSnapshot", "CampaignMetricRollup"):
+        model = apps.get_model("agent", model_name)
+        model.objects.update(revenue=models.F("spend") * models.F("purchase_roas"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agent', '0049_producthistorydigest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaignmetricrollup',
+            name='revenue',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='campaignmetricsnapshot',
+            name='revenue',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(backfill_revenue, migrations.RunPython.noop),
+    ]
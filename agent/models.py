@@ -95,7 +95,7 @@ class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
 
-    name = models.CharField(max_length=500)
+    name = models.CharField(max_length=500, db_index=True)  # exact-match tier of product_resolver
     slug = models.SlugField(unique=True, null=True, blank=True)
     product_id = ShortUUIDField(unique=True, length=7, max_length=20)
 
@@ -212,7 +212,7 @@ class Campaign(models.Model):
 
     # 🆔 ID & timestamps
     campaign_id = ShortUUIDField(unique=True, length=7, max_length=20)
-    meta_campaign_id = models.CharField(max_length=50,null=True,blank=True)
+    meta_campaign_id = models.CharField(max_length=50,null=True,blank=True, db_index=True)
     meta_creative_id = models.CharField(max_length=50,null=True,blank=True)
     meta_ad_id = models.CharField(max_length=50,null=True,blank=True)
     meta_adset_id = models.CharField(max_length=50,null=True,blank=True)
@@ -221,6 +221,8 @@ class Campaign(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        # filter(status="active") in its default order, for the optimization passes
+        indexes = [models.Index(fields=["status", "-created_at"])]
 
     def __str__(self):
         return f"{self.product.name} - {self.platform} Campaign"
@@ -269,10 +271,50 @@ class OptimizationLog(models.Model):
     notes = models.TextField(blank=True, null=True)
     metrics_snapshot = models.JSONField(default=dict, blank=True)
 
+    class Meta:
+        # A product's optimization history, newest first
+        indexes = [models.Index(fields=["product", "-timestamp"])]
+
     def __str__(self):
         return f"Optimization for {self.campaign} - {self.action}"
 
 
+class ProductHistoryDigest(models.Model):
+    """Compact campaign history of a product for launch prompts, kept current by agent.tools.history_digest."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name="history_digest")
+    top_campaigns = models.JSONField(default=list, blank=True)  # best ROAS first
+    recent_actions = models.JSONField(default=list, blank=True)  # newest first
+    # Latest [impressions, clicks, purchases] per campaign pk, summed into the fields below
+    campaign_totals = models.JSONField(default=dict, blank=True)
+    impressions = models.PositiveIntegerField(default=0)
+    clicks = models.PositiveIntegerField(default=0)
+    purchases = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"History digest for {self.product}"
+
+
+class TargetingEntity(models.Model):
+    """Cached Meta targeting name -> ID mapping (interests, behaviors). meta_id is empty when Meta had no match."""
+    KIND_CHOICES = [
+        ("interest", "Interest"),
+        ("behavior", "Behavior"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    normalized_name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255)
+    meta_id = models.CharField(max_length=50, null=True, blank=True)
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ("kind", "normalized_name")
+
+    def __str__(self):
+        return f"{self.kind}: {self.name} ({self.meta_id or 'no match'})"
+
+
 
 
 #BACKDOOR
@@ -339,6 +381,178 @@ class PromptLog(models.Model):
         return f"{self.response} - {self.date}"
 
 
+JOB_STATUS_CHOICES = [
+    ("queued", "Queued"),
+    ("running", "Running"),
+    ("succeeded", "Succeeded"),
+    ("failed", "Failed"),
+]
+
+
+class AgentJob(models.Model):
+    """One background run of the Genesis agent graph."""
+    job_id = ShortUUIDField(unique=True, length=10, max_length=20)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    initial_state = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=JOB_STATUS_CHOICES, default="queued")
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Job {self.job_id} ({self.status})"
+
+
+class AgentJobStep(models.Model):
+    """State keys a graph node changed during an AgentJob, saved as the node finishes."""
+    job = models.ForeignKey(AgentJob, on_delete=models.CASCADE, related_name="steps")
+    node = models.CharField(max_length=100)
+    output = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.job.job_id} - {self.node}"
+
+
+class AgentCheckpoint(models.Model):
+    """LangGraph checkpoint of one agent run (thread), saved after every graph step; see agent.tools.checkpointer."""
+    thread_id = models.CharField(max_length=100)
+    checkpoint_ns = models.CharField(max_length=255, default="", blank=True)
+    checkpoint_id = models.CharField(max_length=100)
+    parent_checkpoint_id = models.CharField(max_length=100, null=True, blank=True)
+    checkpoint_type = models.CharField(max_length=50)
+    checkpoint = models.BinaryField()
+    metadata_type = models.CharField(max_length=50)
+    metadata = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("thread_id", "checkpoint_ns", "checkpoint_id")
+
+    def __str__(self):
+        return f"{self.thread_id} @ {self.checkpoint_id}"
+
+
+class AgentCheckpointWrite(models.Model):
+    """Pending channel write from a node task, stored against the checkpoint it builds on."""
+    thread_id = models.CharField(max_length=100)
+    checkpoint_ns = models.CharField(max_length=255, default="", blank=True)
+    checkpoint_id = models.CharField(max_length=100)
+    task_id = models.CharField(max_length=100)
+    idx = models.IntegerField()
+    channel = models.CharField(max_length=255)
+    value_type = models.CharField(max_length=50)
+    value = models.BinaryField()
+
+    class Meta:
+        unique_together = ("thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx")
+
+    def __str__(self):
+        return f"{self.thread_id} @ {self.checkpoint_id}: {self.channel}"
+
+
+ALERT_STATUS_CHOICES = [
+    ("queued", "Queued"),
+    ("sending", "Sending"),
+    ("sent", "Sent"),
+    ("failed", "Failed"),
+]
+
+
+class AlertOutbox(models.Model):
+    """Alert email waiting to be sent; agent.tools.alert_outbox mails each run's alerts as one digest."""
+    run_id = models.CharField(max_length=100, blank=True, default="", db_index=True)
+    subject = models.CharField(max_length=255)
+    html_message = models.TextField(blank=True, default="")
+    status = models.CharField(max_length=20, choices=ALERT_STATUS_CHOICES, default="queued", db_index=True)
+    error = models.TextField(blank=True, null=True)
+    # Dispatch that is sending the alert, and since when; a claim left by a crashed process expires
+    claimed_by = models.CharField(max_length=32, blank=True, default="", db_index=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.subject} ({self.status})"
+
+
+class AlertRun(models.Model):
+    """An alert_run() block; its alerts are held until finished_at is set, whichever process dispatches them."""
+    run_id = models.CharField(max_length=100, unique=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.run_id} ({'finished' if self.finished_at else 'open'})"
+
+
+class CampaignMetricSnapshot(models.Model):
+    """
+    One fetch of a campaign's Meta insights (today's totals so far), appended on every fetch.
+    Summarized into CampaignMetricRollup and pruned by agent.tools.optimization.metric_history.
+    """
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name="metric_snapshots")
+    fetched_at = models.DateTimeField(default=timezone.now)
+    impressions = models.PositiveIntegerField(default=0)
+    reach = models.PositiveIntegerField(default=0)
+    clicks = models.PositiveIntegerField(default=0)
+    purchases = models.PositiveIntegerField(default=0)
+    spend = models.FloatField(default=0.0)
+    revenue = models.FloatField(default=0.0)  # spend × purchase_roas at fetch time
+    frequency = models.FloatField(default=0.0)
+    ctr = models.FloatField(default=0.0)
+    cpc = models.FloatField(default=0.0)
+    purchase_roas = models.FloatField(default=0.0)
+
+    class Meta:
+        indexes = [models.Index(fields=["campaign", "fetched_at"])]
+
+    def __str__(self):
+        return f"{self.campaign_id} @ {self.fetched_at}"
+
+
+METRIC_ROLLUP_PERIODS = [
+    ("hour", "Hour"),
+    ("day", "Day"),
+]
+
+
+class CampaignMetricRollup(models.Model):
+    """Hourly or daily summary of CampaignMetricSnapshot rows: rates averaged over the samples, totals at their peak."""
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name="metric_rollups")
+    period = models.CharField(max_length=10, choices=METRIC_ROLLUP_PERIODS)
+    period_start = models.DateTimeField()
+    samples = models.PositiveIntegerField(default=0)
+    impressions = models.PositiveIntegerField(default=0)
+    reach = models.PositiveIntegerField(default=0)
+    clicks = models.PositiveIntegerField(default=0)
+    purchases = models.PositiveIntegerField(default=0)
+    spend = models.FloatField(default=0.0)
+    revenue = models.FloatField(default=0.0)  # spend × purchase_roas at fetch time
+    frequency = models.FloatField(default=0.0)
+    frequency_max = models.FloatField(default=0.0)
+    ctr = models.FloatField(default=0.0)
+    cpc = models.FloatField(default=0.0)
+    purchase_roas = models.FloatField(default=0.0)
+
+    class Meta:
+        unique_together = ("campaign", "period", "period_start")
+
+    def __str__(self):
+        return f"{self.campaign_id} {self.period} @ {self.period_start}"
+
+
 class EmailWarmupLog(models.Model):
     date = models.DateField(auto_now_add=True)
     sender_email = models.EmailField()
@@ -0,0 +1,64 @@
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from agent.models import OptimizationLog, Product
+
+
+def _run_in_background(func, *args):
+    # Embedding calls hit the network, so keep them off the saving request
+    threading.Thread(target=func, args=args, daemon=True).start()
+
+
+def _sync_products(product_ids):
+    from agent.tools.rag_setup import sync_product_embeddings
+    try:
+        sync_product_embeddings(product_ids)
+    except Exception as e:
+        print(f"⚠️ Product embedding sync failed for {product_ids}: {e}")
+
+
+def _delete_products(product_ids):
+    from agent.tools.rag_setup import delete_product_embeddings
+    try:
+        delete_product_embeddings(product_ids)
+    except Exception as e:
+        print(f"⚠️ Product embedding delete failed for {product_ids}: {e}")
+
+
+def enqueue_product_embeddings(product_ids):
+    """Embeds the products in one background sync once the current transaction commits."""
+    product_ids = list(product_ids)
+    if product_ids:
+        transaction.on_commit(lambda: _run_in_background(_sync_products, product_ids))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_product_name_index(sender, **kwargs):
+    from agent.tools.product_resolver import invalidate_product_index
+    invalidate_product_index()
+
+
+@receiver(post_save, sender=Product)
+def sync_product_embedding(sender, instance, raw=False, **kwargs):
+    if raw or not settings.PRODUCT_EMBEDDING_AUTOSYNC:
+        return
+    enqueue_product_embeddings([instance.id])
+
+
+@receiver(post_delete, sender=Product)
+def delete_product_embedding(sender, instance, **kwargs):
+    if not settings.PRODUCT_EMBEDDING_AUTOSYNC:
+        return
+    product_ids = [instance.id]
+    transaction.on_commit(lambda: _run_in_background(_delete_products, product_ids))
+
+
+@receiver(post_save, sender=OptimizationLog)
+def add_action_to_history_digest(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        from agent.tools.history_digest import record_optimization_log
+        record_optimization_log(instance)
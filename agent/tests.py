@@ -1,3 +1,1647 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.core import mail
+from django.db import connection
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+from agent import models as agent_models
+from agent.tools import (
+    agent_jobs, alert_outbox, embedding_cache, intent_router, llm_cache, llm_provider, meta_client, registry,
+    targeting_cache,
+)
+
+
+def setUpModule():
+    # Response and embedding caches opened during the suite go to a temp dir instead of the checkout's data/cache
+    directory = tempfile.TemporaryDirectory()
+    unittest.addModuleCleanup(directory.cleanup)
+    for patcher in (mock.patch.object(llm_cache, "LLM_CACHE_PATH", f"{directory.name}/llm_cache.sqlite3"),
+                    mock.patch.object(embedding_cache, "EMBEDDING_CACHE_PATH", f"{directory.name}/embedding_cache.sqlite3")):
+        patcher.start()
+        unittest.addModuleCleanup(patcher.stop)
+
+
+class _StubGraphHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for graph.facebook.com: the batch endpoint and paged account insights."""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload, content_type="application/json"):
+        body = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _flaky(self):
+        """/flaky/<n>/...: fails with 503 n times per path, then succeeds."""
+        calls = self.server.calls
+        calls[self.path] = calls.get(self.path, 0) + 1
+        failures = int(self.path.split("/")[2])
+        if calls[self.path] <= failures:
+            return self._send(503, {"error": {"message": "Service unavailable", "code": 2}})
+        self._send(200, {"success": True})
+
+    def do_POST(self):
+        if self.path.startswith("/flaky"):
+            return self._flaky()
+        if self.path.startswith("/throttled"):
+            calls = self.server.calls
+            calls[self.path] = calls.get(self.path, 0) + 1
+            if calls[self.path] == 1:
+                return self._send(400, {"error": {"message": "User request limit reached", "code": 17}})
+            return self._send(200, {"success": True})
+        form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+        if form["access_token"][0] == "bad-token":
+            return self._send(400, {"error": {"message": "Invalid OAuth access token.", "code": 190}})
+        if form["access_token"][0] == "proxy-error":
+            return self._send(502, "<html><body>502 Bad Gateway</body></html>", content_type="text/html")
+        if form["access_token"][0] == "empty-body":
+            return self._send(200, "")
+
+        operations = json.loads(form["batch"][0])
+        self.server.batch_sizes.append(len(operations))
+        items = []
+        for operation in operations:
+            url = operation["relative_url"]
+            if url.startswith("missing"):
+                items.append({"code": 400, "body": json.dumps({"error": {"message": "Unknown object", "code": 100}})})
+            elif url.startswith("timeout"):
+                items.append(None)
+            else:
+                items.append({"code": 200, "body": json.dumps({"id": url.split("?")[0], "method": operation["method"]})})
+        self._send(200, items)
+
+    def do_GET(self):
+        if self.path.startswith("/flaky"):
+            return self._flaky()
+        query = parse_qs(urlparse(self.path).query)
+        page = int(query.get("page", ["0"])[0])
+        if page == 0:
+            ids = [rule["value"] for rule in json.loads(query["filtering"][0])][0]
+            if any(campaign_id.startswith("fail") for campaign_id in ids):
+                return self._send(400, {"error": {"message": "Invalid campaign id", "code": 100}})
+            if any(campaign_id.startswith("proxy") for campaign_id in ids):
+                return self._send(502, "<html><body>502 Bad Gateway</body></html>", content_type="text/html")
+            # Every id but the last on the first page, the last one on the next
+            next_url = f"http://127.0.0.1:{self.server.server_port}{urlparse(self.path).path}?page=1&last={ids[-1]}"
+            return self._send(200, {"data": [{"campaign_id": campaign_id, "spend": "1.00", "impressions": "100"}
+                                             for campaign_id in ids[:-1]], "paging": {"next": next_url}})
+        self._send(200, {"data": [{"campaign_id": query["last"][0], "spend": "2.00", "impressions": "100"}]})
+
+
+class StubGraphTestCase(SimpleTestCase):
+    """Runs a _StubGraphHandler server and points meta_client at it."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubGraphHandler)
+        cls.server.batch_sizes = []
+        cls.server.calls = {}
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = mock.patch.object(meta_client, "BASE_URL", f"http://127.0.0.1:{cls.server.server_port}")
+        cls.base_url.start()
+        cls.backoff = mock.patch.object(meta_client, "META_BACKOFF_BASE", 0.001)
+        cls.backoff.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.base_url.stop()
+        cls.backoff.stop()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.batch_sizes.clear()
+        self.server.calls.clear()
+
+
+class MetaBatchTests(StubGraphTestCase):
+    def test_results_are_demultiplexed_in_order(self):
+        results = meta_client.batch_request([
+            {"method": "GET", "relative_url": "111"},
+            {"method": "GET", "relative_url": "missing"},
+            {"method": "POST", "relative_url": "222", "body": {"status": "PAUSED"}},
+            {"method": "GET", "relative_url": "timeout"},
+        ], access_token="token")
+
+        self.assertEqual(results[0], {"id": "111", "method": "GET"})
+        self.assertEqual(results[1]["error"]["code"], 100)
+        self.assertEqual(results[1]["error"]["status"], 400)
+        self.assertEqual(results[2], {"id": "222", "method": "POST"})
+        self.assertIn("not processed", results[3]["error"]["message"])
+
+    def test_operations_are_split_into_batches_of_fifty(self):
+        batch = meta_client.MetaBatch("token")
+        for i in range(120):
+            batch.get(str(i), {"fields": "id"})
+        results = batch.execute()
+
+        self.assertEqual(self.server.batch_sizes, [50, 50, 20])
+        self.assertEqual([result["id"] for result in results], [str(i) for i in range(120)])
+
+    def test_rejected_batch_maps_error_to_every_operation(self):
+        results = meta_client.batch_request(
+            [{"method": "GET", "relative_url": "1"}, {"method": "GET", "relative_url": "2"}],
+            access_token="bad-token",
+        )
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(result["error"]["code"] == 190 for result in results))
+
+    def test_undecodable_response_maps_error_to_every_operation(self):
+        operations = [{"method": "POST", "relative_url": "1"}, {"method": "POST", "relative_url": "2"}]
+        for token, status in (("proxy-error", 502), ("empty-body", 200)):
+            results = meta_client.batch_request(operations, access_token=token)
+            self.assertEqual(len(results), 2)
+            self.assertTrue(all(result["error"]["status"] == status for result in results))
+            self.assertIn("Undecodable Graph response", results[0]["error"]["message"])
+
+        with self.assertRaisesRegex(meta_client.requests.HTTPError, "Undecodable Graph response"):
+            meta_client.fetch_account_insights(["spend"], ["proxy1"], ad_account_id="123")
+
+    def test_account_insights_follow_pagination(self):
+        responses = []
+        rows = meta_client.fetch_account_insights(
+            ["spend"], ["c1", "c2"], ad_account_id="123", on_response=responses.append
+        )
+        self.assertEqual(set(rows), {"c1", "c2"})
+        self.assertEqual(rows["c2"]["spend"], "2.00")
+        self.assertEqual(len(responses), 2)
+
+
+class MetaClientTests(StubGraphTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = meta_client.MetaClient(max_retries=3)
+        self.url = meta_client.BASE_URL
+
+    def test_get_is_retried_until_it_succeeds(self):
+        resp = self.client.get(f"{self.url}/flaky/2/123")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.server.calls["/flaky/2/123"], 3)
+
+    def test_gives_up_after_max_retries(self):
+        resp = self.client.get(f"{self.url}/flaky/9/123")
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(self.server.calls["/flaky/9/123"], 4)
+
+    def test_non_idempotent_post_is_not_retried_on_server_error(self):
+        self.assertEqual(self.client.post(f"{self.url}/flaky/1/act_1/campaigns").status_code, 503)
+        self.assertEqual(self.server.calls["/flaky/1/act_1/campaigns"], 1)
+        self.assertEqual(self.client.post(f"{self.url}/flaky/1/456", idempotent=True).status_code, 200)
+
+    def test_throttled_post_is_retried(self):
+        self.assertEqual(self.client.post(f"{self.url}/throttled/act_1/ads").status_code, 200)
+        self.assertEqual(self.server.calls["/throttled/act_1/ads"], 2)
+
+    def test_latency_is_tracked_per_endpoint(self):
+        self.client.get(f"{self.url}/flaky/1/111")
+        self.client.get(f"{self.url}/flaky/0/222")
+        stats = self.client.latency_stats()["GET /flaky/{id}/{id}"]
+        self.assertEqual((stats["calls"], stats["errors"], stats["retries"]), (3, 1, 1))
+        self.assertGreater(stats["avg_ms"], 0)
+
+    def test_usage_headers_are_parsed(self):
+        usage, regain = meta_client._account_usage({
+            "X-Business-Use-Case-Usage": json.dumps({"123": [{"call_count": 92, "total_cputime": 10,
+                                                              "total_time": 10, "estimated_time_to_regain_access": 2}]})
+        })
+        self.assertEqual((usage, regain), (92.0, 120))
+
+    def test_object_calls_are_throttled_by_their_ad_account(self):
+        url = meta_client.BASE_URL
+        self.assertEqual(self.client._throttle_key(f"{url}/act_123/insights", None), ("123", None))
+        batch = {"batch": json.dumps([{"relative_url": "act_5/campaigns"}, {"relative_url": "act_5/adsets"}])}
+        self.assertEqual(self.client._throttle_key(f"{url}/", batch)[0], "5")
+        self.assertEqual(self.client._throttle_key(f"{url}/search", None), ("app", None))
+        self.assertEqual(self.client._throttle_key(f"{url}/23850/insights", None), ("object:23850", "23850"))
+
+        # Meta reports which account an object's calls count against; later calls queue behind that account
+        self.client._record_usage("object:23850", "23850", {"X-Business-Use-Case-Usage": json.dumps(
+            {"777": [{"call_count": 95, "total_cputime": 1, "total_time": 1, "estimated_time_to_regain_access": 0}]}
+        )})
+        self.assertEqual(self.client._throttle_key(f"{url}/23850/insights", None), ("777", "23850"))
+        self.assertGreater(self.client.limiter._wait("777"), 0)
+        self.assertLessEqual(self.client.limiter._wait("123"), 0)
+
+    def test_paused_account_waits_without_holding_a_slot(self):
+        limiter = meta_client.AccountRateLimiter(max_concurrent=1)
+        limiter._resume_at["123"] = time.monotonic() + 0.3
+        entered = threading.Event()
+
+        def call():
+            with limiter.slot("123"):
+                entered.set()
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        time.sleep(0.1)
+        # The paused caller sleeps outside the semaphore
+        self.assertTrue(limiter._semaphore("123").acquire(blocking=False))
+        limiter._semaphore("123").release()
+        self.assertFalse(entered.is_set())
+        thread.join()
+        self.assertTrue(entered.is_set())
+
+
+class CollectCampaignMetricsTests(StubGraphTestCase, TestCase):
+    def test_failed_chunk_is_reported_and_the_rest_written(self):
+        from agent.tools.optimization import metric_fetcher
+
+        product = agent_models.Product.objects.create(name="Flyer Prompt Pack")
+        ids = ["m0", "m1", "fail2", "m3", "m4"]
+        agent_models.Campaign.objects.bulk_create(
+            agent_models.Campaign(product=product, platform="meta", status="active", meta_campaign_id=meta_campaign_id)
+            for meta_campaign_id in ids
+        )
+
+        # Chunks of two: [m0, m1], [fail2, m3] (rejected by Graph), [m4]
+        with mock.patch.object(metric_fetcher, "INSIGHTS_CAMPAIGNS_PER_QUERY", 2):
+            collected = metric_fetcher.collect_campaign_metrics(
+                agent_models.Campaign.objects.filter(status="active").order_by("id")
+            )
+
+        self.assertEqual(sorted(metrics["meta_campaign_id"] for metrics in collected["metrics"]), ["m0", "m1", "m4"])
+        self.assertEqual(set(collected["errors"]), {"fail2", "m3"})
+        self.assertIn("Invalid campaign id", collected["errors"]["m3"])
+        written = dict(agent_models.Campaign.objects.values_list("meta_campaign_id", "result_metrics"))
+        self.assertEqual({meta_campaign_id: metrics.get("spend") for meta_campaign_id, metrics in written.items()},
+                         {"m0": 1.0, "m1": 2.0, "fail2": None, "m3": None, "m4": 2.0})
+        self.assertEqual(agent_models.CampaignMetricSnapshot.objects.count(), 3)
+
+
+class _CountingEmbeddings(Embeddings):
+    """DeterministicFakeEmbedding that records every text it is asked to embed."""
+
+    def __init__(self):
+        self.fake = DeterministicFakeEmbedding(size=8)
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded += texts
+        return self.fake.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.fake.embed_query(text)
+
+
+class EmbeddingSyncTests(TestCase):
+    def setUp(self):
+        from langchain_chroma import Chroma
+        from agent.tools import rag_setup
+
+        self.embeddings = _CountingEmbeddings()
+        self.products = Chroma(collection_name=f"products-{uuid.uuid4().hex}", embedding_function=self.embeddings)
+        self.campaigns = Chroma(collection_name=f"campaigns-{uuid.uuid4().hex}", embedding_function=self.embeddings)
+        for name, vectorstore in (("get_product_vectorstore", self.products),
+                                  ("get_campaign_vectorstore", self.campaigns)):
+            patcher = mock.patch.object(rag_setup, name, return_value=vectorstore)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+            self.addCleanup(vectorstore.delete_collection)
+
+    def sync(self, product_ids=None):
+        from agent.tools.rag_setup import sync_product_embeddings
+
+        self.embeddings.embedded = []
+        return sync_product_embeddings(product_ids)
+
+    def test_rerun_embeds_nothing(self):
+        agent_models.Product.objects.create(name="Flyer Prompt Pack", description="Prompts for flyers")
+        agent_models.Product.objects.create(name="Logo Prompt Pack", description="Prompts for logos")
+        self.assertEqual(self.sync(), {"embedded": 2, "deleted": 0, "unchanged": 0})
+        self.assertEqual(self.sync(), {"embedded": 0, "deleted": 0, "unchanged": 2})
+        self.assertEqual(self.embeddings.embedded, [])
+
+    def test_changed_product_reembeds_only_its_chunks(self):
+        flyers = agent_models.Product.objects.create(name="Flyer Prompt Pack", description="Prompts for flyers")
+        logos = agent_models.Product.objects.create(name="Logo Prompt Pack", description="Prompts for logos")
+        self.sync()
+
+        logos.description = "Prompts for logos and icons"
+        logos.save()
+        self.assertEqual(self.sync(), {"embedded": 1, "deleted": 0, "unchanged": 1})
+        self.assertEqual(len(self.embeddings.embedded), 1)
+        self.assertIn("logos and icons", self.embeddings.embedded[0])
+        self.assertEqual(self.sync([flyers.id])["embedded"], 0)
+
+    def test_shrunk_product_deletes_stale_chunks(self):
+        product = agent_models.Product.objects.create(
+            name="Flyer Prompt Pack", description=" ".join(f"flyer-prompt-{i}" for i in range(400))
+        )
+        chunks = self.sync()["embedded"]
+        self.assertGreater(chunks, 1)
+
+        product.description = "Prompts for flyers"
+        product.save()
+        self.assertEqual(self.sync([product.id]), {"embedded": 1, "deleted": chunks - 1, "unchanged": 0})
+        self.assertEqual(self.products.get()["ids"], [f"{product.id}_0"])
+
+    def test_campaigns_are_upserted_only_when_updated(self):
+        from agent.tools.rag_setup import embed_campaign
+
+        product = agent_models.Product.objects.create(name="Flyer Prompt Pack")
+        meta = agent_models.Campaign.objects.create(product=product, platform="meta", headline="Flyers in minutes")
+        agent_models.Campaign.objects.create(product=product, platform="tiktok", headline="Flyers for events")
+        embed_campaign()
+        self.assertEqual(len(self.embeddings.embedded), 2)
+
+        self.embeddings.embedded = []
+        embed_campaign()
+        self.assertEqual(self.embeddings.embedded, [])
+
+        meta.headline = "Flyers in seconds"
+        meta.save()
+        embed_campaign()
+        self.assertEqual(len(self.embeddings.embedded), 1)
+        self.assertIn("Flyers in seconds", self.embeddings.embedded[0])
+        self.assertEqual(len(self.campaigns.get()["ids"]), 2)
+
+        # Renaming the product leaves updated_at alone but changes both campaigns' documents
+        self.embeddings.embedded = []
+        product.name = "Poster Prompt Pack"
+        product.save()
+        embed_campaign()
+        self.assertEqual(len(self.embeddings.embedded), 2)
+        self.assertTrue(all("Campaign for: Poster Prompt Pack" in text for text in self.embeddings.embedded))
+
+
+class EmbeddingCacheTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from agent.tools.embedding_cache import CachedEmbeddings
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.api = _CountingEmbeddings()
+        self.embeddings = CachedEmbeddings(self.api, model="fake", cache_path=f"{directory.name}/embeddings.sqlite3")
+        self.addCleanup(self.embeddings._conn.close)
+
+    def test_warm_reindex_makes_no_embedding_calls(self):
+        from langchain_chroma import Chroma
+        from agent.tools import rag_setup
+
+        for i in range(5):
+            agent_models.Product.objects.create(name=f"Prompt Pack {i}", description=f"Prompts for job {i}")
+        # Index into one collection, then rebuild from scratch into another: every vector is already cached
+        for run in range(2):
+            vectorstore = Chroma(collection_name=f"reindex-{run}-{uuid.uuid4().hex}",
+                                 embedding_function=self.embeddings)
+            self.addCleanup(vectorstore.delete_collection)
+            with mock.patch.object(rag_setup, "get_product_vectorstore", return_value=vectorstore):
+                self.assertEqual(rag_setup.sync_product_embeddings()["embedded"], 5)
+            if run == 0:
+                self.assertEqual(len(self.api.embedded), 5)
+                self.api.embedded = []
+
+        self.assertEqual(self.api.embedded, [])
+        self.assertEqual({key: self.embeddings.stats()[key] for key in ("hits", "misses", "entries")},
+                         {"hits": 5, "misses": 5, "entries": 5})
+
+    def test_counters_are_exact_across_threads(self):
+        self.embeddings.embed_query("warm")
+
+        def query():
+            for _ in range(50):
+                self.embeddings.embed_query("warm")
+
+        threads = [threading.Thread(target=query) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((self.embeddings.hits, self.embeddings.misses), (400, 1))
+
+
+class ProductResolverTests(TestCase):
+    def setUp(self):
+        from agent.tools import product_resolver
+
+        product_resolver.invalidate_product_index()
+        self.addCleanup(product_resolver.invalidate_product_index)
+        self.flyers = agent_models.Product.objects.create(name="Flyer Prompt Pack")
+        self.logos = agent_models.Product.objects.create(name="Logo Design Toolkit")
+
+    def resolve(self, name, **kwargs):
+        from agent.tools.product_resolver import resolve_product
+
+        return resolve_product(name, **kwargs)
+
+    def test_exact_tier_matches_name_or_slug_on_an_index(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.resolve("Flyer Prompt Pack"), self.flyers)
+        self.assertEqual(self.resolve("flyer-prompt-pack"), self.flyers)
+        self.assertEqual(self.resolve("  logo design toolkit "), self.logos)
+        self.assertIn("USING INDEX", agent_models.Product.objects.filter(name="Flyer Prompt Pack").explain())
+
+    def test_fuzzy_tier_respects_the_threshold(self):
+        from agent.tools import product_resolver
+
+        self.assertEqual(self.resolve("Flyr Promt Pak", semantic=False), self.flyers)
+        self.assertIsNone(self.resolve("Quantum Toaster", semantic=False))
+        product, score = product_resolver._fuzzy_match("Flyr Promt Pak", threshold=0.95)
+        self.assertIsNone(product)
+        self.assertGreater(score, product_resolver.FUZZY_MATCH_THRESHOLD)
+
+    def test_semantic_tier_runs_only_after_both_misses(self):
+        from agent.tools import product_resolver
+
+        with mock.patch("agent.tools.fetch_product_by_name.fetch_product_by_name",
+                        return_value={"product_id": self.logos.product_id}) as search:
+            self.assertEqual(self.resolve("Flyer Prompt Pack"), self.flyers)
+            search.assert_not_called()
+            self.assertEqual(self.resolve("brand identity kit"), self.logos)
+            search.assert_called_once_with("brand identity kit")
+
+    def test_index_expires_for_products_saved_by_other_processes(self):
+        from agent.tools import product_resolver
+
+        self.assertIsNone(self.resolve("Webinar Slide Deck", semantic=False))
+        # bulk_create skips the signal, like a save in another worker
+        agent_models.Product.objects.bulk_create([agent_models.Product(name="Webinar Slides", slug="webinar-slides")])
+        self.assertIsNone(self.resolve("Webinar Slide Deck", semantic=False))
+
+        later = time.monotonic() + product_resolver.PRODUCT_INDEX_TTL_SECONDS
+        with mock.patch.object(product_resolver.time, "monotonic", return_value=later):
+            self.assertEqual(self.resolve("Webinar Slide Deck", semantic=False).name, "Webinar Slides")
+
+    def test_stats_count_every_resolve_across_threads(self):
+        from agent.tools import product_resolver
+
+        before = product_resolver.product_resolver_stats()
+        self.resolve("Flyer Prompt Pack")
+        threads = [threading.Thread(target=lambda: [product_resolver._record("miss") for _ in range(1000)])
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        after = product_resolver.product_resolver_stats()
+        self.assertEqual((after["exact"] - before["exact"], after["miss"] - before["miss"]), (1, 8000))
+
+
+class TargetingCacheTests(TestCase):
+    def search_result(self, name, meta_id):
+        return {"data": [{"id": meta_id, "name": name}]}
+
+    def test_misses_go_out_in_one_batch_and_are_cached(self):
+        with mock.patch.object(meta_client.MetaBatch, "execute", return_value=[
+            self.search_result("Yoga", "1"), {"data": []}, self.search_result("Frequent Travelers", "9"),
+        ]) as execute:
+            result = targeting_cache.resolve_targeting({"interest": ["Yoga", "Nonsense"], "behavior": ["frequent travelers"]})
+
+        self.assertEqual(execute.call_count, 1)
+        self.assertEqual(result, {"interest": [{"id": "1", "name": "Yoga"}], "behavior": [{"id": "9", "name": "Frequent Travelers"}]})
+        self.assertEqual(agent_models.TargetingEntity.objects.count(), 3)
+
+        # Cached hits, including the cached "no match", need no API call
+        with mock.patch.object(meta_client.MetaBatch, "execute") as execute:
+            result = targeting_cache.resolve_targeting({"interest": ["  YOGA ", "nonsense"]})
+        execute.assert_not_called()
+        self.assertEqual(result["interest"], [{"id": "1", "name": "Yoga"}])
+
+    def test_stale_entries_are_refreshed(self):
+        agent_models.TargetingEntity.objects.create(
+            kind="interest", normalized_name="yoga", name="Yoga", meta_id="old",
+            fetched_at=timezone.now() - timedelta(days=targeting_cache.TARGETING_CACHE_TTL_DAYS + 1),
+        )
+        with mock.patch.object(meta_client.MetaBatch, "execute", return_value=[self.search_result("Yoga", "new")]):
+            result = targeting_cache.resolve_targeting({"interest": ["Yoga"]})
+        self.assertEqual(result["interest"], [{"id": "new", "name": "Yoga"}])
+        self.assertEqual(agent_models.TargetingEntity.objects.get().meta_id, "new")
+
+    def test_failed_lookups_are_not_cached(self):
+        with mock.patch.object(meta_client.MetaBatch, "execute", return_value=[{"error": {"message": "boom"}}]):
+            self.assertEqual(targeting_cache.resolve_targeting({"interest": ["Yoga"]}), {"interest": []})
+        self.assertFalse(agent_models.TargetingEntity.objects.exists())
+
+    def test_keys_keep_accented_and_non_latin_names_apart(self):
+        names = ["Crème brûlée", "Creme", "ヨガ", "Йога", "瑜伽", "   ", "!!!"]
+        self.assertEqual([targeting_cache.normalize_targeting_name(name) for name in names],
+                         ["crème brûlée", "creme", "ヨガ", "йога", "瑜伽", "", "!!!"])
+        self.assertEqual(targeting_cache.normalize_targeting_name("  CRÈME\tBrûlée "), "crème brûlée")
+
+        with mock.patch.object(meta_client.MetaBatch, "execute", return_value=[
+            self.search_result(name, str(i)) for i, name in enumerate(["Crème brûlée", "ヨガ", "Йога", "瑜伽"])
+        ]) as execute:
+            result = targeting_cache.resolve_targeting({"interest": ["Crème brûlée", "ヨガ", "Йога", "瑜伽", "  "]})
+        self.assertEqual(len(execute.call_args_list), 1)
+        self.assertEqual([item["id"] for item in result["interest"]], ["0", "1", "2", "3"])
+        self.assertEqual(agent_models.TargetingEntity.objects.count(), 4)
+        self.assertFalse(agent_models.TargetingEntity.objects.filter(normalized_name="").exists())
+
+    def test_warm_from_previous_ad_sets(self):
+        campaign = mock.Mock(meta_adset_id="555")
+        with mock.patch.object(meta_client.MetaBatch, "execute", return_value=[{"targeting": {
+            "interests": [{"id": "1", "name": "Yoga"}], "behaviors": [{"id": "9", "name": "Frequent Travelers"}],
+        }}]):
+            self.assertEqual(targeting_cache.warm_targeting_cache([campaign]), 2)
+
+        with mock.patch.object(meta_client.MetaBatch, "execute") as execute:
+            result = targeting_cache.resolve_targeting({"interest": ["yoga"], "behavior": ["Frequent travelers"]})
+        execute.assert_not_called()
+        self.assertEqual(result["behavior"], [{"id": "9", "name": "Frequent Travelers"}])
+
+
+class _FakeGraph:
+    def __init__(self, updates, error=None):
+        self.updates, self.error = updates, error
+
+    def stream(self, state, config=None, stream_mode=("updates",)):
+        for update in self.updates:
+            mode = "messages" if isinstance(update, tuple) else "updates"
+            if mode in stream_mode:
+                yield mode, update
+        if self.error:
+            raise self.error
+
+    def get_state(self, config):
+        return mock.Mock(values={}, next=())
+
+
+class AgentJobTests(TestCase):
+    def run_job(self, graph, state=None):
+        job = agent_models.AgentJob.objects.create(initial_state=state or {"user_input": "Launch a campaign for X"})
+        with mock.patch.object(agent_jobs, "_get_executor", return_value=graph):
+            agent_jobs.run_agent_job(job.job_id)
+        job.refresh_from_db()
+        return job
+
+    def test_node_results_are_persisted_and_result_saved(self):
+        job = self.run_job(_FakeGraph([
+            {"intent_node": {"user_input": "Launch a campaign for X", "detected_intent": "launch_campaign"}},
+            {"fetch_product": {"user_input": "Launch a campaign for X", "detected_intent": "launch_campaign",
+                               "product_data": {"price": 10}, "result": "Done"}},
+        ]))
+        self.assertEqual(job.status, "succeeded")
+        self.assertEqual(job.result, "Done")
+        steps = list(job.steps.values_list("node", "output"))
+        self.assertEqual(steps, [
+            ("intent_node", {"detected_intent": "launch_campaign"}),
+            ("fetch_product", {"product_data": {"price": 10}, "result": "Done"}),
+        ])
+
+    def test_failed_run_keeps_completed_steps(self):
+        job = self.run_job(_FakeGraph([{"intent_node": {"detected_intent": "send_email"}}], error=RuntimeError("SMTP down")))
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "SMTP down")
+        self.assertEqual(job.steps.count(), 1)
+
+    def test_job_is_only_run_once(self):
+        job = self.run_job(_FakeGraph([{"intent_node": {"result": "ok"}}]))
+        with mock.patch.object(agent_jobs, "_get_executor") as executor:
+            agent_jobs.run_agent_job(job.job_id)
+        executor.assert_not_called()
+
+    def test_async_request_returns_job_and_status_reports_progress(self):
+        with mock.patch.object(agent_jobs, "_get_pool") as pool:
+            response = self.client.post(
+                "/api/genesis-agent/", data=json.dumps({"user_input": "Send outreach", "async": True}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job_id"]
+        pool.return_value.submit.assert_called_once_with(agent_jobs._work, job_id)
+
+        job = agent_models.AgentJob.objects.get(job_id=job_id)
+        first = agent_models.AgentJobStep.objects.create(job=job, node="intent_node", output={})
+        agent_models.AgentJobStep.objects.create(job=job, node="send_outreach", output={"result": "Sent"})
+
+        status = self.client.get(f"/api/genesis-agent/jobs/{job_id}/?after={first.id}").json()
+        self.assertEqual(status["status"], "queued")
+        self.assertEqual([step["node"] for step in status["steps"]], ["send_outreach"])
+        self.assertEqual(self.client.get("/api/genesis-agent/jobs/missing/").status_code, 404)
+
+    def checkpoint(self, thread_id, days_old):
+        row = agent_models.AgentCheckpoint.objects.create(
+            thread_id=thread_id, checkpoint_id=uuid.uuid4().hex, checkpoint_type="json", checkpoint=b"{}",
+            metadata_type="json", metadata=b"{}",
+        )
+        agent_models.AgentCheckpointWrite.objects.create(
+            thread_id=thread_id, checkpoint_id=row.checkpoint_id, task_id="t", idx=0, channel="result",
+            value_type="json", value=b"{}",
+        )
+        agent_models.AgentCheckpoint.objects.filter(pk=row.pk).update(created_at=timezone.now() - timedelta(days=days_old))
+
+    def threads(self):
+        return set(agent_models.AgentCheckpoint.objects.values_list("thread_id", flat=True)) | \
+            set(agent_models.AgentCheckpointWrite.objects.values_list("thread_id", flat=True))
+
+    def test_finished_runs_prune_expired_checkpoints_at_most_once_per_interval(self):
+        self.checkpoint("old-run", days_old=agent_jobs.AGENT_CHECKPOINT_RETENTION_DAYS + 1)
+        self.checkpoint("recent-run", days_old=1)
+        with mock.patch.object(agent_jobs, "_last_prune", None):
+            self.run_job(_FakeGraph([{"intent_node": {"result": "ok"}}]))
+            self.assertEqual(self.threads(), {"recent-run"})
+
+            self.checkpoint("another-old-run", days_old=agent_jobs.AGENT_CHECKPOINT_RETENTION_DAYS + 1)
+            self.run_job(_FakeGraph([{"intent_node": {"result": "ok"}}]))
+            self.assertEqual(self.threads(), {"recent-run", "another-old-run"})
+
+    def test_prune_command_removes_expired_runs(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        self.checkpoint("old-run", days_old=10)
+        self.checkpoint("recent-run", days_old=1)
+        out = StringIO()
+        call_command("prune_agent_checkpoints", "--days", "7", stdout=out)
+        self.assertEqual(self.threads(), {"recent-run"})
+        self.assertIn("1 agent runs", out.getvalue())
+
+
+class AgentStreamTests(TestCase):
+    def stream(self, graph, **extra):
+        # The pool runs each job inline, so the stream replays what the worker saved
+        pool = mock.Mock(submit=lambda work, job_id: agent_jobs.run_agent_job(job_id))
+        with mock.patch.object(agent_jobs, "_get_executor", return_value=graph), \
+                mock.patch.object(agent_jobs, "_get_pool", return_value=pool):
+            response = self.client.post(
+                "/api/genesis-agent/stream/" + extra.pop("query", ""),
+                data=json.dumps({"user_input": "Launch a campaign for X"}), content_type="application/json", **extra
+            )
+            return response, b"".join(response.streaming_content).decode()
+
+    def test_sse_emits_nodes_tokens_and_result(self):
+        token = (mock.Mock(content="Hel"), {"langgraph_node": "generate_adcopy"})
+        response, body = self.stream(_FakeGraph([
+            {"intent_node": {"detected_intent": "launch_campaign"}},
+            token,
+            {"generate_adcopy": {"detected_intent": "launch_campaign", "result": "Launched"}},
+        ]))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = [line.split(": ", 1)[1] for line in body.splitlines() if line.startswith("event: ")]
+        self.assertEqual(events, ["start", "token", "node", "node", "result"])
+        job = agent_models.AgentJob.objects.get()
+        self.assertEqual(job.status, "succeeded")
+        self.assertIn(f'data: {{"event": "result", "job_id": "{job.job_id}", "result": "Launched", "error": null}}', body)
+        self.assertEqual(agent_jobs._token_streams, {})
+
+    def test_jsonl_reports_errors(self):
+        response, body = self.stream(_FakeGraph([{"intent_node": {}}], error=RuntimeError("boom")), query="?format=jsonl")
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([line["event"] for line in lines], ["start", "node", "result"])
+        self.assertEqual((lines[-1]["result"], lines[-1]["error"]), (None, "boom"))
+        self.assertEqual(agent_models.AgentJob.objects.get().status, "failed")
+
+    def test_job_stream_follows_a_queued_job(self):
+        job = agent_models.AgentJob.objects.create(initial_state={"user_input": "Launch a campaign for X"})
+        agent_models.AgentJobStep.objects.create(job=job, node="intent_node", output={"detected_intent": "launch_campaign"})
+        follow = self.client.get(f"/api/genesis-agent/jobs/{job.job_id}/stream/?format=jsonl")
+        events = follow.streaming_content
+        self.assertEqual(json.loads(next(events))["node"], "intent_node")
+
+        # The worker finishing in the meantime ends the stream with its result
+        agent_models.AgentJobStep.objects.create(job=job, node="generate_adcopy", output={"result": "Launched"})
+        agent_models.AgentJob.objects.filter(pk=job.pk).update(status="succeeded", result="Launched")
+        lines = [json.loads(line) for line in events]
+        self.assertEqual([line["event"] for line in lines], ["node", "result"])
+        self.assertEqual(lines[-1]["result"], "Launched")
+        self.assertEqual(self.client.get("/api/genesis-agent/jobs/missing/stream/").status_code, 404)
+
+
+class IntentRouterTests(SimpleTestCase):
+    def test_structured_commands_map_without_llm(self):
+        self.assertEqual(intent_router.route_command("launch_campaign", {"input": "Flyer Prompt Pack"}),
+                         {"detected_intent": "launch_campaign", "product_name": "Flyer Prompt Pack"})
+        self.assertEqual(intent_router.route_command("instagram_scraping", {"input": "yoga coaches"}),
+                         {"detected_intent": "instagram_scrape", "niche": "yoga coaches"})
+        self.assertEqual(intent_router.route_command("warmup_emails", {}), {"detected_intent": "warmup_emails"})
+
+    def test_commands_missing_required_fields_fall_back(self):
+        self.assertIsNone(intent_router.route_command("publish_blog_post", {"input": "Marketing Toolkit"}))
+        self.assertEqual(
+            intent_router.route_command("publish_blog_post", {"input": "Marketing Toolkit", "topic": "email funnels"}),
+            {"detected_intent": "publish_blog_post", "product_name": "Marketing Toolkit", "topic": "email funnels"},
+        )
+        self.assertIsNone(intent_router.route_command("unknown", {"input": "x"}))
+
+    def test_keyword_rules(self):
+        cases = {
+            "Scrape Google Maps for yoga coaches in Atlanta": {"detected_intent": "google_scrape", "niche": "yoga coaches", "location": "Atlanta"},
+            "please send an email to a@b.com saying hello there": {"detected_intent": "send_email", "recipient_list": ["a@b.com"], "message": "hello there"},
+            "Send follow-up outreach to personal trainers": {"detected_intent": "followup_outreach", "niche": "personal trainers"},
+            "Check if SEO blog posts have been indexed by Google": {"detected_intent": "check_indexing_status"},
+            "Launch a campaign for Glow Serum": {"detected_intent": "launch_campaign", "product_name": "Glow Serum"},
+            "launch a campaign for Glow Serum with a $50 budget": {"detected_intent": "launch_campaign", "product_name": "Glow Serum", "budget": 50.0},
+            "create an ad campaign for Glow Serum at $20.50 a day": {"detected_intent": "launch_campaign", "product_name": "Glow Serum", "budget": 20.5},
+            "start a campaign for Glow Serum with a budget of 1,200": {"detected_intent": "launch_campaign", "product_name": "Glow Serum", "budget": 1200.0},
+        }
+        for text, expected in cases.items():
+            self.assertEqual(intent_router.route_text(text), expected, text)
+        self.assertIsNone(intent_router.route_text("How are my campaigns doing this week?"))
+        self.assertIsNone(intent_router.route_text("Scrape Google Maps for yoga coaches"))  # no location
+        # Qualifiers the rules can't keep go to the LLM rather than into the product name
+        for text in ("run a campaign on facebook for Glow Serum", "launch a campaign for Glow Serum on Instagram",
+                     "start a campaign for Glow Serum starting tomorrow", "launch a campaign for Glow Serum for 7 days",
+                     "launch a campaign for Glow Serum with $50 at $20 a day"):
+            self.assertIsNone(intent_router.route_text(text), text)
+
+
+class IntentNodeTests(SimpleTestCase):
+    def test_routed_requests_skip_the_llm(self):
+        from agent.tools import langgraph
+        from agent.views import build_initial_state
+
+        state, _ = build_initial_state({"type": "launch_campaign", "args": {"input": "Flyer Prompt Pack"}})
+        with mock.patch.object(langgraph, "llm") as llm:
+            structured = langgraph.intent_node(state)
+            keyword = langgraph.intent_node({"user_input": "Send outreach to dentists"})
+        llm.invoke.assert_not_called()
+        self.assertEqual((structured["detected_intent"], structured["product_name"], structured["budget"]),
+                         ("launch_campaign", "Flyer Prompt Pack", 10.0))
+        self.assertEqual((keyword["detected_intent"], keyword["niche"], keyword["batch_size"]), ("send_outreach", "dentists", 30))
+        self.assertGreater(intent_router.intent_stats()["resolved_without_llm"], 0)
+
+
+class ToolRegistryTests(SimpleTestCase):
+    def test_module_is_imported_on_first_call(self):
+        tool = registry.LazyTool("json", "dumps")
+        self.assertIn("not loaded", repr(tool))
+        self.assertEqual(tool({"a": 1}), '{"a": 1}')
+        self.assertIn("(loaded)", repr(tool))
+
+    def test_every_registered_tool_exists(self):
+        for name, module in registry.TOOL_MODULES.items():
+            self.assertTrue(callable(registry.lazy_tool(name).resolve()), f"{module}.{name}")
+
+
+@mock.patch.dict("os.environ", {"LLM_BACKEND": "stub"})
+class LLMProviderTests(TransactionTestCase):
+    def tearDown(self):
+        llm_provider.set_stub_replies()
+
+    def test_models_are_shared_per_model_and_temperature(self):
+        self.assertIs(llm_provider.get_chat_model("gpt-4o-mini", 0), llm_provider.get_chat_model("gpt-4o-mini", 0))
+        self.assertIsNot(llm_provider.get_chat_model("gpt-4o-mini", 0), llm_provider.get_chat_model("gpt-4o-mini", 0.7))
+
+        with mock.patch.dict("os.environ", {"LLM_BACKEND": "openai", "OPENAI_API_KEY": "sk-test"}):
+            first = llm_provider.get_chat_model("gpt-4o-mini", 0)
+            second = llm_provider.get_chat_model("gpt-4o", 0.9)
+        self.assertIs(first.root_client._client, second.root_client._client)
+
+    def test_stub_backend_runs_the_graph_offline(self):
+        from agent.tools import langgraph
+
+        before = llm_provider.llm_stats("gpt-4o-mini")
+        llm_provider.set_stub_replies('{"detected_intent": "summarize_campaign", "campaign_id": "cmp-1"}')
+        events = list(agent_jobs.graph_events({"user_input": "How did my last campaign go?"}))
+
+        self.assertIn("<LazyChatModel", repr(langgraph.llm))
+        self.assertEqual([event.get("node") for event in events], ["intent_node", "summarize_campaign", None])
+        self.assertEqual(events[0]["output"]["campaign_id"], "cmp-1")
+
+        after = llm_provider.llm_stats("gpt-4o-mini")
+        self.assertEqual(after["calls"], before["calls"] + 1)
+        self.assertGreater(after["input_tokens"], before["input_tokens"])
+        self.assertGreater(after["output_tokens"], before["output_tokens"])
+
+
+@mock.patch.dict("os.environ", {"LLM_BACKEND": "stub"})
+class LLMCacheTests(TestCase):
+    def setUp(self):
+        self.cache = llm_cache.LLMResponseCache(":memory:", ttl_hours=1, max_entries=2)
+        self.model = llm_provider.StubChatModel(cache=self.cache)
+
+    def tearDown(self):
+        llm_provider.set_stub_replies()
+
+    def test_repeated_prompts_are_answered_from_the_cache(self):
+        llm_provider.set_stub_replies("first", "second")
+        self.assertEqual(self.model.invoke("Summarize   campaign\n  42").content, "first")
+        self.assertEqual(self.model.invoke("Summarize campaign 42").content, "first")
+        with llm_cache.skip_llm_cache():
+            self.assertEqual(self.model.invoke("Summarize campaign 42").content, "second")
+        self.assertEqual(self.model.invoke("Summarize campaign 42").content, "second")
+        self.assertEqual(self.cache.stats(), {"hits": 2, "misses": 1, "skipped": 1, "hit_rate": 0.6667, "entries": 1})
+
+    def test_counters_are_exact_across_threads(self):
+        from langchain_core.messages import AIMessage
+        from langchain_core.outputs import ChatGeneration
+
+        self.cache.update("warm", "llm", [ChatGeneration(message=AIMessage("hi"))])
+
+        def lookup():
+            for _ in range(50):
+                self.cache.lookup("warm", "llm")
+            self.cache.lookup("cold", "llm")
+            with llm_cache.skip_llm_cache():
+                self.cache.lookup("warm", "llm")
+
+        threads = [threading.Thread(target=lookup) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["skipped"]), (400, 8, 8))
+
+    def test_missing_cache_directories_are_created(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f"{directory}/data/cache/llm_cache.sqlite3"
+            llm_cache.LLMResponseCache(path)._conn.close()
+            self.assertTrue(os.path.exists(path))
+
+    def test_entries_expire_and_are_evicted_least_recently_used(self):
+        llm_provider.set_stub_replies("a", "b", "c", "a again")
+        for prompt in ("a", "b", "a", "c"):
+            self.model.invoke(prompt)
+        self.assertEqual(self.cache.stats()["entries"], 2)
+        self.assertEqual(self.model.invoke("a").content, "a")  # "b" was the least recently used
+
+        with mock.patch.object(llm_cache.time, "time", return_value=llm_cache.time.time() + 7200):
+            self.assertEqual(self.model.invoke("a").content, "a again")
+
+    def test_retried_audience_analysis_skips_the_llm(self):
+        from agent.tools.analyze_product import analyze_product_audience
+
+        product = agent_models.Product.objects.create(name="Flyer Prompt Pack", description="Prompts for flyers")
+        product_data = {"product_id": product.product_id, "title": product.name, "description": product.description}
+        llm_provider.set_stub_replies('{"platforms": ["facebook"]}', '{"platforms": ["tiktok"]}')
+        before = llm_provider.llm_stats(llm_provider.DEFAULT_MODEL)
+
+        first = analyze_product_audience.invoke({"product_data": product_data})
+        retry = analyze_product_audience.invoke({"product_data": product_data})
+
+        after = llm_provider.llm_stats(llm_provider.DEFAULT_MODEL)
+        self.assertEqual(first, retry)
+        self.assertEqual(after["calls"] - before["calls"], 1)
+        self.assertEqual(after["cached"] - before["cached"], 1)
+
+    def test_regenerated_ad_copy_skips_the_cache(self):
+        from agent.tools.optimization.campaign_analytics import generate_product_adcopy_and_headline_cta
+
+        product = agent_models.Product.objects.create(name="Flyer Prompt Pack", description="Prompts for flyers")
+        campaign = agent_models.Campaign.objects.create(product=product, platform="meta", headline="Flyers in minutes")
+        llm_provider.set_stub_replies('{"headline": "First"}', '{"headline": "Second"}')
+
+        first = generate_product_adcopy_and_headline_cta.invoke({"campaign_id": campaign.campaign_id})
+        second = generate_product_adcopy_and_headline_cta.invoke({"campaign_id": campaign.campaign_id})
+        self.assertEqual((first, second), ({"headline": "First"}, {"headline": "Second"}))
+
+
+# Checkpoints are written from LangGraph's background threads, so these tests can't run inside one transaction
+class ResumeRunTests(TransactionTestCase):
+    def setUp(self):
+        from agent.tools import langgraph
+
+        self.tools = {
+            "fetch_product": mock.Mock(return_value={"title": "Flyer Prompt Pack", "description": '{"audience": "x"}'}),
+            "analyze_product_audience": mock.Mock(return_value={"product_id": "p1"}),
+            "create_campaign_from_analysis": mock.Mock(return_value={"campaign_id": "c1"}),
+            "generate_product_adcopy_and_headline_cta": mock.Mock(return_value={"headline": "Hi"}),
+            "resolve_audience_targeting": mock.Mock(return_value={"interests": [{"id": "6003"}], "behaviors": []}),
+            "prepare_ad_creative": mock.Mock(return_value=({"name": "Creative for Hi"}, "Hi")),
+            "create_campaign_on_meta": mock.Mock(return_value={"meta_campaign_id": "m1"}),
+            "ads_set_meta": mock.Mock(side_effect=[RuntimeError("Meta is down"), "adset-1"]),
+            "create_ad_creative": mock.Mock(return_value=("creative-1", "Hi")),
+            "create_ad": mock.Mock(return_value={"id": "ad-1"}),
+        }
+        for name, tool in self.tools.items():
+            patcher = mock.patch.object(langgraph, name, tool)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def launch(self):
+        return self.client.post(
+            "/api/genesis-agent/", data=json.dumps({"type": "launch_campaign", "args": {"input": "Flyer Prompt Pack"}}),
+            content_type="application/json",
+        ).json()
+
+    def test_failed_launch_resumes_from_the_failing_node(self):
+        launch = self.launch()
+        self.assertEqual(launch["error"], "Meta is down")
+        self.tools["create_ad"].assert_not_called()  # the run stops at the failing node
+        self.tools["create_ad_creative"].assert_not_called()  # no creative left behind on the ad account
+
+        response = self.client.post(launch["resume_url"], data=json.dumps({"state": {"budget": 25}}),
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["resumed_from"], "ads_set_meta")
+        self.assertIsNone(response.json()["error"])
+
+        # Upstream LLM and Meta steps ran once; the failing step and the rest ran after resuming
+        for name in ("fetch_product", "analyze_product_audience", "create_campaign_from_analysis",
+                     "create_campaign_on_meta", "prepare_ad_creative", "create_ad_creative", "create_ad"):
+            self.assertEqual(self.tools[name].call_count, 1, name)
+        self.tools["ads_set_meta"].assert_called_with({"meta_campaign_id": "m1"})
+        self.tools["create_ad_creative"].assert_called_with("c1", {"name": "Creative for Hi"}, "Hi")
+        self.tools["create_ad"].assert_called_with(headline="Hi", meta_adset_id="adset-1", meta_creative_id="creative-1")
+
+        from agent.tools import langgraph
+        state = langgraph.campaign_agent_executor.get_state(agent_jobs.run_config(launch["run_id"])).values
+        self.assertEqual((state["budget"], state["final_ad"]), (25, {"id": "ad-1"}))
+
+        again = self.client.post(launch["resume_url"], content_type="application/json")
+        self.assertEqual(again.status_code, 409)
+
+    def test_branches_run_in_parallel_and_join_before_the_adset(self):
+        def slow(result):
+            def tool(*args, **kwargs):
+                time.sleep(0.2)
+                return result
+            return tool
+
+        self.tools["generate_product_adcopy_and_headline_cta"].side_effect = slow({"headline": "Hi"})
+        self.tools["resolve_audience_targeting"].side_effect = slow({"interests": [{"id": "6003"}]})
+        self.tools["prepare_ad_creative"].side_effect = slow(({"name": "Creative for Hi"}, "Hi"))
+        self.tools["ads_set_meta"].side_effect = None
+        self.tools["ads_set_meta"].return_value = "adset-1"
+
+        launch = self.launch()
+        self.assertNotIn("error", launch)
+        self.tools["create_campaign_on_meta"].assert_called_once_with(
+            {"campaign_id": "c1"}, {"interests": [{"id": "6003"}]}
+        )
+
+        timings = launch["timings"]
+        offsets = {timing["node"]: timing["offset_ms"] for timing in timings["nodes"]}
+        self.assertGreaterEqual(timings["sequential_ms"] - timings["wall_ms"], 300)  # two of the 0.2s branches overlap
+        for branch in ("generate_adcopy", "resolve_targeting", "prepare_creative"):
+            self.assertLess(offsets[branch], offsets["create_campaign_on_meta"] - 150, branch)
+
+    def test_failed_branch_is_the_only_one_rerun(self):
+        uploads = []
+
+        def prepare_ad_creative(campaign_id):
+            uploads.append(campaign_id)
+            if len(uploads) == 1:
+                time.sleep(0.2)  # fails after the other branches have finished
+                raise RuntimeError("Image upload failed")
+            return {"name": "Creative for Hi"}, "Hi"
+
+        self.tools["prepare_ad_creative"].side_effect = prepare_ad_creative
+        self.tools["ads_set_meta"].side_effect = None
+        self.tools["ads_set_meta"].return_value = "adset-1"
+
+        launch = self.launch()
+        self.assertEqual(launch["error"], "Image upload failed")
+        self.tools["create_campaign_on_meta"].assert_not_called()  # the join waits for every branch
+
+        response = self.client.post(launch["resume_url"], content_type="application/json").json()
+        self.assertEqual(response["resumed_from"], "prepare_creative")
+        self.assertIsNone(response["error"])
+        self.assertEqual(self.tools["prepare_ad_creative"].call_count, 2)
+        for name in ("generate_product_adcopy_and_headline_cta", "resolve_audience_targeting",
+                     "create_campaign_on_meta", "create_ad"):
+            self.assertEqual(self.tools[name].call_count, 1, name)
+
+    def test_creative_is_only_created_on_meta_once(self):
+        from agent.tools import launch_campaign
+
+        product = agent_models.Product.objects.create(name="Flyer Prompt Pack", url="https://example.com/flyers")
+        campaign = agent_models.Campaign.objects.create(
+            product=product, platform="meta", headline="Flyers in minutes",
+            campaign_files=[{"type": "image", "image_hash": "abc123"}],
+        )
+        response = mock.Mock(json=mock.Mock(return_value={"id": "creative-9"}))
+        with mock.patch.object(launch_campaign.meta_api, "post", return_value=response) as post:
+            payload, headline = launch_campaign.prepare_ad_creative(campaign.campaign_id)
+            post.assert_not_called()
+            self.assertEqual(payload["object_story_spec"]["link_data"]["image_hash"], "abc123")
+
+            first = launch_campaign.create_ad_creative(campaign.campaign_id, payload, headline)
+            retry = launch_campaign.create_ad_creative(campaign.campaign_id, payload, headline)
+        self.assertEqual(first, retry)
+        self.assertEqual(first, ("creative-9", "Flyers in minutes"))
+        post.assert_called_once()
+
+    def test_failed_job_is_requeued_to_resume(self):
+        job = agent_models.AgentJob.objects.create(status="failed", error="Meta is down")
+        with mock.patch.object(agent_jobs, "resume_point", return_value=("ads_set_meta", None)), \
+                mock.patch.object(agent_jobs, "_get_pool") as pool:
+            response = self.client.post(f"/api/genesis-agent/runs/{job.job_id}/resume/", content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["resumed_from"], "ads_set_meta")
+        pool.return_value.submit.assert_called_once_with(agent_jobs._work, job.job_id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ("queued", None))
+
+
+class BatchScoringTests(TestCase):
+    # Values on and around every threshold the scalar rules use
+    EDGES = {
+        "ctr": [0, 0.5, 0.9, 1.0, 1.5, 2.5, 3.0],
+        "purchase_roas": [0, 0.4, 2.0, 3.0, 3.5, 4.0, 5.0],
+        "cpc": [0.3, 0.5, 0.8, 1.0, 1.5, 2.0, 2.5],
+        "spend": [0, 9, 10, 15, 20, 30, 45],
+        "purchases": [0, 3, 5],
+        "frequency": [0, 1.2, 1.5, 2.0, 2.5, 3.0, 3.5],
+        "clicks": [0, 30, 50, 120],
+        "days_running": [0, 1, 2, 3],
+        "impressions": [500, 1000],
+        "ctr_trend_pct": [None, -35, -20, -19.9, 0, 12],
+    }
+
+    def setUp(self):
+        import random
+
+        rng = random.Random(7)
+        self.rows = [{"meta_campaign_id": f"c{i}", **{key: rng.choice(values) for key, values in self.EDGES.items()}}
+                     for i in range(1500)]
+        # Off-threshold floats and a few rows with missing keys (the scalar path's defaults; with no
+        # ctr_trend_pct the scalar path finds no local history, the batch path assumes none)
+        self.rows += [{key: round(rng.uniform(0, max(values) * 1.2), 3) for key, values in self.EDGES.items()
+                       if key != "ctr_trend_pct"}
+                      for _ in range(500)]
+        self.rows += [{"ctr": 1.2}, {"spend": 40, "days_running": 5}, {}]
+
+    def scalar(self):
+        from agent.tools.optimization import decision_maker, metrics_analyzer
+
+        with mock.patch.object(alert_outbox, "queue_alert"):
+            analyses = [metrics_analyzer.analyze_campaign_metrics.func(row) for row in self.rows]
+            decisions = [decision_maker.decide_campaign_action.func(row, analysis)
+                         for row, analysis in zip(self.rows, analyses)]
+        return analyses, decisions
+
+    def test_batch_matches_scalar_analysis_and_decisions(self):
+        from agent.tools.optimization import batch_scoring
+
+        analyses, decisions = self.scalar()
+        for i, (expected, actual) in enumerate(zip(analyses, batch_scoring.analyze_metrics_batch(self.rows))):
+            self.assertEqual(actual, expected, self.rows[i])
+        for i, (expected, actual) in enumerate(zip(decisions, batch_scoring.decide_actions_batch(self.rows))):
+            self.assertEqual(actual, expected, self.rows[i])
+        self.assertEqual(len({decision["decision"] for decision in decisions}), 8)  # every rule was exercised
+
+    def test_decisions_honour_flags_set_outside_the_analyzer(self):
+        from agent.tools.optimization import batch_scoring, decision_maker
+
+        rows = [{"ctr": 2.0, "purchase_roas": 3.2, "cpc": 0.6, "spend": 25, "purchases": 4, "clicks": 200,
+                 "frequency": 1.6, "days_running": 4}] * 2
+        analyses = [{"score": 70, "status": "performing", "flags": ["weak_creative"]},
+                    {"score": 70, "status": "performing", "flags": ["conversion_dropoff"]}]
+        with mock.patch.object(alert_outbox, "queue_alert"):
+            expected = [decision_maker.decide_campaign_action.func(row, analysis) for row, analysis in zip(rows, analyses)]
+        self.assertEqual(batch_scoring.decide_actions_batch(rows, analyses), expected)
+        self.assertEqual([decision["decision"] for decision in expected], ["edit_creative", "revise_offer"])
+
+    def test_columnar_scores_match_records(self):
+        from agent.tools.optimization import batch_scoring
+
+        columns = batch_scoring.metrics_columns(self.rows)
+        scores = batch_scoring.score_metrics(columns)
+        actions = batch_scoring.decide_actions(columns, scores)
+        analyses = batch_scoring.analyze_metrics_batch(self.rows)
+        decisions = batch_scoring.decide_actions_batch(self.rows, analyses)
+
+        self.assertEqual(scores["score"].tolist(), [analysis["score"] for analysis in analyses])
+        self.assertEqual([batch_scoring.STATUSES[status] for status in scores["status"]],
+                         [analysis["status"] for analysis in analyses])
+        decided = [batch_scoring.DECISIONS[decision] for decision in actions["decision"]]
+        self.assertEqual([name.replace("default", "edit_creative") for name in decided],
+                         [decision["decision"] for decision in decisions])
+
+
+class MetricHistoryTests(TestCase):
+    def setUp(self):
+        product = agent_models.Product.objects.create(name="Flyer Prompt Pack")
+        self.campaign = agent_models.Campaign.objects.create(product=product, platform="meta", meta_campaign_id="m1")
+
+    def record(self, at, **metrics):
+        from agent.tools.optimization.metric_history import record_snapshots
+
+        record_snapshots([{"meta_campaign_id": "m1", **metrics}], [self.campaign], fetched_at=at)
+
+    def test_rollups_summarize_completed_hours_and_days(self):
+        from agent.tools.optimization import metric_history
+
+        day = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=3)
+        self.record(day + timedelta(hours=10, minutes=5), ctr=1.0, frequency=1.0, impressions=100)
+        self.record(day + timedelta(hours=10, minutes=35), ctr=2.0, frequency=2.0, impressions=300)
+        self.record(day + timedelta(hours=11, minutes=10), ctr=4.0, frequency=1.5, impressions=450)
+        now = day + timedelta(days=1, minutes=30)
+
+        self.assertEqual(metric_history.rollup_metrics(now), {"hourly": 2, "daily": 1, "pruned": 0})
+        metric_history.rollup_metrics(now)  # picks up where it left off, without duplicating periods
+
+        hours = metric_history.metric_history(self.campaign.id, day, now, period="hour")
+        self.assertEqual([(row["samples"], row["ctr"], row["frequency_max"], row["impressions"]) for row in hours],
+                         [(2, 1.5, 2.0, 300), (1, 4.0, 1.5, 450)])
+        [daily] = metric_history.metric_history(self.campaign.id, day, now, period="day")
+        self.assertEqual((daily["samples"], daily["frequency_max"], daily["impressions"]), (3, 2.0, 450))
+        self.assertAlmostEqual(daily["ctr"], 7 / 3)
+
+        with mock.patch.object(metric_history, "METRICS_RAW_RETENTION_DAYS", 0), \
+                mock.patch.object(metric_history, "METRICS_HOURLY_RETENTION_DAYS", 0):
+            self.assertEqual(metric_history.rollup_metrics(now)["pruned"], 5)
+        self.assertFalse(agent_models.CampaignMetricSnapshot.objects.exists())
+        self.assertEqual(list(agent_models.CampaignMetricRollup.objects.values_list("period", flat=True)), ["day"])
+
+    def test_window_aggregates_are_one_query(self):
+        from agent.tools.optimization.metric_history import window_aggregates
+
+        other = agent_models.Campaign.objects.create(product=self.campaign.product, platform="meta",
+                                                     meta_campaign_id="m2")
+        now = timezone.now()
+        self.record(now - timedelta(hours=2), ctr=1.0, spend=5)
+        self.record(now - timedelta(hours=1), ctr=3.0, spend=9)
+
+        with self.assertNumQueries(1):
+            aggregates = window_aggregates([self.campaign.id, other.id], now - timedelta(hours=6))
+        self.assertEqual(list(aggregates), [self.campaign.id])
+        self.assertEqual((aggregates[self.campaign.id]["samples"], aggregates[self.campaign.id]["ctr"],
+                          aggregates[self.campaign.id]["spend"]), (2, 2.0, 9.0))
+
+    def test_falling_ctr_flags_creative_fatigue(self):
+        from agent.tools.optimization import batch_scoring
+        from agent.tools.optimization.metric_history import ctr_trends
+        from agent.tools.optimization.metrics_analyzer import analyze_campaign_metrics
+
+        now = timezone.now()
+        for days in (2, 3, 4):
+            self.record(now - timedelta(days=days), ctr=2.0, frequency=1.2)
+        self.record(now - timedelta(hours=2), ctr=1.4, frequency=1.8)
+        self.assertEqual(ctr_trends(["m1", "unknown"]), {"m1": -30.0, "unknown": None})
+
+        # CTR alone (1.4%) would not have flagged fatigue
+        metrics = {"meta_campaign_id": "m1", "ctr": 1.4, "frequency": 1.8, "purchase_roas": 2.5, "spend": 12}
+        with mock.patch.object(alert_outbox, "queue_alert"):
+            analysis = analyze_campaign_metrics.func(metrics)
+        self.assertIn("creative_fatigue", analysis["flags"])
+        self.assertIn("🟡 CTR down 30% from its recent baseline at 1.8 frequency indicates creative fatigue. "
+                      "Refresh ads soon.", analysis["recommendations"])
+        self.assertEqual(batch_scoring.analyze_metrics_batch([{**metrics, "ctr_trend_pct": -30.0}]), [analysis])
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Upper bounds on the queries each optimization step issues against thousands of campaigns,
+    so an N+1 (or a lookup that stops using its index) fails here instead of in production.
+    """
+    CAMPAIGNS = 3000
+    INSIGHTS_ROW = {"campaign_name": "Seeded", "impressions": "1200", "reach": "900", "frequency": "1.3",
+                    "clicks": "30", "ctr": "2.5", "cpc": "0.4", "spend": "12.5"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = agent_models.Product.objects.create(name="Flyer Prompt Pack")
+        agent_models.Campaign.objects.bulk_create(
+            agent_models.Campaign(product=cls.product, platform="meta", meta_campaign_id=f"m{i}",
+                                  status="active" if i % 3 else "paused", purchases="2", revenue=30)
+            for i in range(cls.CAMPAIGNS)
+        )
+        campaigns = list(agent_models.Campaign.objects.all()[:200])
+        agent_models.OptimizationLog.objects.bulk_create(
+            agent_models.OptimizationLog(campaign=campaign, product=cls.product, action="scale")
+            for campaign in campaigns
+        )
+
+    def setUp(self):
+        patcher = mock.patch.object(alert_outbox, "_wake")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        with CaptureQueriesContext(connection) as queries:
+            yield
+        self.assertLessEqual(len(queries), budget,
+                             "\n".join(query["sql"][:200] for query in queries.captured_queries))
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        self.assertIn("USING", plan)
+        self.assertNotIn("SCAN agent_", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_hot_lookups_use_indexes(self):
+        # Campaign.objects.get() drops the default ordering
+        self.assertUsesIndex(agent_models.Campaign.objects.filter(meta_campaign_id="m42").order_by())
+        self.assertUsesIndex(agent_models.Campaign.objects.filter(status="active"))
+        self.assertUsesIndex(agent_models.OptimizationLog.objects.filter(product=self.product).order_by("-timestamp"))
+
+    def test_collecting_every_active_campaign_is_a_fixed_number_of_queries(self):
+        from agent.tools.optimization import metric_fetcher
+
+        def insights(fields, meta_campaign_ids, ad_account_id=None):
+            return {meta_campaign_id: self.INSIGHTS_ROW for meta_campaign_id in meta_campaign_ids}
+
+        # ~10 reads plus the bulk update/insert batches SQLite's parameter limit splits 2000 rows into;
+        # one query per campaign would be thousands
+        with mock.patch.object(metric_fetcher, "fetch_account_insights", side_effect=insights), \
+                self.assertQueryBudget(55):
+            collected = metric_fetcher.collect_campaign_metrics(agent_models.Campaign.objects.filter(status="active"))
+        self.assertEqual(len(collected["metrics"]), 2000)
+        self.assertEqual(agent_models.CampaignMetricSnapshot.objects.count(), 2000)
+
+    def test_per_campaign_steps(self):
+        from agent.tools.optimization import metric_fetcher
+        from agent.tools.optimization.decision_maker import decide_campaign_action
+        from agent.tools.optimization.metrics_analyzer import analyze_campaign_metrics
+
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {"data": [self.INSIGHTS_ROW]}
+        # Campaign read and save, snapshot, history digest upsert (first time: create), CTR trend
+        with mock.patch.object(metric_fetcher, "_request_campaign_insights", return_value=response), \
+                self.assertQueryBudget(12):
+            metrics = metric_fetcher.fetch_campaign_metrics.func("m1500")
+        with self.assertQueryBudget(2):
+            analysis = analyze_campaign_metrics.func(metrics)
+        with self.assertQueryBudget(1):
+            decide_campaign_action.func(metrics, analysis)
+        # Without a trend attached, the analyzer reads the campaign's history itself
+        del metrics["ctr_trend_pct"]
+        with self.assertQueryBudget(5):
+            analyze_campaign_metrics.func(metrics)
+
+
+class HistoryDigestTests(TestCase):
+    def setUp(self):
+        self.product = agent_models.Product.objects.create(name="Flyer Prompt Pack")
+        self.campaigns = [
+            agent_models.Campaign.objects.create(
+                product=self.product, platform="meta", ad_type="image", budget=20, meta_campaign_id=f"m{i}",
+                audience={"interests": [f"Interest {i}.{n}" for n in range(8)]},
+            )
+            for i in range(4)
+        ]
+
+    def record_metrics(self, roas_by_campaign):
+        from agent.tools.optimization.metric_history import record_snapshots
+
+        metrics = [{"meta_campaign_id": campaign.meta_campaign_id, "purchase_roas": roas, "ctr": 1.5,
+                    "impressions": 1000, "clicks": 20, "purchases": 1}
+                   for campaign, roas in zip(self.campaigns, roas_by_campaign)]
+        record_snapshots(metrics, self.campaigns)
+
+    def test_metrics_keep_the_best_campaigns_and_totals(self):
+        self.record_metrics([1.0, 4.0, 2.0, 3.0])
+        self.record_metrics([1.0, 4.0, 2.0, 3.5])  # a refetch replaces each campaign's share, never adds to it
+
+        digest = agent_models.ProductHistoryDigest.objects.get(product=self.product)
+        self.assertEqual([entry["roas"] for entry in digest.top_campaigns], [4.0, 3.5, 2.0])
+        self.assertEqual(len(digest.top_campaigns[0]["interests"]), 5)
+        self.assertEqual((digest.impressions, digest.clicks, digest.purchases), (4000, 80, 4))
+
+    def test_logs_keep_the_latest_actions(self):
+        for i in range(7):
+            agent_models.OptimizationLog.objects.create(campaign=self.campaigns[0], product=self.product,
+                                                        action=f"action {i}", reason="test")
+        digest = agent_models.ProductHistoryDigest.objects.get(product=self.product)
+        self.assertEqual([action["action"] for action in digest.recent_actions],
+                         ["action 6", "action 5", "action 4", "action 3", "action 2"])
+
+    def test_prompt_is_one_query_whatever_the_history(self):
+        from agent.tools.history_digest import history_prompt, rebuild_history_digests
+
+        self.record_metrics([1.0, 4.0, 2.0, 3.0])
+        for i in range(300):
+            agent_models.OptimizationLog.objects.create(campaign=self.campaigns[i % 4], product=self.product,
+                                                        action="scale", reason=f"reason {i}")
+
+        with self.assertNumQueries(1):
+            product = agent_models.Product.objects.select_related("history_digest").get(id=self.product.id)
+            prompt = history_prompt(product)
+        self.assertTrue(prompt.startswith("Across 4 campaigns: CTR 2.00% | CVR 5.00%\n🏆 Best campaigns by ROAS:\n"
+                                          "- Platform: meta | Ad Type: image | Budget: $20\n  📈 ROAS: 4.0"))
+        self.assertEqual(prompt.count("→ Reason:"), 5)
+        self.assertIn("- scale → Reason: reason 299", prompt)
+
+        # The backfill arrives at the same digest as the incremental updates
+        agent_models.Campaign.objects.filter(id__in=[c.id for c in self.campaigns]).update(result_metrics={})
+        for campaign, roas in zip(self.campaigns, [1.0, 4.0, 2.0, 3.0]):
+            campaign.result_metrics = {"purchase_roas": roas, "ctr": 1.5, "impressions": 1000, "clicks": 20,
+                                       "purchases": 1}
+            campaign.save()
+        rebuild_history_digests()
+        product = agent_models.Product.objects.select_related("history_digest").get(id=self.product.id)
+        self.assertEqual(history_prompt(product), prompt)
+
+    def test_product_without_history(self):
+        from agent.tools.history_digest import history_prompt
+
+        self.assertEqual(history_prompt(self.product), "No past campaign logs available for this product.")
+
+
+class ProductHistoryExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = agent_models.Product.objects.create(name="Flyer Prompt Pack")
+        creatives = agent_models.AdsCreatives.objects.bulk_create(
+            agent_models.AdsCreatives(product=cls.product, creative_type="image", file_hash=f"hash{i}")
+            for i in range(6)
+        )
+        campaigns = agent_models.Campaign.objects.bulk_create(
+            agent_models.Campaign(product=cls.product, platform="meta", meta_campaign_id=f"m{i}") for i in range(3)
+        )
+        for i, campaign in enumerate(campaigns):
+            campaign.creatives.set(creatives[2 * i:2 * i + 2])
+        same_time = timezone.now()
+        agent_models.OptimizationLog.objects.bulk_create(
+            agent_models.OptimizationLog(campaign=campaigns[i % 3], product=cls.product, action="scale",
+                                         reason=f"reason {i}")
+            for i in range(250)
+        )
+        # Logs share timestamps in bulk, so pages must not lose or repeat any
+        agent_models.OptimizationLog.objects.filter(id__in=agent_models.OptimizationLog.objects.values("id")[:40])\
+            .update(timestamp=same_time)
+
+    def test_query_count_does_not_grow_with_the_history(self):
+        from agent.tools.optimization.campaign_log import get_product_specific_logs, iter_product_logs
+
+        with self.assertNumQueries(2):  # logs joined to campaign and product, then the campaigns' creatives
+            rows = get_product_specific_logs(self.product.id)
+        self.assertEqual(len(rows), 250)
+        self.assertEqual({row["creative_meta"]["hash"] for row in rows}, {"hash0", "hash2", "hash4"})
+        # A page at a time: two queries per page
+        with self.assertNumQueries(6):
+            self.assertEqual(len(list(iter_product_logs(self.product.id, page_size=100))), 250)
+
+    def test_pages_walk_the_whole_history_once(self):
+        seen, cursor = [], ""
+        while True:
+            page = self.client.get(f"/api/products/{self.product.product_id}/history/?limit=60&cursor={cursor}").json()
+            seen += [row["reason"] for row in page["results"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(sorted(seen), sorted(f"reason {i}" for i in range(250)))
+        self.assertEqual(self.client.get(f"/api/products/{self.product.product_id}/history/?cursor=x").status_code, 400)
+        self.assertEqual(self.client.get("/api/products/missing/history/").status_code, 404)
+
+    def test_jsonl_export_streams(self):
+        response = self.client.get(f"/api/products/{self.product.product_id}/history/?format=jsonl")
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 250)
+        self.assertEqual(json.loads(lines[0])["product_name"], "Flyer Prompt Pack")
+
+
+class PerformanceAnalyticsTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from agent.tools.optimization.metric_history import record_snapshots, rollup_metrics
+
+        cache.clear()
+        self.flyers = agent_models.Product.objects.create(name="Flyer Prompt Pack")
+        self.logos = agent_models.Product.objects.create(name="Logo Prompt Pack")
+        self.meta = agent_models.Campaign.objects.create(product=self.flyers, platform="meta", meta_campaign_id="m1")
+        self.tiktok = agent_models.Campaign.objects.create(product=self.logos, platform="tiktok",
+                                                           meta_campaign_id="t1")
+        today_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.today = today_start.date()
+        yesterday = today_start - timedelta(days=1)
+
+        def record(at, campaign, spend, roas, impressions, clicks, purchases):
+            record_snapshots([{"meta_campaign_id": campaign.meta_campaign_id, "spend": spend, "purchase_roas": roas,
+                               "impressions": impressions, "clicks": clicks, "purchases": purchases}],
+                             [campaign], fetched_at=at)
+
+        # Totals are "today so far", so each campaign-day counts at its peak
+        record(yesterday + timedelta(hours=1), self.meta, 10, 2, 1000, 20, 1)
+        record(yesterday + timedelta(hours=2), self.meta, 20, 3, 2000, 40, 2)
+        record(yesterday + timedelta(hours=2), self.tiktok, 5, 0, 500, 5, 0)
+        # Yesterday is read back from its daily rollups, today from the raw snapshots
+        rollup_metrics(today_start + timedelta(hours=1))
+        agent_models.CampaignMetricSnapshot.objects.filter(fetched_at__lt=today_start).delete()
+        record(today_start + timedelta(minutes=1), self.meta, 4, 5, 400, 10, 1)
+        record(today_start + timedelta(minutes=2), self.meta, 8, 5, 800, 16, 2)
+        record(today_start + timedelta(minutes=2), self.tiktok, 2, 1, 100, 1, 0)
+
+    def test_reports_group_rollups_and_todays_snapshots(self):
+        from agent.tools.optimization.performance_analytics import campaign_performance
+
+        report = campaign_performance("product")
+        self.assertEqual([(row["product_name"], row["spend"], row["revenue"], row["impressions"], row["clicks"],
+                           row["purchases"], row["roas"], row["ctr"], row["cvr"]) for row in report["results"]],
+                         [("Flyer Prompt Pack", 28, 100, 2800, 56, 4, 3.57, 2.0, 7.14),
+                          ("Logo Prompt Pack", 7, 2, 600, 6, 0, 0.29, 1.0, 0.0)])
+        self.assertEqual((report["totals"]["spend"], report["totals"]["revenue"], report["totals"]["roas"]),
+                         (35, 102, 2.91))
+
+        days = campaign_performance("day")["results"]
+        self.assertEqual([(row["day"], row["spend"], row["revenue"], row["clicks"]) for row in days],
+                         [(self.today - timedelta(days=1), 25, 60, 45), (self.today, 10, 42, 17)])
+        platforms = campaign_performance("platform", since=self.today)["results"]
+        self.assertEqual([(row["platform"], row["spend"]) for row in platforms], [("meta", 8), ("tiktok", 2)])
+        with self.assertRaises(ValueError):
+            campaign_performance("audience")
+
+    def test_reports_are_cached_until_metrics_are_written(self):
+        from agent.tools.optimization.metric_history import record_snapshots
+        from agent.tools.optimization.performance_analytics import campaign_performance
+
+        with self.assertNumQueries(3):  # last rolled day, summed rollups, today's peaks
+            self.assertEqual(campaign_performance("platform")["totals"]["spend"], 35)
+        with self.assertNumQueries(0):
+            self.assertEqual(campaign_performance("platform")["totals"]["spend"], 35)
+
+        record_snapshots([{"meta_campaign_id": "t1", "spend": 12, "purchase_roas": 1}], [self.tiktok])
+        self.assertEqual(campaign_performance("platform")["totals"]["spend"], 45)
+
+    def test_api_filters_and_validates(self):
+        response = self.client.get(f"/api/analytics/campaigns/product/?product={self.logos.product_id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["product_id"] for row in response.json()["results"]], [self.logos.product_id])
+        self.assertEqual(response.json()["results"][0]["spend"], 7)
+
+        self.assertEqual(self.client.get("/api/analytics/campaigns/audience/").status_code, 400)
+        self.assertEqual(self.client.get("/api/analytics/campaigns/day/?since=yesterday").status_code, 400)
+        self.assertEqual(self.client.get("/api/analytics/campaigns/day/?since=2026-02-30").status_code, 400)
+
+
+class ProductImportTests(TestCase):
+    def test_slugs_continue_the_product_save_scheme(self):
+        from agent.tools.product_import import import_products
+
+        agent_models.Product.objects.create(name="Flyer Pack")
+        agent_models.Product.objects.create(name="Flyer Pack")
+        result = import_products([{"name": "Flyer Pack"}, {"name": "Other"}, {"name": "Flyer Pack"}, {"name": "!!"}])
+
+        slugs = list(agent_models.Product.objects.filter(id__in=result["product_ids"]).order_by("id")
+                     .values_list("slug", flat=True))
+        self.assertEqual(slugs, ["flyer-pack-2", "other", "flyer-pack-3", "product"])
+        self.assertEqual(agent_models.Product.objects.create(name="Flyer Pack").slug, "flyer-pack-4")
+
+    def test_slug_lookup_fetches_only_colliding_slugs(self):
+        from agent.tools import product_import
+
+        for name in ("Apple Pack", "Mango Kit", "Zebra Pack", "Zebra Pack"):
+            agent_models.Product.objects.create(name=name)
+        fetched = []
+        original = agent_models.Product.objects.filter
+
+        def spy(*args, **kwargs):
+            fetched.extend(original(*args, **kwargs).values_list("slug", flat=True))
+            return original(*args, **kwargs)
+
+        with mock.patch.object(agent_models.Product.objects, "filter", side_effect=spy), \
+                mock.patch.object(product_import, "SLUG_QUERY_BATCH", 1):
+            slugs = product_import.allocate_slugs(["Apple Pack", "Zebra Pack", "Apple Pack"])
+        self.assertEqual(slugs, ["apple-pack-1", "zebra-pack-2", "apple-pack-2"])
+        # "mango-kit" sorts between the bases, but isn't one of them
+        self.assertEqual(sorted(fetched), ["apple-pack", "zebra-pack", "zebra-pack-1"])
+
+    def test_import_queries_do_not_grow_per_product(self):
+        from agent.tools.product_import import import_products
+
+        agent_models.Tag.objects.create(name="AI")
+        rows = [{"name": f"Prompt Pack {i % 7}", "price": "9.99", "tags": ["AI", f"Niche {i % 4}"],
+                 "category": "Templates", "features": "Fast|Simple"} for i in range(2000)]
+        # Fixed lookups plus the bulk insert batches SQLite's parameter limit splits the rows into
+        with CaptureQueriesContext(connection) as queries:
+            result = import_products(rows, embed=False)
+        self.assertLessEqual(len(queries), 70)
+
+        self.assertEqual((result["created"], result["tags_created"], result["errors"]), (2000, 4, []))
+        self.assertEqual(agent_models.Product.objects.values("slug").distinct().count(), 2000)
+        product = agent_models.Product.objects.get(id=result["product_ids"][-1])
+        self.assertEqual((product.name, product.slug, product.category.title, product.features),
+                         ("Prompt Pack 4", "prompt-pack-4-285", "Templates", ["Fast", "Simple"]))
+        self.assertEqual(sorted(product.tags.values_list("name", flat=True)), ["AI", "Niche 3"])
+        self.assertEqual(agent_models.Tag.objects.get(name="Niche 3").slug, "niche-3")
+
+    def test_new_products_are_embedded_in_one_batch(self):
+        from agent import signal
+        from agent.tools.product_import import import_products
+
+        with mock.patch.object(signal, "_run_in_background") as run, self.captureOnCommitCallbacks(execute=True):
+            result = import_products([{"name": f"Pack {i}"} for i in range(50)], embed=True)
+        run.assert_called_once_with(signal._sync_products, result["product_ids"])
+
+    def test_command_reads_csv_and_reports_bad_rows(self):
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write('name,price,tags,useCases\n'
+                    'Flyer Pack,19,"[""Design"", ""AI""]",Flyers|Posters\n'
+                    ',5,,\n'
+                    'Logo Pack,cheap,,\n')
+        self.addCleanup(os.remove, f.name)
+        out, err = StringIO(), StringIO()
+        call_command("import_products", f.name, stdout=out, stderr=err)
+
+        self.assertIn("Imported 1 products (2 new tags)", out.getvalue())
+        self.assertIn("Row 2 skipped: missing name", err.getvalue())
+        self.assertIn("Row 3 skipped: price is not a number: 'cheap'", err.getvalue())
+        product = agent_models.Product.objects.get()
+        self.assertEqual((product.price, product.useCases), (19, ["Flyers", "Posters"]))
+
+
+class AlertOutboxTests(TestCase):
+    def setUp(self):
+        # Dispatch is driven by the tests; no background thread
+        patcher = mock.patch.object(alert_outbox, "_wake")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_analysis_does_not_wait_for_smtp(self):
+        from agent.tools.optimization.metrics_analyzer import analyze_campaign_metrics
+
+        metrics = [{"meta_campaign_id": f"m{i}", "ctr": 0.4 + i, "purchase_roas": i, "spend": 12} for i in range(5)]
+        original = LocmemEmailBackend.send_messages
+        with mock.patch.object(LocmemEmailBackend, "send_messages", autospec=True,
+                               side_effect=lambda backend, messages: time.sleep(0.5) or original(backend, messages)):
+            start = time.perf_counter()
+            analyses = [analyze_campaign_metrics.func(row) for row in metrics]
+            elapsed = time.perf_counter() - start
+            self.assertLess(elapsed, 0.5)
+            self.assertEqual(mail.outbox, [])
+
+            self.assertEqual(alert_outbox.dispatch_alerts(), 1)
+
+        self.assertEqual(len(mail.outbox), 1)
+        digest = mail.outbox[0]
+        self.assertEqual(digest.subject, "🔔 Genesis: 5 campaign alerts")
+        html = digest.alternatives[0][0]
+        for analysis in analyses:
+            self.assertIn(f"Campaign {analysis['meta_campaign_id']} is {analysis['status']}", html)
+        self.assertEqual(set(agent_models.AlertOutbox.objects.values_list("status", flat=True)), {"sent"})
+
+    def test_run_alerts_are_held_until_the_run_ends(self):
+        alert_outbox.queue_alert("Stray alert", "<p>outside any run</p>")
+        with alert_outbox.alert_run():
+            alert_outbox.queue_alert("First", "<p>1</p>")
+            alert_outbox.queue_alert("Second", "<p>2</p>")
+            self.assertEqual(alert_outbox.dispatch_alerts(), 1)  # only the stray one
+            self.assertEqual(mail.outbox[0].subject, "Stray alert")
+
+        self.assertEqual(alert_outbox.dispatch_alerts(), 1)
+        self.assertEqual(mail.outbox[1].subject, "🔔 Genesis: 2 campaign alerts")
+        self.assertEqual(alert_outbox.dispatch_alerts(), 0)
+
+    def test_failed_digest_is_marked_failed(self):
+        alert_outbox.queue_alert("Launch", "<p>done</p>")
+        with mock.patch.object(alert_outbox, "send_mail", side_effect=OSError("SMTP down")):
+            self.assertEqual(alert_outbox.dispatch_alerts(), 0)
+        alert = agent_models.AlertOutbox.objects.get()
+        self.assertEqual((alert.status, alert.error), ("failed", "SMTP down"))
+
+    def test_claimed_alerts_are_left_alone_until_the_claim_expires(self):
+        alert = alert_outbox.queue_alert("Launch", "<p>done</p>")
+        # Another dispatcher is sending it
+        agent_models.AlertOutbox.objects.filter(pk=alert.pk).update(
+            status="sending", claimed_by="other", claimed_at=timezone.now()
+        )
+        self.assertEqual(alert_outbox.dispatch_alerts(), 0)
+
+        # That dispatcher died mid-send
+        agent_models.AlertOutbox.objects.filter(pk=alert.pk).update(
+            claimed_at=timezone.now() - timedelta(seconds=alert_outbox.ALERT_CLAIM_TIMEOUT_SECONDS + 1)
+        )
+        self.assertEqual(alert_outbox.dispatch_alerts(), 1)
+        alert.refresh_from_db()
+        self.assertEqual(alert.status, "sent")
+        self.assertNotEqual(alert.claimed_by, "other")
+
+    def test_dispatch_during_a_send_does_not_send_again(self):
+        alert_outbox.queue_alert("Launch", "<p>done</p>")
+        nested = []
+        original = LocmemEmailBackend.send_messages
+        with mock.patch.object(LocmemEmailBackend, "send_messages", autospec=True,
+                               side_effect=lambda backend, messages: nested.append(alert_outbox.dispatch_alerts())
+                               or original(backend, messages)):
+            self.assertEqual(alert_outbox.dispatch_alerts(), 1)
+        self.assertEqual((nested, len(mail.outbox)), ([0], 1))
+
+    def test_runs_open_in_another_process_hold_their_alerts(self):
+        run = agent_models.AlertRun.objects.create(run_id="elsewhere")
+        agent_models.AlertOutbox.objects.create(run_id="elsewhere", subject="First")
+        self.assertEqual(alert_outbox.dispatch_alerts(), 0)
+
+        run.finished_at = timezone.now()
+        run.save()
+        self.assertEqual(alert_outbox.dispatch_alerts(), 1)
+
+        # A run whose process died stops holding alerts after the timeout
+        agent_models.AlertRun.objects.create(
+            run_id="abandoned", started_at=timezone.now() - timedelta(minutes=alert_outbox.ALERT_RUN_TIMEOUT_MINUTES + 1)
+        )
+        agent_models.AlertOutbox.objects.create(run_id="abandoned", subject="Second")
+        self.assertEqual(alert_outbox.dispatch_alerts(), 1)
+
+
+class AlertDispatcherTests(TransactionTestCase):
+    def test_background_dispatcher_sends_the_digest(self):
+        with mock.patch.object(alert_outbox, "ALERT_DIGEST_DELAY_SECONDS", 0.05):
+            alert_outbox.queue_alert("One", "<p>1</p>")
+            alert_outbox.queue_alert("Two", "<p>2</p>")
+            deadline = time.time() + 5
+            while not mail.outbox and time.time() < deadline:
+                time.sleep(0.05)
+        self.assertEqual([message.subject for message in mail.outbox], ["🔔 Genesis: 2 campaign alerts"])
@@ -0,0 +1,376 @@
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+import traceback
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from agent import models as agent_models
+from agent.tools.checkpointer import prune_checkpoints
+
+
+# Graph runs executed concurrently per process
+AGENT_JOB_WORKERS = int(os.getenv("AGENT_JOB_WORKERS", "4"))
+# Running jobs older than this are treated as lost (e.g. the process was restarted)
+AGENT_JOB_TIMEOUT_HOURS = int(os.getenv("AGENT_JOB_TIMEOUT_HOURS", "12"))
+# Checkpoints of runs untouched for this long are deleted; they can no longer be resumed
+AGENT_CHECKPOINT_RETENTION_DAYS = int(os.getenv("AGENT_CHECKPOINT_RETENTION_DAYS", "14"))
+# Finished runs prune expired checkpoints at most this often per process
+AGENT_CHECKPOINT_PRUNE_MINUTES = int(os.getenv("AGENT_CHECKPOINT_PRUNE_MINUTES", "60"))
+# How often a streamed job's saved steps are polled
+AGENT_STREAM_POLL_SECONDS = float(os.getenv("AGENT_STREAM_POLL_SECONDS", "0.5"))
+
+FINISHED_JOB_STATUSES = ("succeeded", "failed")
+
+_pool = None
+_pool_lock = threading.Lock()
+# LLM tokens of jobs enqueued with tokens=True, handed from the worker thread to tail_agent_job
+_token_streams = {}
+_last_prune = None
+_prune_lock = threading.Lock()
+
+
+def _get_executor():
+    from agent.tools.langgraph import campaign_agent_executor
+    return campaign_agent_executor
+
+
+def _json_safe(value):
+    """Graph state can hold Decimals, datetimes, etc.; store their string form."""
+    return json.loads(json.dumps(value, default=str))
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=AGENT_JOB_WORKERS, thread_name_prefix="agent-job")
+                recover_agent_jobs(_pool)
+    return _pool
+
+
+def recover_agent_jobs(pool: ThreadPoolExecutor):
+    """
+    Requeues jobs left queued by a previous process and fails the ones that were cut off mid-run
+    (their checkpoints are kept, so they can be resumed). Also drops expired checkpoints.
+    """
+    prune_expired_checkpoints(force=True)
+    cutoff = timezone.now() - timedelta(hours=AGENT_JOB_TIMEOUT_HOURS)
+    agent_models.AgentJob.objects.filter(status="running", started_at__lt=cutoff).update(
+        status="failed", error="Job was interrupted before it finished.", finished_at=timezone.now()
+    )
+    for job_id in agent_models.AgentJob.objects.filter(status="queued").values_list("job_id", flat=True):
+        pool.submit(_work, job_id)
+
+
+def prune_expired_checkpoints(force: bool = False) -> int:
+    """
+    Deletes checkpoints of runs idle for AGENT_CHECKPOINT_RETENTION_DAYS; returns runs removed.
+    Called after every run, so it skips (returns 0) when this process pruned in the last
+    AGENT_CHECKPOINT_PRUNE_MINUTES unless forced. See also the prune_agent_checkpoints command.
+    """
+    global _last_prune
+    with _prune_lock:
+        now = time.monotonic()
+        if not force and _last_prune is not None and now - _last_prune < AGENT_CHECKPOINT_PRUNE_MINUTES * 60:
+            return 0
+        _last_prune = now
+    try:
+        return prune_checkpoints(AGENT_CHECKPOINT_RETENTION_DAYS)
+    except Exception as e:
+        print(f"❌ Checkpoint pruning failed: {e}")
+        return 0
+
+
+def enqueue_agent_job(initial_state: dict, user=None, tokens: bool = False) -> agent_models.AgentJob:
+    """
+    Saves the job and hands it to the worker pool; returns immediately.
+    With tokens=True the run's LLM tokens are also passed to tail_agent_job in this process.
+    """
+    job = agent_models.AgentJob.objects.create(
+        initial_state=_json_safe(initial_state),
+        user=user if user is not None and user.is_authenticated else None,
+    )
+    if tokens:
+        _token_streams[job.job_id] = queue.Queue()
+    _get_pool().submit(_work, job.job_id)
+    return job
+
+
+def _work(job_id: str):
+    """Pool entry point: worker threads keep their own DB connections, so tidy them around each job."""
+    close_old_connections()
+    try:
+        run_agent_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def run_config(thread_id: str = None) -> dict:
+    """Graph config for one run; checkpoints are saved under thread_id (a fresh id when not given)."""
+    return {"configurable": {"thread_id": thread_id or uuid.uuid4().hex}}
+
+
+def timing_trace(timings: list) -> dict:
+    """
+    Summarizes the per-node timings of a run: each node's start offset and duration, the wall time
+    from the first start to the last finish, and the sum of durations (the wall time if run one by one).
+    """
+    if not timings:
+        return {"nodes": [], "wall_ms": 0.0, "sequential_ms": 0.0}
+    timings = sorted(timings, key=lambda timing: timing["started"])
+    first = timings[0]["started"]
+    return {
+        "nodes": [{"node": timing["node"], "offset_ms": round((timing["started"] - first) * 1000, 1),
+                   "ms": timing["ms"]} for timing in timings],
+        "wall_ms": round(max((timing["started"] - first) * 1000 + timing["ms"] for timing in timings), 1),
+        "sequential_ms": round(sum(timing["ms"] for timing in timings), 1),
+    }
+
+
+def _stream_events(graph_input, config: dict, state: dict, tokens: bool):
+    state = _json_safe(state)
+    timings = []
+    stream_mode = ["updates", "messages"] if tokens else ["updates"]
+    for mode, chunk in _get_executor().stream(graph_input, config=config, stream_mode=stream_mode):
+        if mode == "messages":
+            message, metadata = chunk
+            if getattr(message, "content", None):
+                yield {"event": "token", "node": metadata.get("langgraph_node"), "content": message.content}
+            continue
+        for node, node_state in chunk.items():
+            node_state = _json_safe(node_state or {})
+            timings.extend(node_state.pop("timings", []))
+            changed = {key: value for key, value in node_state.items() if state.get(key) != value}
+            state.update(node_state)
+            yield {"event": "node", "node": node, "output": changed}
+    trace = timing_trace(timings)
+    print(f"⏱️ {len(trace['nodes'])} nodes in {trace['wall_ms']}ms (sequential {trace['sequential_ms']}ms)")
+    yield {"event": "result", "result": state.get("result", "⚠️ No response generated"), "error": state.get("error"),
+           "timings": trace}
+
+
+def graph_events(initial_state: dict, tokens: bool = False, thread_id: str = None):
+    """
+    Runs the graph and yields progress events as they happen:
+    {"event": "node", "node", "output"} with the state keys each node changed,
+    {"event": "token", "node", "content"} for LLM output (when tokens=True), and finally
+    {"event": "result", "result", "error", "timings"} (see timing_trace).
+    Exceptions from the graph propagate to the caller.
+    Each step is checkpointed under thread_id, so a failed run can be continued with resume_events().
+    """
+    yield from _stream_events(initial_state, run_config(thread_id), initial_state, tokens)
+
+
+def resume_point(thread_id: str):
+    """
+    Where a run stopped: (node, snapshot) with the node to re-run and the checkpointed state it gets,
+    or None when the run finished cleanly. A run stops either on an exception (the latest checkpoint
+    still has a next node) or on a node that set "error" (resumed from the checkpoint before that node).
+    When one of several parallel branches raised, the node is that branch; the others kept their results.
+    """
+    executor = _get_executor()
+    snapshot = executor.get_state(run_config(thread_id))
+    if not snapshot.values and not snapshot.next:
+        return None
+    if snapshot.next:
+        failed = [task.name for task in snapshot.tasks if task.error]
+        return (failed or snapshot.next)[0], snapshot
+    if not snapshot.values.get("error"):
+        return None
+
+    # Walk back to the first checkpoint carrying the error; its parent is the state before the failing node
+    failed = snapshot
+    while failed.parent_config:
+        parent = executor.get_state(failed.parent_config)
+        if not parent.values.get("error"):
+            return parent.next[0], parent
+        failed = parent
+    return None
+
+
+def update_resume_state(thread_id: str, updates: dict) -> str:
+    """
+    Merges updates (e.g. a corrected budget) into the state a stopped run resumes with.
+    Returns the node the run will resume from; raises ValueError when there is nothing to resume.
+    """
+    point = resume_point(thread_id)
+    if point is None:
+        raise ValueError("Run not found or it finished without an error; nothing to resume.")
+    node, snapshot = point
+    # Recorded as written by the step before the failing one, so the graph still continues at `node`
+    writer = next(iter(snapshot.metadata.get("writes") or {}), None)
+    _get_executor().update_state(snapshot.config, updates, as_node=writer)
+    return node
+
+
+def resume_events(thread_id: str, updates: dict = None, tokens: bool = False):
+    """
+    Continues a stopped run from the node that failed, reusing the checkpointed state of every
+    step before it (product, audience, campaign, ...), so upstream LLM and Meta calls aren't repeated.
+    Yields the same events as graph_events; raises ValueError when there is nothing to resume.
+    """
+    if updates:
+        update_resume_state(thread_id, updates)
+    point = resume_point(thread_id)
+    if point is None:
+        raise ValueError("Run not found or it finished without an error; nothing to resume.")
+    node, snapshot = point
+    config = snapshot.config
+    if config == _get_executor().get_state(run_config(thread_id)).config:
+        # Continuing the latest checkpoint by thread alone keeps the writes of parallel branches that
+        # finished; with a checkpoint_id LangGraph replays that step from scratch
+        config = run_config(thread_id)
+
+    print(f"🔁 Resuming run {thread_id} from {node}")
+    yield {"event": "resume", "node": node}
+    yield from _stream_events(None, config, snapshot.values, tokens)
+
+
+def resume_agent_job(job: agent_models.AgentJob, updates: dict = None) -> str:
+    """
+    Requeues a failed job to continue from its failing node (see resume_events).
+    Returns that node; raises ValueError if the job isn't failed or has nothing to resume.
+    """
+    if job.status != "failed":
+        raise ValueError(f"Only failed jobs can be resumed; this job is {job.status}.")
+    if updates:
+        node = update_resume_state(job.job_id, updates)
+    else:
+        point = resume_point(job.job_id)
+        if point is None:
+            raise ValueError("Job has no checkpoint to resume from.")
+        node = point[0]
+
+    claimed = agent_models.AgentJob.objects.filter(job_id=job.job_id, status="failed").update(
+        status="queued", error=None, finished_at=None
+    )
+    if claimed:
+        _get_pool().submit(_work, job.job_id)
+    return node
+
+
+def run_agent_job(job_id: str):
+    """
+    Runs the graph for one job, saving each node's changes as it completes.
+    A job whose run stopped part-way (it was resumed) continues from its checkpoint instead of starting over.
+    """
+    # Claim the job; another process may have picked it up during recovery
+    claimed = agent_models.AgentJob.objects.filter(job_id=job_id, status="queued").update(
+        status="running", started_at=timezone.now()
+    )
+    if not claimed:
+        return
+    job = agent_models.AgentJob.objects.get(job_id=job_id)
+
+    tokens = job_id in _token_streams
+    try:
+        # The job id doubles as the run's checkpoint thread
+        if resume_point(job_id):
+            events = resume_events(job_id, tokens=tokens)
+        else:
+            events = graph_events(job.initial_state, tokens=tokens, thread_id=job_id)
+        for event in events:
+            if event["event"] == "node":
+                agent_models.AgentJobStep.objects.create(job=job, node=event["node"], output=event["output"])
+            elif event["event"] == "token":
+                # Gone once the stream following the job has closed
+                stream = _token_streams.get(job_id)
+                if stream is not None:
+                    stream.put(event)
+            elif event["event"] == "result":
+                job.result = event["result"]
+                job.error = str(event["error"]) if event["error"] else None
+    except Exception as e:
+        print(f"❌ Agent job {job_id} failed: {e}")
+        print(traceback.format_exc())
+        job.status = "failed"
+        job.error = str(e)
+    else:
+        # A node that set "error" stopped the run; the job can be resumed from it
+        job.status = "failed" if job.error else "succeeded"
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "error", "finished_at"])
+    prune_expired_checkpoints()
+
+
+def _drain(stream) -> list:
+    events = []
+    while stream is not None:
+        try:
+            events.append(stream.get_nowait())
+        except queue.Empty:
+            break
+    return events
+
+
+def tail_agent_job(job_id: str, heartbeat_seconds: float = None, poll_seconds: float = AGENT_STREAM_POLL_SECONDS):
+    """
+    Follows a job until it finishes, yielding graph_events-style events from what the worker saves:
+    {"event": "node"} per AgentJobStep, {"event": "token"} when the job was enqueued in this process
+    with tokens=True, and finally {"event": "result", "job_id", "result", "error"}.
+    Yields None after heartbeat_seconds without an event, for keep-alives.
+    The run itself happens on the job pool, so it carries on if the follower disconnects.
+    """
+    tokens = _token_streams.get(job_id)
+    last_step, last_event = 0, time.monotonic()
+    try:
+        while True:
+            # Status before steps, so every step of a finished job is read
+            job = agent_models.AgentJob.objects.get(job_id=job_id)
+            steps = list(job.steps.filter(id__gt=last_step).order_by("id"))
+            events = _drain(tokens) + [{"event": "node", "node": step.node, "output": step.output} for step in steps]
+            if steps:
+                last_step = steps[-1].id
+            if job.status in FINISHED_JOB_STATUSES:
+                events.append({"event": "result", "job_id": job.job_id, "result": job.result, "error": job.error})
+            yield from events
+
+            if job.status in FINISHED_JOB_STATUSES:
+                return
+            if events:
+                last_event = time.monotonic()
+            elif heartbeat_seconds and time.monotonic() - last_event >= heartbeat_seconds:
+                last_event = time.monotonic()
+                yield None
+
+            if tokens is None:
+                time.sleep(poll_seconds)
+                continue
+            # Tokens are passed on as they arrive, between polls
+            deadline = time.monotonic() + poll_seconds
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    yield tokens.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                last_event = time.monotonic()
+    finally:
+        _token_streams.pop(job_id, None)
+
+
+def job_payload(job: agent_models.AgentJob, after_step: int = None) -> dict:
+    """Status response for a job; after_step limits steps to those newer than that step id."""
+    steps = job.steps.all()
+    if after_step:
+        steps = steps.filter(id__gt=after_step)
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "steps": [
+            {"id": step.id, "node": step.node, "output": step.output, "created_at": step.created_at}
+            for step in steps
+        ],
+    }
@@ -0,0 +1,144 @@
+import os
+import time
+import uuid
+import threading
+import traceback
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.html import escape
+
+from agent import models as agent_models
+
+
+# How long the dispatcher waits after an alert arrives, so the rest of a burst lands in the same digest
+ALERT_DIGEST_DELAY_SECONDS = float(os.getenv("ALERT_DIGEST_DELAY_SECONDS", "10"))
+# Alerts claimed this long ago but never marked sent or failed (the dispatching process died) are sent again
+ALERT_CLAIM_TIMEOUT_SECONDS = int(os.getenv("ALERT_CLAIM_TIMEOUT_SECONDS", "900"))
+# A run still open after this long (its process died) stops holding back its alerts
+ALERT_RUN_TIMEOUT_MINUTES = int(os.getenv("ALERT_RUN_TIMEOUT_MINUTES", "60"))
+
+_run = ContextVar("alert_run", default="")
+
+_wakeup = threading.Event()
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+@contextmanager
+def alert_run(run_id: str = None):
+    """
+    Groups the alerts queued inside the block (e.g. one optimization pass) into a single digest,
+    sent once the block ends. Yields the run id.
+    """
+    run_id = run_id or uuid.uuid4().hex
+    token = _run.set(run_id)
+    # Recorded in the database, so dispatchers in other processes hold the run's alerts too
+    agent_models.AlertRun.objects.update_or_create(
+        run_id=run_id, defaults={"started_at": timezone.now(), "finished_at": None}
+    )
+    try:
+        yield run_id
+    finally:
+        _run.reset(token)
+        agent_models.AlertRun.objects.filter(run_id=run_id).update(finished_at=timezone.now())
+        _wake()
+
+
+def queue_alert(subject, html_message="") -> agent_models.AlertOutbox:
+    """
+    Adds an alert to the outbox and returns at once; a background dispatcher emails it.
+    Alerts queued within alert_run() share one digest, others are coalesced with whatever
+    arrives within ALERT_DIGEST_DELAY_SECONDS.
+    """
+    alert = agent_models.AlertOutbox.objects.create(
+        run_id=_run.get(), subject=str(subject)[:255], html_message=str(html_message)
+    )
+    if not _run.get():
+        _wake()
+    return alert
+
+
+def _digest(alerts):
+    if len(alerts) == 1:
+        return alerts[0].subject, alerts[0].html_message
+    sections = "".join(
+        f"<h3>{escape(alert.subject)}</h3>{alert.html_message}<hr>" for alert in alerts
+    )
+    return f"🔔 Genesis: {len(alerts)} campaign alerts", f"<h2>🔔 {len(alerts)} campaign alerts</h2>{sections}"
+
+
+def dispatch_alerts() -> int:
+    """
+    Emails every queued alert whose run has finished, one digest per run; returns the number of emails sent.
+    Alerts whose email fails are marked failed with the error. Alerts a crashed dispatcher left
+    "sending" for ALERT_CLAIM_TIMEOUT_SECONDS are picked up again.
+    """
+    now = timezone.now()
+    open_runs = agent_models.AlertRun.objects.filter(
+        finished_at__isnull=True, started_at__gte=now - timedelta(minutes=ALERT_RUN_TIMEOUT_MINUTES)
+    ).values("run_id")
+    stale = now - timedelta(seconds=ALERT_CLAIM_TIMEOUT_SECONDS)
+    claimable = Q(status="queued") | Q(status="sending") & (Q(claimed_at__lt=stale) | Q(claimed_at__isnull=True))
+    # One UPDATE claims the alerts under this dispatch's token, so concurrent dispatchers never share a row
+    claim = uuid.uuid4().hex
+    claimed = agent_models.AlertOutbox.objects.filter(claimable).exclude(run_id__in=open_runs)\
+        .update(status="sending", claimed_by=claim, claimed_at=now)
+    if not claimed:
+        return 0
+
+    runs = defaultdict(list)
+    for alert in agent_models.AlertOutbox.objects.filter(claimed_by=claim, status="sending"):
+        runs[alert.run_id].append(alert)
+
+    sent = 0
+    for alerts in runs.values():
+        subject, html_message = _digest(alerts)
+        # Limited to this claim, in case a slow send was taken over after the timeout
+        run_alerts = agent_models.AlertOutbox.objects.filter(id__in=[alert.id for alert in alerts], claimed_by=claim)
+        try:
+            send_mail(subject=subject, message="", from_email=settings.FROM_EMAIL,
+                      recipient_list=[settings.FROM_EMAIL], fail_silently=False, html_message=html_message)
+        except Exception as e:
+            print(f"❌ Alert digest failed: {e}")
+            run_alerts.update(status="failed", error=str(e))
+            continue
+        run_alerts.update(status="sent", sent_at=timezone.now())
+        sent += 1
+    return sent
+
+
+def _dispatch_loop():
+    while True:
+        # Also wakes up periodically, to retry expired claims and release alerts of abandoned runs
+        _wakeup.wait(ALERT_CLAIM_TIMEOUT_SECONDS)
+        time.sleep(ALERT_DIGEST_DELAY_SECONDS)
+        _wakeup.clear()
+        close_old_connections()
+        try:
+            sent = dispatch_alerts()
+            if sent:
+                print(f"📨 Sent {sent} alert digest(s)")
+        except Exception as e:
+            print(f"❌ Alert dispatcher error: {e}")
+            print(traceback.format_exc())
+        finally:
+            close_old_connections()
+
+
+def _wake():
+    """Starts the dispatcher thread on first use (it also picks up alerts left queued by an earlier process)."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = threading.Thread(target=_dispatch_loop, name="alert-dispatcher", daemon=True)
+                _dispatcher.start()
+    _wakeup.set()
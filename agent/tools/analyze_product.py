@@ -1,14 +1,14 @@
 from agent.tools.rag_setup import setup_product_rag_chroma
 from langchain.chains import RetrievalQA
-from langchain.chat_models import ChatOpenAI
 from agent.tools.system_prompt import analyze_system_prompt
 from agent.tools.optimization.campaign_log import get_product_specific_logs
+from agent.tools.history_digest import history_prompt
 from agent import models as agent_models
 import os
 from dotenv import load_dotenv
 import json
 from langchain.tools import tool
-from openai import OpenAI
+from agent.tools.llm_provider import get_chat_model, lazy_chat_model
 import re
 
 load_dotenv()
@@ -16,7 +16,7 @@ db_name = os.getenv("CHROMA_DB_BASE_PATH", "./chroma_db")
 persist_dir = db_name  # or another env variable if you want
 MODEL = os.getenv("GPT_MODEL", "gpt-4o-mini")
 
-llm = ChatOpenAI(model=MODEL, temperature=0)
+llm = lazy_chat_model(MODEL, temperature=0)
 openai_api_key = os.getenv('OPENAI_API_KEY')
 anthropic_api_key = os.getenv('ANTHROPIC_API_KEY')
 google_api_key = os.getenv('GOOGLE_API_KEY')
@@ -38,22 +38,9 @@ def analyze_product_audience(product_data: dict)->dict:
     print("🔍 product_data keys:", product_data.keys())
     print("📦 product_data full:", product_data)
     product_id = product_data.get("product_id")
-    product = agent_models.Product.objects.get(product_id=product_id)
-    logs = agent_models.OptimizationLog.objects.filter(product=product)
-
-    if logs:
-        past_logs_prompt = "\n\n".join([
-            f"""📊 Campaign Snapshot:
-    Platform: {log['platform']} | Ad Type: {log['ad_type']}
-    Audience: {', '.join(log['audience'].get('interests', []))}
-    Budget: ${log['budget']} | Price: ${log['product_price']}
-    📈 ROAS: {log.get('roas')} | CVR: {log.get('conversion_rate')}
-    🎯 Action Taken: {log['action_taken']} → Reason: {log['reason']}
-    """
-            for log in logs[:5]
-        ])
-    else:
-        past_logs_prompt = "No past campaign logs available for this product."
+    # The digest is kept current as logs and metrics are written, so the history block stays the same size
+    product = agent_models.Product.objects.select_related("history_digest").get(product_id=product_id)
+    past_logs_prompt = history_prompt(product)
 
     #add
     prompt = f"""
@@ -73,7 +60,7 @@ def analyze_product_audience(product_data: dict)->dict:
     {json.dumps(product_data.get("benefits", []), indent=2)}
 
     📁 Past Campaign History:
-    {past_logs_prompt if logs else ""}
+    {past_logs_prompt}
 
     ---
     
@@ -168,7 +155,7 @@ def analyze_product_audience(product_data: dict)->dict:
 
 def fetch_product_from_prompt_analyzer(user_prompt: str):
     vs = setup_product_rag_chroma()
-    llm = ChatOpenAI(temperature=0.7, model_name=MODEL)
+    llm = get_chat_model(MODEL, temperature=0.7)
     retriever = vs.as_retriever(search_kwargs={"k": 5})
     qa_chain = RetrievalQA.from_chain_type(
             llm=llm,
@@ -80,23 +80,14 @@ class SEOBlogGenerator:
         Path(self.config['posts_dir']).mkdir(parents=True, exist_ok=True)
 
     def fetch_product(self, name):
-        all_products = Product.objects.all()
-        if not all_products:
-            logger.warning("⚠️ No products in the database")
-            return None
-
-        scored = [
-            (product, fuzzy_score(name, product.name))
-            for product in all_products
-        ]
+        from agent.tools.product_resolver import resolve_product
 
-        scored.sort(key=lambda x: x[1], reverse=True)
-        best_match, score = scored[0]
-        if score < 0.4:
-            logger.warning(f"⚠️ Low match confidence ({score:.2f}) for: {name}")
+        best_match = resolve_product(name)
+        if not best_match:
+            logger.warning(f"⚠️ No product matched: {name}")
             return None
 
-        logger.info(f"✅ Matched '{name}' to product: '{best_match.name}' (score: {score:.2f})")
+        logger.info(f"✅ Matched '{name}' to product: '{best_match.name}'")
         return best_match
 
     def generate_seo_keywords(self, topic, product_name):
@@ -42,7 +42,6 @@ db_name = os.getenv("CHROMA_DB_BASE_PATH", "./chroma_db")
 persist_dir = db_name  # or another env variable if you want
 MODEL = os.getenv("GPT_MODEL", "gpt-4o-mini")
 
-openai = OpenAI()
 openai_api_key = os.getenv('OPENAI_API_KEY')
 anthropic_api_key = os.getenv('ANTHROPIC_API_KEY')
 google_api_key = os.getenv('GOOGLE_API_KEY')
@@ -0,0 +1,161 @@
+import threading
+from datetime import timedelta
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from django.utils import timezone
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.serde.types import TASKS
+
+from agent import models as agent_models
+
+
+class DjangoCheckpointSaver(BaseCheckpointSaver):
+    """
+    Stores LangGraph checkpoints in the app database (AgentCheckpoint / AgentCheckpointWrite),
+    so every step of a run survives restarts and a failed run can be resumed; see agent_jobs.resume_events.
+    Same layout as LangGraph's in-memory saver, one row per checkpoint and per pending write.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Parallel branches save their writes from several threads at once; SQLite takes one writer at a time
+        self._write_lock = threading.Lock()
+
+    def _tuple(self, row: agent_models.AgentCheckpoint) -> CheckpointTuple:
+        writes = agent_models.AgentCheckpointWrite.objects.filter(
+            thread_id=row.thread_id, checkpoint_ns=row.checkpoint_ns, checkpoint_id=row.checkpoint_id
+        ).order_by("id")
+        sends = []
+        if row.parent_checkpoint_id:
+            sends = [
+                self.serde.loads_typed((write.value_type, bytes(write.value)))
+                for write in agent_models.AgentCheckpointWrite.objects.filter(
+                    thread_id=row.thread_id, checkpoint_ns=row.checkpoint_ns,
+                    checkpoint_id=row.parent_checkpoint_id, channel=TASKS,
+                ).order_by("id")
+            ]
+
+        def config(checkpoint_id):
+            return {"configurable": {"thread_id": row.thread_id, "checkpoint_ns": row.checkpoint_ns,
+                                     "checkpoint_id": checkpoint_id}}
+
+        return CheckpointTuple(
+            config=config(row.checkpoint_id),
+            checkpoint={
+                **self.serde.loads_typed((row.checkpoint_type, bytes(row.checkpoint))),
+                "pending_sends": sends,
+            },
+            metadata=self.serde.loads_typed((row.metadata_type, bytes(row.metadata))),
+            parent_config=config(row.parent_checkpoint_id) if row.parent_checkpoint_id else None,
+            pending_writes=[
+                (write.task_id, write.channel, self.serde.loads_typed((write.value_type, bytes(write.value))))
+                for write in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        rows = agent_models.AgentCheckpoint.objects.filter(
+            thread_id=config["configurable"]["thread_id"],
+            checkpoint_ns=config["configurable"].get("checkpoint_ns", ""),
+        )
+        if checkpoint_id := get_checkpoint_id(config):
+            rows = rows.filter(checkpoint_id=checkpoint_id)
+        # Checkpoint ids are time-ordered (uuid6), so the largest is the latest
+        row = rows.order_by("-checkpoint_id").first()
+        return self._tuple(row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        rows = agent_models.AgentCheckpoint.objects.order_by("-checkpoint_id")
+        if config:
+            rows = rows.filter(thread_id=config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                rows = rows.filter(checkpoint_ns=config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                rows = rows.filter(checkpoint_id=checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            rows = rows.filter(checkpoint_id__lt=before_id)
+
+        for row in rows.iterator():
+            if limit is not None and limit <= 0:
+                break
+            checkpoint_tuple = self._tuple(row)
+            if filter and not all(checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        checkpoint = {key: value for key, value in checkpoint.items() if key != "pending_sends"}
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(metadata)
+        with self._write_lock:
+            agent_models.AgentCheckpoint.objects.update_or_create(
+                thread_id=thread_id, checkpoint_ns=checkpoint_ns, checkpoint_id=checkpoint["id"],
+                defaults={
+                    "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
+                    "checkpoint_type": checkpoint_type,
+                    "checkpoint": checkpoint_blob,
+                    "metadata_type": metadata_type,
+                    "metadata": metadata_blob,
+                },
+            )
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str) -> None:
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            value_type, value_blob = self.serde.dumps_typed(value)
+            rows.append(agent_models.AgentCheckpointWrite(
+                thread_id=config["configurable"]["thread_id"],
+                checkpoint_ns=config["configurable"]["checkpoint_ns"],
+                checkpoint_id=config["configurable"]["checkpoint_id"],
+                task_id=task_id, idx=WRITES_IDX_MAP.get(channel, idx),
+                channel=channel, value_type=value_type, value=value_blob,
+            ))
+        with self._write_lock:
+            agent_models.AgentCheckpointWrite.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"],
+                update_fields=["channel", "value_type", "value"],
+            )
+
+
+def prune_checkpoints(days: int) -> int:
+    """Deletes checkpoints (and their writes) of runs whose latest step is older than `days`; returns runs removed."""
+    cutoff = timezone.now() - timedelta(days=days)
+    recent = agent_models.AgentCheckpoint.objects.filter(created_at__gte=cutoff).values("thread_id")
+    stale = list(agent_models.AgentCheckpoint.objects.exclude(thread_id__in=recent)
+                 .values_list("thread_id", flat=True).distinct())
+    # In batches: SQLite caps the parameters of one query
+    for start in range(0, len(stale), 500):
+        batch = stale[start:start + 500]
+        agent_models.AgentCheckpointWrite.objects.filter(thread_id__in=batch).delete()
+        agent_models.AgentCheckpoint.objects.filter(thread_id__in=batch).delete()
+    return len(stale)
@@ -33,13 +33,14 @@ import django
 django.setup()
 
 from agent import models as agent_models
+from agent.tools.vector_store import get_product_vectorstore, get_campaign_vectorstore
+from agent.tools.llm_provider import get_chat_model
 load_dotenv()
 campaign_db_name = os.getenv("CHROMA_DB_BASE_PATH_CAMPAIGN", "./chroma_campaign_db")
 db_name = os.getenv("CHROMA_DB_BASE_PATH", "./chroma_db")
 persist_dir = db_name  # or another env variable if you want
 MODEL = os.getenv("GPT_MODEL", "gpt-4o-mini")
 openai_api_key= os.getenv("OPENAI_API_KEY")  # or hardcode as 'sk-...'
-openai = OpenAI(api_key=openai_api_key)
 
 def fetch_product_by_name(product_name: str) -> Dict:
     """
@@ -47,16 +48,14 @@ def fetch_product_by_name(product_name: str) -> Dict:
     Returns the full product metadata: title, description, features, etc.
     which can be passed into other tools.
     """
-    embeddings = OpenAIEmbeddings()
-
-    # Load vector store
-    vectorstore = Chroma(persist_directory="./chroma_db", embedding_function=embeddings)
+    # Shared, already-open vector store (see agent.tools.vector_store)
+    vectorstore = get_product_vectorstore()
 
     # Search for most similar product
     retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 1})
     results = retriever.invoke(product_name)
-    print('check',results[0].page_content)
     if results:
+        print('check',results[0].page_content)
         metadata = results[0].metadata
         output = {
             "title": metadata.get("name", ""),
@@ -82,11 +81,7 @@ def fetch_campaign_by_name(query: str) -> dict:
     Performs a semantic search in the campaign vector DB to find the best-matching campaign by name or description.
     Returns campaign metadata and key details.
     """
-    embeddings = OpenAIEmbeddings()
-    campaign_vectorstore = Chroma(
-        persist_directory=campaign_db_name,  # must match path used in embed_campaign()
-        embedding_function=embeddings
-    )
+    campaign_vectorstore = get_campaign_vectorstore()  # must match path used in embed_campaign()
 
     retriever = campaign_vectorstore.as_retriever(search_type="similarity",search_kwargs={"k": 1})
     results = retriever.invoke(query)
@@ -104,7 +99,7 @@ def fetch_campaign_by_name(query: str) -> dict:
     return {
         "content": best_match.page_content,
         "status": metadata.get('status'),
-        "campaign_product_name":metadat.get('campaign_product_name'),
+        "campaign_product_name":metadata.get('campaign_product_name'),
         "campaign_id": metadata.get('campaign_id'),
         "meta_campaign_id": metadata.get('meta_campaign_id'),
 
@@ -145,16 +140,12 @@ Product description: {product.description or ""}
         """
 
         try:
-            response = openai.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.9,
+            response = get_chat_model("gpt-4o-mini", temperature=0.9).invoke(
+                [{"role": "user", "content": prompt}],
                 max_tokens=300
             )
 
-            content = response.choices[0].message.content
+            content = response.content
             parsed = clean_and_parse_usecase_output(content)
 
             if "useCases" in parsed and "benefits" in parsed:
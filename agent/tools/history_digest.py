@@ -0,0 +1,144 @@
+import os
+from collections import defaultdict
+from typing import Iterable, List, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from agent import models as agent_models
+
+
+# Campaigns (best ROAS first) and optimization actions (newest first) a digest keeps
+HISTORY_TOP_CAMPAIGNS = int(os.getenv("HISTORY_TOP_CAMPAIGNS", "3"))
+HISTORY_RECENT_ACTIONS = int(os.getenv("HISTORY_RECENT_ACTIONS", "5"))
+# Interests quoted per campaign in the prompt
+HISTORY_AUDIENCE_INTERESTS = 5
+
+
+def _campaign_entry(campaign, metrics: dict) -> dict:
+    clicks = metrics.get("clicks") or 0
+    purchases = metrics.get("purchases") or 0
+    audience = campaign.audience if isinstance(campaign.audience, dict) else {}
+    return {
+        "campaign_id": campaign.id,
+        "platform": campaign.platform,
+        "ad_type": campaign.ad_type,
+        "interests": list(audience.get("interests") or [])[:HISTORY_AUDIENCE_INTERESTS],
+        "budget": float(campaign.budget or 0),
+        "roas": metrics.get("purchase_roas") or 0,
+        "ctr": metrics.get("ctr") or 0,
+        "cvr": round(purchases / clicks * 100, 2) if clicks else 0,
+    }
+
+
+def _locked_digests(product_ids) -> dict:
+    """{product_id: digest} for the products, creating missing digests; call inside a transaction."""
+    product_ids = set(product_ids)
+    digests = {digest.product_id: digest for digest in
+               agent_models.ProductHistoryDigest.objects.select_for_update().filter(product_id__in=product_ids)}
+    missing = [agent_models.ProductHistoryDigest(product_id=product_id) for product_id in product_ids - set(digests)]
+    agent_models.ProductHistoryDigest.objects.bulk_create(missing, ignore_conflicts=True)
+    if missing:
+        digests.update({digest.product_id: digest for digest in agent_models.ProductHistoryDigest.objects
+                        .select_for_update().filter(product_id__in=[digest.product_id for digest in missing])})
+    return digests
+
+
+@transaction.atomic
+def record_campaign_metrics(campaign_metrics: Iterable[Tuple[object, dict]]) -> int:
+    """
+    Folds fresh (campaign, metrics) pairs into their products' digests: the campaign's entry in
+    the top-ROAS list and its share of the CTR/CVR totals are replaced. Touches one digest row
+    per product, whatever the history size; returns the number of digests updated.
+    """
+    by_product = defaultdict(list)
+    for campaign, metrics in campaign_metrics:
+        by_product[campaign.product_id].append((campaign, metrics))
+    if not by_product:
+        return 0
+
+    digests = _locked_digests(by_product)
+    now = timezone.now()
+    for product_id, pairs in by_product.items():
+        digest = digests[product_id]
+        digest.updated_at = now
+        entries = {entry["campaign_id"]: entry for entry in digest.top_campaigns}
+        for campaign, metrics in pairs:
+            entries[campaign.id] = _campaign_entry(campaign, metrics)
+            digest.campaign_totals[str(campaign.id)] = [
+                metrics.get("impressions") or 0, metrics.get("clicks") or 0, metrics.get("purchases") or 0,
+            ]
+        digest.top_campaigns = sorted(entries.values(), key=lambda entry: entry["roas"], reverse=True)[
+            :HISTORY_TOP_CAMPAIGNS]
+        digest.impressions, digest.clicks, digest.purchases = (
+            sum(totals[i] for totals in digest.campaign_totals.values()) for i in range(3)
+        )
+    agent_models.ProductHistoryDigest.objects.bulk_update(
+        digests.values(), ["top_campaigns", "campaign_totals", "impressions", "clicks", "purchases", "updated_at"]
+    )
+    return len(digests)
+
+
+@transaction.atomic
+def record_optimization_log(log) -> None:
+    """Puts a new OptimizationLog's action at the front of its product's recent actions."""
+    if not log.product_id:
+        return
+    digest = _locked_digests([log.product_id])[log.product_id]
+    action = {
+        "action": log.action,
+        "reason": log.reason,
+        "campaign_id": log.campaign_id,
+        "timestamp": log.timestamp.isoformat() if log.timestamp else None,
+    }
+    digest.recent_actions = [action, *digest.recent_actions][:HISTORY_RECENT_ACTIONS]
+    digest.save(update_fields=["recent_actions", "updated_at"])
+
+
+def rebuild_history_digests(product_ids: List[int] = None) -> int:
+    """Recomputes digests from the stored campaigns and logs (backfill); returns the number rebuilt."""
+    campaigns = agent_models.Campaign.objects.exclude(result_metrics={})
+    products = agent_models.Product.objects.all()
+    if product_ids is not None:
+        campaigns = campaigns.filter(product_id__in=product_ids)
+        products = products.filter(id__in=product_ids)
+
+    agent_models.ProductHistoryDigest.objects.filter(product__in=products).delete()
+    record_campaign_metrics((campaign, campaign.result_metrics) for campaign in campaigns.iterator())
+    rebuilt = 0
+    for product in products.iterator():
+        logs = list(agent_models.OptimizationLog.objects.filter(product=product)
+                    .order_by("-timestamp")[:HISTORY_RECENT_ACTIONS])
+        for log in reversed(logs):
+            record_optimization_log(log)
+        rebuilt += 1
+    return rebuilt
+
+
+def history_prompt(product) -> str:
+    """
+    The "Past Campaign History" block of a launch prompt, from the product's digest alone
+    (fetch the product with select_related("history_digest") to avoid a second query).
+    """
+    try:
+        digest = product.history_digest
+    except agent_models.ProductHistoryDigest.DoesNotExist:
+        digest = None
+    if digest is None or not (digest.top_campaigns or digest.recent_actions):
+        return "No past campaign logs available for this product."
+
+    ctr = digest.clicks / digest.impressions * 100 if digest.impressions else 0
+    cvr = digest.purchases / digest.clicks * 100 if digest.clicks else 0
+    lines = [f"Across {len(digest.campaign_totals)} campaigns: CTR {ctr:.2f}% | CVR {cvr:.2f}%"]
+    if digest.top_campaigns:
+        lines.append("🏆 Best campaigns by ROAS:")
+        lines += [
+            f"- Platform: {entry['platform']} | Ad Type: {entry['ad_type']} | Budget: ${entry['budget']:g}\n"
+            f"  📈 ROAS: {entry['roas']} | CTR: {entry['ctr']}% | CVR: {entry['cvr']}%\n"
+            f"  Audience: {', '.join(entry['interests']) or 'n/a'}"
+            for entry in digest.top_campaigns
+        ]
+    if digest.recent_actions:
+        lines.append("🎯 Latest actions:")
+        lines += [f"- {action['action']} → Reason: {action['reason']}" for action in digest.recent_actions]
+    return "\n".join(lines)
@@ -0,0 +1,164 @@
+import re
+import threading
+from typing import Dict, Optional
+
+
+# Chat UI command types -> graph intents
+COMMAND_INTENTS = {
+    "google_scrape": "google_scrape",
+    "instagram_scraping": "instagram_scrape",
+    "send_email": "send_email",
+    "send_outreach": "send_outreach",
+    "followup_outreach": "followup_outreach",
+    "warmup_emails": "warmup_emails",
+    "launch_campaign": "launch_campaign",
+    "publish_blog_post": "publish_blog_post",
+    "check_indexing_status": "check_indexing_status",
+}
+
+# Fields a command's args may set directly
+COMMAND_FIELDS = ("product_name", "budget", "campaign_id", "date_range", "batch_size", "delay_minutes",
+                  "niche", "location", "recipient_list", "message", "topic")
+
+# Fields each intent needs before its node can run without the LLM's extraction
+REQUIRED_FIELDS = {
+    "launch_campaign": ("product_name",),
+    "send_outreach": ("niche",),
+    "followup_outreach": ("niche",),
+    "instagram_scrape": ("niche",),
+    "google_scrape": ("niche", "location"),
+    "send_email": ("recipient_list", "message"),
+    "publish_blog_post": ("product_name", "topic"),
+}
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+
+# Free-text phrasings, checked in order; the first match wins
+KEYWORD_RULES = [
+    ("warmup_emails", re.compile(r"\bwarm(?:\s|-)?up\b.*\b(?:emails?|inbox(?:es)?)\b", re.I)),
+    ("check_indexing_status", re.compile(r"\b(?:check|verify)\b.*\bindex(?:ed|ing)?\b", re.I)),
+    ("google_scrape", re.compile(r"\bscrape\s+google(?:\s+maps)?\s+(?:for\s+)?(?P<text>.+)", re.I)),
+    ("instagram_scrape", re.compile(r"\bscrape\s+instagram\s+(?:for\s+)?(?P<text>.+)", re.I)),
+    ("followup_outreach", re.compile(r"\bsend\s+(?:a\s+)?follow(?:\s|-)?up\s+outreach\s+(?:emails?\s+)?to\s+(?P<text>.+)", re.I)),
+    ("send_outreach", re.compile(r"\bsend\s+(?:cold\s+)?outreach\s+(?:emails?\s+)?to\s+(?P<text>.+)", re.I)),
+    ("send_email", re.compile(r"\bsend\s+(?:an?\s+)?email\s+to\s+(?P<text>.+)", re.I)),
+    ("launch_campaign", re.compile(r"\b(?:launch|start|run|create)\s+(?:an?\s+|the\s+|new\s+)*(?:ad\s+)?campaign\s+(?:for|of|on)\s+(?P<text>.+)", re.I)),
+    ("publish_blog_post", re.compile(r"\b(?:generate|write|publish)\b.*\bblog\s+post\s+(?:for|on|about)\s+(?P<text>.+)", re.I)),
+]
+
+# "with a $50 budget", "at $20 a day", "budget of 50" trailing a campaign's product name
+BUDGET_RE = re.compile(
+    r"[\s,]+(?:(?:with|at|for|on|using)\s+)?(?:an?\s+|the\s+)?(?:(?:daily|total)\s+)?"
+    r"(?:budget\s+(?:of\s+)?\$?\s?(?P<amount>\d[\d,]*(?:\.\d+)?)"
+    r"|\$\s?(?P<dollars>\d[\d,]*(?:\.\d+)?)(?:\s*(?:usd|dollars?))?(?:\s+(?:daily\s+|total\s+)?budget)?)"
+    r"(?:\s+(?:(?:a|per)\s+day|daily))?",
+    re.I,
+)
+# Platform and scheduling qualifiers the rules don't extract; campaigns mentioning them go to the LLM
+PLATFORMS = r"(?:facebook|instagram|meta|fb|ig|tiktok|google|youtube)"
+CAMPAIGN_QUALIFIER_RE = re.compile(
+    rf"^{PLATFORMS}\b|\b(?:on|via|across|using|through)\s+{PLATFORMS}\b"
+    r"|\b(?:starting|beginning|from|until|till|ending)\b|\b(?:today|tonight|tomorrow|weekend)\b"
+    r"|\b(?:next|this)\s+(?:week|month|monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b"
+    r"|\bfor\s+(?:\d+|a|one|two|three)\s+(?:days?|weeks?|months?)\b",
+    re.I,
+)
+
+_stats = {"structured": 0, "keyword": 0, "llm": 0}
+_stats_lock = threading.Lock()
+
+
+def _clean(text: str) -> str:
+    return (text or "").strip().strip(".!?\"'").strip()
+
+
+def _fields_for(intent: str, text: str) -> Dict:
+    """
+    Extracts what it can of an intent's fields from its free-text argument.
+    Callers check REQUIRED_FIELDS; anything incomplete goes to the LLM.
+    """
+    text = _clean(text)
+
+    if intent in ("warmup_emails", "check_indexing_status"):
+        return {}
+    if not text:
+        return {}
+
+    if intent == "launch_campaign":
+        return _campaign_fields(text)
+    if intent in ("send_outreach", "followup_outreach", "instagram_scrape"):
+        return {"niche": text}
+    if intent == "google_scrape":
+        match = re.match(r"(?P<niche>.+?)\s+(?:in|near|around)\s+(?P<location>.+)", text, re.I)
+        return {"niche": match["niche"], "location": _clean(match["location"])} if match else {"niche": text}
+    if intent == "send_email":
+        recipients = EMAIL_RE.findall(text)
+        message = re.sub(r"^\W*(?:and\s+)?(?:saying|with(?:\s+the)?\s+message|that\s+says)?\W*", "",
+                         EMAIL_RE.sub("", text).strip(" ,;:"), flags=re.I)
+        return {"recipient_list": recipients, "message": _clean(message)}
+    if intent == "publish_blog_post":
+        match = re.match(r"(?P<product>.+?)\s+(?:about|on|covering)\s+(?P<topic>.+)", text, re.I)
+        return {"product_name": match["product"], "topic": _clean(match["topic"])} if match else {"product_name": text}
+    return {}
+
+
+def _campaign_fields(text: str) -> Dict:
+    """Product name plus any budget; nothing when platform or date qualifiers would be lost in the name."""
+    budgets = list(BUDGET_RE.finditer(text))
+    if len(budgets) > 1:
+        return {}
+    fields = {}
+    if budgets:
+        match = budgets[0]
+        fields["budget"] = float((match["amount"] or match["dollars"]).replace(",", ""))
+        text = _clean(text[:match.start()] + text[match.end():])
+    if not text or CAMPAIGN_QUALIFIER_RE.search(text):
+        return {}
+    return {"product_name": text, **fields}
+
+
+def _complete(intent: str, fields: Dict) -> bool:
+    return all(fields.get(key) for key in REQUIRED_FIELDS.get(intent, ()))
+
+
+def route_command(command_type: str, args: Dict) -> Optional[Dict]:
+    """
+    Maps a structured {"type", "args"} chat command straight to intent fields, no model call.
+    Explicit args (product_name, topic, niche, ...) win over what is parsed from args["input"].
+    Returns None when the command is unknown or its input can't be parsed.
+    """
+    intent = COMMAND_INTENTS.get(command_type)
+    if not intent:
+        return None
+
+    explicit = {key: args[key] for key in COMMAND_FIELDS if args.get(key) not in (None, "")}
+    fields = {**_fields_for(intent, args.get("input", "")), **explicit}
+    if not _complete(intent, fields):
+        return None
+    return {"detected_intent": intent, **fields}
+
+
+def route_text(user_input: str) -> Optional[Dict]:
+    """Keyword classifier for common free-text phrasings. Returns intent fields, or None to fall back to the LLM."""
+    for intent, pattern in KEYWORD_RULES:
+        match = pattern.search(user_input or "")
+        if not match:
+            continue
+        fields = _fields_for(intent, match.groupdict().get("text", ""))
+        return {"detected_intent": intent, **fields} if _complete(intent, fields) else None
+    return None
+
+
+def record_intent_source(source: str):
+    with _stats_lock:
+        _stats[source] += 1
+
+
+def intent_stats() -> Dict:
+    """How intents were resolved in this process, and the share that needed no LLM call."""
+    with _stats_lock:
+        stats = dict(_stats)
+    total = sum(stats.values())
+    stats["total"] = total
+    stats["resolved_without_llm"] = round((stats["structured"] + stats["keyword"]) / total, 3) if total else 0.0
+    return stats
@@ -1,4 +1,4 @@
-from langchain_openai import ChatOpenAI
+from agent.tools.llm_provider import get_chat_model
 
 from langchain.agents import (
     create_openai_functions_agent,
@@ -79,7 +79,7 @@ run_optimization,
 
 # LLM
 
-llm = ChatOpenAI("gpt-4", model_provider="openai")
+llm = get_chat_model("gpt-4")
 # Wrap tools
 
 # Prompt
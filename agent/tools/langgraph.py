@@ -1,4 +1,3 @@
-from langchain_openai import ChatOpenAI
 
 
 from langgraph.graph.message import add_messages
@@ -6,55 +5,66 @@ from langchain.output_parsers import StructuredOutputParser,PydanticOutputParser
 
 from pydantic import BaseModel,Field
 from langgraph.graph import StateGraph,END
-from langchain_community.chat_models import ChatOpenAI
 from langchain_core.messages import HumanMessage
-from typing import TypedDict, Optional, Dict, Any
-
-
-from agent.tools.rag_setup import *
-from agent.tools.campaign import *
-from agent.tools.launch_campaign import *
-from agent.tools.analyze_product import *
-from agent.tools.fetch_product_by_name import *
-from agent.tools.product_manager import *
-from agent.tools.ad_platform import *
-from agent.tools.database_update import *
-from agent.tools.utils.date_parser import *
-from agent.tools.optimization.metric_fetcher import *
-from agent.tools.optimization.metrics_analyzer import *
-from agent.tools.optimization.decision_maker import *
-from agent.tools.optimization.campaign_modifier import *
-from agent.tools.optimization.campaign_analytics import *
-from agent.tools.optimization.scheduler import *
-from agent.tools.backdoor.email_compose.cold_outreach import *
-from agent.tools.backdoor.email_compose.outreach_followup import *
-from agent.tools.backdoor.seo_generator.seo_blog_generator import *
-from agent.tools.backdoor.seo_generator.check_index_status import *
-
-from agent.tools.backdoor.email_compose.inbox_warmup import *
-from agent.tools.backdoor.scraper import google_map_scraping,instagram_scraping
-from agent.tools.utils.send_email_update import send_emails
-
-from langchain.chat_models import init_chat_model
-import json,os,random
-from langchain.memory import ConversationBufferMemory
+from typing import Annotated, TypedDict, Optional, Dict, Any
+
+
+from agent import models as agent_models
+from agent.tools.product_resolver import fetch_product
+from agent.tools.intent_router import route_text, record_intent_source, intent_stats
+from agent.tools.registry import lazy_tool
+from agent.tools.llm_provider import lazy_chat_model
+from agent.tools.checkpointer import DjangoCheckpointSaver
+
+import json,operator,os,random,re,time
 from django.urls import reverse
 from django.conf import settings
 from django.utils.html import escape
 from django.core.mail import EmailMultiAlternatives
 
 
-test_leads = [
-    MockLead(email="michaelogaje033@gmail.com", username="coachmike", niche="fitness",
-             bio="Helping people burn fat at home with zero equipment."),
-    MockLead(email="kennkiyoshi@gmail.com", username="fitkenn", niche="fitness",
-             bio="Helping people build muscle with zero equipment."),
-    MockLead(email="owi.09.12.02@gmail.com", username="yogaowi", niche="fitness",
-             bio="Helping people build stamina."),
-    MockLead(email="unitorial111@gmail.com", username="yogaowi", niche="fitness",
-             bio="Helping people select the best nutrition for bodybuilding"),
-
-]
+# Tool implementations are imported the first time a node calls them (see agent.tools.registry)
+analyze_product_audience = lazy_tool("analyze_product_audience")
+create_campaign_from_analysis = lazy_tool("create_campaign_from_analysis")
+create_campaign_on_meta = lazy_tool("create_campaign_on_meta")
+ads_set_meta = lazy_tool("ads_set_meta")
+resolve_audience_targeting = lazy_tool("resolve_audience_targeting")
+prepare_ad_creative = lazy_tool("prepare_ad_creative")
+create_ad_creative = lazy_tool("create_ad_creative")
+create_ad = lazy_tool("create_ad")
+generate_product_adcopy_and_headline_cta = lazy_tool("generate_product_adcopy_and_headline_cta")
+generate_campaign_summary = lazy_tool("generate_campaign_summary")
+fetch_campaign_metrics = lazy_tool("fetch_campaign_metrics")
+analyze_campaign_metrics = lazy_tool("analyze_campaign_metrics")
+decide_campaign_action = lazy_tool("decide_campaign_action")
+modify_campaign_from_decision = lazy_tool("modify_campaign_from_decision")
+EmailOutreachManager = lazy_tool("EmailOutreachManager")
+EmailFollowUpManager = lazy_tool("EmailFollowUpManager")
+EmailWarmUpManager = lazy_tool("EmailWarmUpManager")
+MockLead = lazy_tool("MockLead")
+filter_valid_leads = lazy_tool("filter_valid_leads")
+load_smtp_configs = lazy_tool("load_smtp_configs")
+setup_django = lazy_tool("setup_django")
+google_map_scraping = lazy_tool("google_map_scraping")
+instagram_scraping = lazy_tool("instagram_scraping")
+SEOBlogGenerator = lazy_tool("SEOBlogGenerator")
+fetch_sitemap_urls = lazy_tool("fetch_sitemap_urls")
+check_indexed = lazy_tool("check_indexed")
+send_alert = lazy_tool("send_alert")
+
+
+def _test_leads():
+    return [
+        MockLead(email="michaelogaje033@gmail.com", username="coachmike", niche="fitness",
+                 bio="Helping people burn fat at home with zero equipment."),
+        MockLead(email="kennkiyoshi@gmail.com", username="fitkenn", niche="fitness",
+                 bio="Helping people build muscle with zero equipment."),
+        MockLead(email="owi.09.12.02@gmail.com", username="yogaowi", niche="fitness",
+                 bio="Helping people build stamina."),
+        MockLead(email="unitorial111@gmail.com", username="yogaowi", niche="fitness",
+                 bio="Helping people select the best nutrition for bodybuilding"),
+
+    ]
 
 # === 1. SHARED STATE ===
 class CampaignAgentState(TypedDict):
@@ -71,6 +81,7 @@ class CampaignAgentState(TypedDict):
     campaign: dict
     adset_payload: dict
     meta_adset_id: str
+    creative_payload: dict
     meta_creative_id: str
     headline: str
     final_ad: dict
@@ -83,12 +94,15 @@ class CampaignAgentState(TypedDict):
     message: Optional[str] = ""
     result: Optional[str]  # ✅ Add this
     topic: Optional[str] = ""
+    error: Optional[Any]  # set by the node that failed; a launch stops there and can be resumed
+    targeting_ids: dict
+    timings: Annotated[list, operator.add]  # one entry per node run, see _timed
 
 
 
 
 # === 2. LLM SETUP ===
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+llm = lazy_chat_model("gpt-4o-mini", temperature=0)
 
 # === 3. INTENT PARSER MODEL ===
 class IntentSchema(BaseModel):
@@ -108,9 +122,29 @@ class IntentSchema(BaseModel):
 parser = PydanticOutputParser(pydantic_object=IntentSchema)
 
 
+def _routed_intent(state, routed, source):
+    """Fill in IntentSchema defaults so routed requests look like LLM-parsed ones downstream."""
+    record_intent_source(source)
+    stats = intent_stats()
+    print(f"⚡ Intent resolved without LLM ({source}): {routed['detected_intent']} "
+          f"— {stats['resolved_without_llm']:.0%} of {stats['total']} requests so far")
+    return {**state, **IntentSchema(**routed).dict()}
+
+
 def intent_node(state: CampaignAgentState) -> CampaignAgentState:
     print("🧠 Running: intent_node")
     user_input = state["user_input"]
+
+    # Structured commands arrive with their intent set (see agent.views.build_initial_state)
+    if state.get("detected_intent"):
+        routed = {key: value for key, value in state.items() if key in IntentSchema.model_fields}
+        return _routed_intent(state, routed, "structured")
+
+    routed = route_text(user_input)
+    if routed:
+        return _routed_intent(state, routed, "keyword")
+
+    record_intent_source("llm")
     response = llm.invoke([
         HumanMessage(content=f"""
         Classify the user request and extract relevant fields.
@@ -147,7 +181,10 @@ def intent_node(state: CampaignAgentState) -> CampaignAgentState:
 def fetch_product_node(state):
     print("📦 Running: fetch_product_node")
     try:
-        product = fetch_product_by_name(state["product_name"])
+        # Exact/slug → trigram → vector search (see agent.tools.product_resolver)
+        product = fetch_product(state["product_name"])
+        if "error" in product:
+            return {**state, "error": product["error"]}
         print("✅ Raw product fetched:", product.get("title"))
 
         # Try to extract JSON block from description
@@ -186,15 +223,34 @@ def analyze_audience_node(state):
         return {**state, "error": str(e)}
 
 
+# Launch branches: generate_adcopy, resolve_targeting and prepare_creative run concurrently after
+# create_campaign. Each returns only its own keys (parallel writes to one key would conflict) and
+# raises instead of setting "error": the branches that finished keep their writes in the checkpoint,
+# so resuming re-runs only the branch that failed.
+
 def generate_adcopy_node(state):
     print("✍️ Running: generate_adcopy_node")
-    try:
-        adcopy = generate_product_adcopy_and_headline_cta(state["campaign"]["campaign_id"])
-        print("✅ Ad copy generated")
-        return {**state, "adcopy": adcopy}
-    except Exception as e:
-        print("❌ Error in generate_adcopy_node:", e)
-        return {**state, "error": str(e)}
+    adcopy = generate_product_adcopy_and_headline_cta(state["campaign"]["campaign_id"])
+    print("✅ Ad copy generated")
+    return {"adcopy": adcopy}
+
+
+def resolve_targeting_node(state):
+    print("🎯 Running: resolve_targeting_node")
+    targeting_ids = resolve_audience_targeting(state["campaign"])
+    print("✅ Targeting resolved:", {kind: len(ids) for kind, ids in targeting_ids.items()})
+    return {"targeting_ids": targeting_ids}
+
+
+def prepare_creative_node(state):
+    print("🎨 Running: prepare_creative_node")
+    # Only the payload: nothing is created on Meta before the ad set exists (see create_creative_node)
+    creative = prepare_ad_creative(state["campaign"]["campaign_id"])
+    if isinstance(creative, dict):
+        raise RuntimeError(f"{creative.get('error')}: {creative.get('details', '')}".rstrip(": "))
+    creative_payload, headline = creative
+    print("✅ Creative prepared:", creative_payload.get("name"))
+    return {"creative_payload": creative_payload, "headline": headline}
 
 
 
@@ -251,7 +307,9 @@ def create_campaign_on_meta_node(state):
     print("📡 Running: create_campaign_on_meta_node")
     try:
         campaign_payload = state["campaign"]
-        adset_payload = create_campaign_on_meta(campaign_payload)
+        adset_payload = create_campaign_on_meta(campaign_payload, state.get("targeting_ids"))
+        if "error" in adset_payload:
+            return {**state, "error": adset_payload}
         print("✅ Meta campaign + adset payload created")
         return {**state, "adset_payload": adset_payload}
     except Exception as e:
@@ -271,15 +329,17 @@ def ads_set_meta_node(state):
         return {**state, "error": str(e)}
 
 
-def ad_creative_node(state):
-    print("🎨 Running: ad_creative_node")
+def create_creative_node(state):
+    print("🎨 Running: create_creative_node")
     try:
-        adset_payload = state["adset_payload"]
-        meta_creative_id, headline = ad_creative(adset_payload)
+        creative = create_ad_creative(state["campaign"]["campaign_id"], state["creative_payload"], state["headline"])
+        if isinstance(creative, dict):
+            return {**state, "error": creative}
+        meta_creative_id, headline = creative
         print("✅ Creative created:", meta_creative_id)
         return {**state, "meta_creative_id": meta_creative_id, "headline": headline}
     except Exception as e:
-        print("❌ Error in ad_creative_node:", e)
+        print("❌ Error in create_creative_node:", e)
         return {**state, "error": str(e)}
 
 
@@ -440,7 +500,7 @@ def warmup_email_node(state: dict) -> dict:
         manager = EmailWarmUpManager(smtp_configs)
 
         # Filter valid leads
-        valid_leads = filter_valid_leads(test_leads)
+        valid_leads = filter_valid_leads(_test_leads())
 
         if not valid_leads:
             print("No valid leads found. Please check your test data.")
@@ -604,37 +664,51 @@ def seo_indexing_node(state: Dict) -> Dict:
 
 
 
+def _timed(name, node):
+    """Wraps a node so each run appends {"node", "started", "ms"} to state["timings"] (see agent_jobs.timing_trace)."""
+    def run(state):
+        started = time.time()
+        update = node(state)
+        # Nodes that return {**state, ...} would otherwise append every earlier timing again
+        update = {key: value for key, value in (update or {}).items() if key != "timings"}
+        update["timings"] = [{"node": name, "started": started, "ms": round((time.time() - started) * 1000, 1)}]
+        return update
+    return run
+
+
 # === 6. BUILD THE GRAPH ===
 graph = StateGraph(CampaignAgentState)
 
 # Add all nodes
-graph.add_node("intent_node", intent_node)
-graph.add_node("fetch_product", fetch_product_node)
-graph.add_node("analyze_audience", analyze_audience_node)
-graph.add_node("create_campaign", create_campaign_node)
-graph.add_node("generate_adcopy", generate_adcopy_node)
-graph.add_node("create_campaign_on_meta", create_campaign_on_meta_node)
-graph.add_node("ads_set_meta", ads_set_meta_node)
-graph.add_node("ad_creative", ad_creative_node)
-graph.add_node("create_ad", create_ad_node)
-graph.add_node("summarize_campaign", summarize_campaign_node)
-graph.add_node("fetch_metrics", fetch_metrics_node)
-graph.add_node("metrics_analyzer", metrics_analyzer_node)
-graph.add_node("decide_campaign_action", decide_campaign_action_node)
-graph.add_node("modify_campaign_from_decision", modify_campaign_from_decision_node)
+graph.add_node("intent_node", _timed("intent_node", intent_node))
+graph.add_node("fetch_product", _timed("fetch_product", fetch_product_node))
+graph.add_node("analyze_audience", _timed("analyze_audience", analyze_audience_node))
+graph.add_node("create_campaign", _timed("create_campaign", create_campaign_node))
+graph.add_node("generate_adcopy", _timed("generate_adcopy", generate_adcopy_node))
+graph.add_node("create_campaign_on_meta", _timed("create_campaign_on_meta", create_campaign_on_meta_node))
+graph.add_node("ads_set_meta", _timed("ads_set_meta", ads_set_meta_node))
+graph.add_node("resolve_targeting", _timed("resolve_targeting", resolve_targeting_node))
+graph.add_node("prepare_creative", _timed("prepare_creative", prepare_creative_node))
+graph.add_node("create_creative", _timed("create_creative", create_creative_node))
+graph.add_node("create_ad", _timed("create_ad", create_ad_node))
+graph.add_node("summarize_campaign", _timed("summarize_campaign", summarize_campaign_node))
+graph.add_node("fetch_metrics", _timed("fetch_metrics", fetch_metrics_node))
+graph.add_node("metrics_analyzer", _timed("metrics_analyzer", metrics_analyzer_node))
+graph.add_node("decide_campaign_action", _timed("decide_campaign_action", decide_campaign_action_node))
+graph.add_node("modify_campaign_from_decision", _timed("modify_campaign_from_decision", modify_campaign_from_decision_node))
 #graph.add_node("optimize_campaign_node", optimize_campaign_node)
-graph.add_node("send_outreach", email_outreach_node)
-graph.add_node("followup_outreach", followup_outreach_node)
+graph.add_node("send_outreach", _timed("send_outreach", email_outreach_node))
+graph.add_node("followup_outreach", _timed("followup_outreach", followup_outreach_node))
 
 
-graph.add_node("warmup_emails", warmup_email_node)
+graph.add_node("warmup_emails", _timed("warmup_emails", warmup_email_node))
 
-graph.add_node("google_scraping", google_maps_scraping_node)
-graph.add_node("instagram_scraping", instagram_scraping_node)
-graph.add_node("publish_blog_post", generate_seo_blog_node)
-graph.add_node("check_indexing_status", seo_indexing_node)
+graph.add_node("google_scraping", _timed("google_scraping", google_maps_scraping_node))
+graph.add_node("instagram_scraping", _timed("instagram_scraping", instagram_scraping_node))
+graph.add_node("publish_blog_post", _timed("publish_blog_post", generate_seo_blog_node))
+graph.add_node("check_indexing_status", _timed("check_indexing_status", seo_indexing_node))
 
-graph.add_node("send_email", send_email_node)
+graph.add_node("send_email", _timed("send_email", send_email_node))
 
 
 
@@ -665,13 +739,26 @@ graph.add_conditional_edges(
 )
 
 # Launch Campaign
-graph.add_edge("fetch_product", "analyze_audience")
-graph.add_edge("analyze_audience", "create_campaign")
-graph.add_edge("create_campaign", "generate_adcopy")
-graph.add_edge("generate_adcopy", "create_campaign_on_meta")
-graph.add_edge("create_campaign_on_meta", "ads_set_meta")
-graph.add_edge("ads_set_meta", "ad_creative")
-graph.add_edge("ad_creative", "create_ad")
+# fetch_product → analyze_audience → create_campaign
+#   → generate_adcopy | resolve_targeting | prepare_creative (concurrently)
+#   → create_campaign_on_meta → ads_set_meta → create_creative → create_ad
+# prepare_creative only builds the creative payload; it is created on Meta after the ad set,
+# so a launch that fails earlier leaves no orphan creative on the ad account
+LAUNCH_BRANCHES = ["generate_adcopy", "resolve_targeting", "prepare_creative"]
+
+
+def _next_launch_step(next_step):
+    # A failed step ends the run there, so it can be resumed from that node (see agent_jobs.resume_events)
+    return lambda state: END if state.get("error") else next_step
+
+
+graph.add_conditional_edges("fetch_product", _next_launch_step("analyze_audience"), ["analyze_audience", END])
+graph.add_conditional_edges("analyze_audience", _next_launch_step("create_campaign"), ["create_campaign", END])
+graph.add_conditional_edges("create_campaign", _next_launch_step(LAUNCH_BRANCHES), [*LAUNCH_BRANCHES, END])
+graph.add_edge(LAUNCH_BRANCHES, "create_campaign_on_meta")  # waits for all three branches
+graph.add_conditional_edges("create_campaign_on_meta", _next_launch_step("ads_set_meta"), ["ads_set_meta", END])
+graph.add_conditional_edges("ads_set_meta", _next_launch_step("create_creative"), ["create_creative", END])
+graph.add_conditional_edges("create_creative", _next_launch_step("create_ad"), ["create_ad", END])
 graph.add_edge("create_ad", END)
 
 # Summarize Campaign
@@ -707,7 +794,8 @@ graph.add_edge("decide_campaign_action", "modify_campaign_from_decision")
 graph.add_edge("modify_campaign_from_decision", END)
 
 # === 5. COMPILE ===
-campaign_agent_executor = graph.compile()
+# Every step is checkpointed per run (thread_id); runs need a config from agent_jobs.run_config()
+campaign_agent_executor = graph.compile(checkpointer=DjangoCheckpointSaver())
 
 
 
@@ -9,7 +9,9 @@ import glob
 from dotenv import load_dotenv
 # imports for langchain, plotly and Chroma
 from agent.tools.system_prompt import analyze_system_prompt
-from agent.tools.optimization.scheduler import send_campaign_alert
+from agent.tools.alert_outbox import queue_alert
+from agent.tools.meta_client import meta_api
+from agent.tools.targeting_cache import resolve_targeting
 
 from openai import OpenAI
 from datetime import datetime, timedelta, timezone
@@ -76,65 +78,41 @@ PAGE_ACCESS_TOKEN = os.getenv("PAGE_ACCESS_TOKEN")
 def fetch_interests(interests: List[str]) -> List[Dict]:
     """
         Fetch interest IDs from Meta Marketing API given a list of interest names.
+        Cached names resolve from the targeting cache; the rest go out as one batch request.
         Returns a list of dictionaries with 'id' and 'name'.
         """
-    results = []
-    for interest in interests:
-        r = requests.get(
-            "https://graph.facebook.com/v19.0/search",
-            params={
-                "q": interest,
-                "type": "adinterest",
-                "access_token": ACCESS_TOKEN
-            }
-        )
-        data = r.json().get("data", [])
-        if data:
-            results.append({"id": data[0]["id"], "name": data[0]["name"]})
+    results = resolve_targeting({"interest": interests})["interest"]
     print("🎯 Fetched Interest IDs:", results)
     return results
 
 #@tool
-def fetch_behaviors(behaviors: List[str], limit=25) -> List[Dict]:
+def fetch_behaviors(behaviors: List[str]) -> List[Dict]:
     """
-    Fetch Meta Ads targeting behavior IDs from the Graph API based on behavior names.
+    Fetch Meta Ads targeting behavior IDs based on behavior names.
+    Cached names resolve from the targeting cache; the rest go out as one batch request.
 
     Args:
         behaviors (list[str]): List of behavior keywords to search for.
-        limit (int): Max results to return per behavior search (default: 25).
 
     Returns:
-        List[dict]: Each dict contains id, name, and audience size bounds.
+        List[dict]: Each dict contains id and name.
     """
-    META_ACCESS_TOKEN = os.getenv('SYSTEM_ACCESS_TOKEN')
-    results = []
-
-    for behavior in behaviors:
-        r = requests.get(
-            "https://graph.facebook.com/v19.0/search",
-            params={
-                "q": behavior,
-                "type": "adTargetingCategory",
-                "class": "behaviors",
-                "limit": limit,
-                "access_token": META_ACCESS_TOKEN
-            }
-        )
-        data = r.json().get("data", [])
-        if data:
-            behavior_data = data[0]  # Use the first match
-            results.append({
-                "id": behavior_data.get("id"),
-                "name": behavior_data.get("name"),
-                })
+    return resolve_targeting({"behavior": behaviors})["behavior"]
+
+def resolve_audience_targeting(campaign_payload):
+    """Meta interest and behavior IDs for a campaign payload's audience: {"interest": [...], "behavior": [...]}."""
+    return resolve_targeting({
+        "interest": campaign_payload["audience"].get("interests", []),
+        "behavior": campaign_payload["audience"].get("behaviors", []),
+    })
 
-    return results
 
 #@tool
-def create_campaign_on_meta(campaign_payload):
+def create_campaign_on_meta(campaign_payload, targeting_ids=None):
     """
     Creates a campaign on Meta's ad platform using the given campaign dict.
     Also prepares ad set payload with targeting details (interest, gender, age, geo, behaviors).
+    targeting_ids is resolve_targeting() output for the audience, when it was looked up beforehand.
     Returns the ad set payload and the created meta campaign ID.
     """
     headers = {
@@ -174,7 +152,7 @@ def create_campaign_on_meta(campaign_payload):
     }
 
     campaign_url = f"{BASE_URL}/act_{AD_ACCOUNT_ID}/campaigns"
-    campaign_response = requests.post(campaign_url, data=payload, headers=headers)
+    campaign_response = meta_api.post(campaign_url, data=payload, headers=headers)
     campaign_data = campaign_response.json()
     print("🧱 Campaign Response:", campaign_data)
 
@@ -186,14 +164,11 @@ def create_campaign_on_meta(campaign_payload):
     campaign.save()
 
     
-    # === 2. Fetch Interest IDs ===
-    raw_interests = campaign_payload["audience"].get("interests", [])
-    interest_objs = fetch_interests(raw_interests)
-
-
-    # === 3 Fetch behavior ids ==
-    raw_behaviors = campaign_payload["audience"].get("behaviors", [])
-    behavior_objs = fetch_behaviors(raw_behaviors)
+    # === 2. Resolve interest and behavior IDs (cache first, one batch request for the rest) ===
+    resolved = targeting_ids or resolve_audience_targeting(campaign_payload)
+    interest_objs = resolved["interest"]
+    behavior_objs = resolved["behavior"]
+    print("🎯 Fetched Interest IDs:", interest_objs)
 
 
     # === 3. Create Ad Set Payload ===
@@ -256,7 +231,7 @@ def ads_set_meta(adset_payload):
     meta_payload = {k: v for k, v in adset_payload.items() if k != "creatives"}
 
     adset_url = f"{BASE_URL}/act_{AD_ACCOUNT_ID}/adsets"
-    adset_response = requests.post(adset_url, json=meta_payload, headers=headers)
+    adset_response = meta_api.post(adset_url, json=meta_payload, headers=headers)
     adset_data = adset_response.json()
     print("🎯 Ad Set Response:", adset_data)
 
@@ -278,11 +253,6 @@ def ad_creative(adset_payload):
     Requires the campaign to have at least one creative with a valid image/video link.
     Returns the Meta creative ID if successful.
     """
-    headers = {
-        "Authorization": f"Bearer {PAGE_ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    page_id = os.getenv("fb_page_id")  # ensure this is loaded correctly
     meta_campaign_id = adset_payload.get('campaign_id')
     if not meta_campaign_id:
         return {"error": "meta_campaign_id not provided in adset_payload"}
@@ -292,6 +262,48 @@ def ad_creative(adset_payload):
         campaign = agent_models.Campaign.objects.get(meta_campaign_id=meta_campaign_id)
     except agent_models.Campaign.DoesNotExist:
         return {"error": "Campaign not found"}
+    return _create_ad_creative(campaign)
+
+
+def prepare_ad_creative(campaign_id):
+    """
+    Builds and checks the Meta Ad Creative payload for a campaign (by its own campaign_id) without
+    calling Meta, so the launch graph can do it alongside copy and targeting. The creative itself is
+    only created by create_ad_creative once the ad set exists, so a failed launch leaves nothing behind.
+    Returns (creative_payload, headline) or an error dict.
+    """
+    try:
+        campaign = agent_models.Campaign.objects.get(campaign_id=campaign_id)
+    except agent_models.Campaign.DoesNotExist:
+        return {"error": "Campaign not found"}
+    return _creative_payload(campaign)
+
+
+def create_ad_creative(campaign_id, creative_payload, headline):
+    """
+    Creates the creative prepared by prepare_ad_creative on Meta. A creative already created for the
+    campaign (by a launch that failed at the ad step) is reused, so resuming doesn't add another.
+    Returns (meta_creative_id, headline) or an error dict.
+    """
+    try:
+        campaign = agent_models.Campaign.objects.get(campaign_id=campaign_id)
+    except agent_models.Campaign.DoesNotExist:
+        return {"error": "Campaign not found"}
+    if campaign.meta_creative_id:
+        print("♻️ Reusing meta_creative_id:", campaign.meta_creative_id)
+        return campaign.meta_creative_id, headline
+    return _post_ad_creative(campaign, creative_payload, headline)
+
+
+def _create_ad_creative(campaign):
+    prepared = _creative_payload(campaign)
+    if isinstance(prepared, dict):
+        return prepared
+    return _post_ad_creative(campaign, *prepared)
+
+
+def _creative_payload(campaign):
+    page_id = os.getenv("fb_page_id")  # ensure this is loaded correctly
 
     if not campaign.campaign_files or len(campaign.campaign_files) == 0:
         return {"error": "No creative file info in campaign.campaign_files"}
@@ -347,9 +359,16 @@ def ad_creative(adset_payload):
             media_spec_key: media_spec
         }
     }
+    return creative_payload, headline
+
 
+def _post_ad_creative(campaign, creative_payload, headline):
+    headers = {
+        "Authorization": f"Bearer {PAGE_ACCESS_TOKEN}",
+        "Content-Type": "application/json"
+    }
     creative_url = f"{BASE_URL}/act_{AD_ACCOUNT_ID}/adcreatives"
-    creative_response = requests.post(creative_url, json=creative_payload, headers=headers)
+    creative_response = meta_api.post(creative_url, json=creative_payload, headers=headers)
     creative_data = creative_response.json()
     print("🎨 Creative Response:", creative_data)
 
@@ -388,11 +407,10 @@ def create_ad(headline, meta_adset_id=None, meta_creative_id=None):
     }
 
     print("📦 Ad Payload:", payload)
-    from agent.tools.backdoor.optimization.scheduler import send_campaign_alert
     subject = "Campaign launced successfully on Meta💪"
     message = "Genesis Ai just launched a campaign"
-    send_campaign_alert()
-    response = requests.post(url, json=payload, headers=headers)
+    queue_alert(subject, message)
+    response = meta_api.post(url, json=payload, headers=headers)
     print(response)
     print("📨 Ad API Response:", response.status_code, response.text)
 
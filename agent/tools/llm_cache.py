@@ -0,0 +1,167 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from dotenv import load_dotenv
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration
+
+
+load_dotenv()
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./data/cache/llm_cache.sqlite3")
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "24"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+_skip = ContextVar("skip_llm_cache", default=False)
+
+
+@contextmanager
+def skip_llm_cache():
+    """Calls made inside this block go to the model; their fresh responses still replace the cached ones."""
+    token = _skip.set(True)
+    try:
+        yield
+    finally:
+        _skip.reset(token)
+
+
+def _prepare_path(cache_path: str) -> str:
+    """Creates the cache file's directory (data/cache by default) so a fresh checkout can open it."""
+    if cache_path != ":memory:" and os.path.dirname(cache_path):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    return cache_path
+
+
+def _normalize(value):
+    # Prompts are mostly indented f-strings; layout changes shouldn't miss the cache
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip()
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    return value
+
+
+class LLMResponseCache(BaseCache):
+    """
+    Disk-backed LangChain cache for deterministic chat model calls.
+    Responses are keyed by the model's parameter string + sha256 of the whitespace-normalized prompt,
+    expire after ttl_hours and are evicted least-recently-used beyond max_entries.
+    """
+
+    def __init__(self, cache_path: str = None, ttl_hours: float = LLM_CACHE_TTL_HOURS,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        cache_path = cache_path or LLM_CACHE_PATH
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(_prepare_path(cache_path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.commit()
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        try:
+            prompt = json.dumps(_normalize(json.loads(prompt)), sort_keys=True)
+        except ValueError:
+            prompt = _normalize(prompt)
+        return hashlib.sha256(f"{llm_string}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str):
+        if _skip.get():
+            with self._lock:
+                self.skipped += 1
+            return None
+
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at > ?", (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row:
+                self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not row:
+            return None
+
+        generations = []
+        for message in messages_from_dict(json.loads(row[0])):
+            # Lets usage counters tell a cached answer from a paid one
+            message.response_metadata = {**message.response_metadata, "llm_cache_hit": True}
+            generations.append(ChatGeneration(message=message))
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        messages = [generation.message for generation in return_val if hasattr(generation, "message")]
+        if len(messages) != len(return_val):
+            return  # plain-text completions aren't produced in this app; don't half-cache them
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (self._key(prompt, llm_string), json.dumps([message_to_dict(m) for m in messages]), now, now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl_seconds,))
+            overflow = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used LIMIT ?)", (overflow,)
+                )
+            self._conn.commit()
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            hits, misses, skipped = self.hits, self.misses, self.skipped
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "skipped": skipped,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "entries": entries,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_cache(cache_path: str = None) -> LLMResponseCache:
+    """Process-wide response cache for a path (default LLM_CACHE_PATH; ":memory:" for one that isn't persisted)."""
+    cache_path = cache_path or LLM_CACHE_PATH
+    if cache_path not in _caches:
+        with _caches_lock:
+            if cache_path not in _caches:
+                _caches[cache_path] = LLMResponseCache(cache_path)
+    return _caches[cache_path]
+
+
+def llm_cache_stats() -> dict:
+    """Hit/miss counters for the response caches used in this process."""
+    return {path: cache.stats() for path, cache in _caches.items()}
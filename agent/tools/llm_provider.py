@@ -0,0 +1,200 @@
+import os
+import time
+import threading
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from agent.tools.llm_cache import LLM_CACHE_ENABLED, get_llm_cache
+
+
+load_dotenv()
+DEFAULT_MODEL = os.getenv("GPT_MODEL", "gpt-4o-mini")
+# Connections kept open to the OpenAI API, shared by every chat model in the process
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+
+def llm_backend() -> str:
+    """Either "openai" (default) or "stub" for offline runs; read on every call so tests can switch it."""
+    return os.getenv("LLM_BACKEND", "openai").lower()
+
+
+class _UsageRecorder(BaseCallbackHandler):
+    """Times every call made through one chat model and adds up the tokens it reports."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self._started = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                if message is not None and message.response_metadata.get("llm_cache_hit"):
+                    self._started.pop(run_id, None)
+                    _record(self.model, 0.0, cached=True)
+                    return
+                usage = getattr(message, "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        _record(self.model, self._elapsed_ms(run_id), input_tokens, output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        _record(self.model, self._elapsed_ms(run_id), error=True)
+
+    def _elapsed_ms(self, run_id) -> float:
+        started = self._started.pop(run_id, None)
+        return (time.perf_counter() - started) * 1000 if started else 0.0
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Offline chat model used when LLM_BACKEND=stub. Replies are taken in order from
+    set_stub_replies(); once they run out every call answers with "{}".
+    """
+
+    model_name: str = DEFAULT_MODEL
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        with _stub_lock:
+            reply = _stub_replies.pop(0) if _stub_replies else "{}"
+        prompt_words = sum(len(str(message.content).split()) for message in messages)
+        message = AIMessage(content=reply, usage_metadata={
+            "input_tokens": prompt_words,
+            "output_tokens": len(reply.split()),
+            "total_tokens": prompt_words + len(reply.split()),
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+_stub_replies: List[str] = []
+_stub_lock = threading.Lock()
+
+
+def set_stub_replies(*replies: str):
+    """Queues the replies the stub backend gives to its next calls (replacing any left over)."""
+    with _stub_lock:
+        _stub_replies[:] = list(replies)
+
+
+_http_client = None
+_models = {}
+_models_lock = threading.Lock()
+
+
+def _get_http_client():
+    global _http_client
+    if _http_client is None:
+        import httpx
+        _http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_POOL_SIZE),
+            timeout=LLM_TIMEOUT,
+        )
+    return _http_client
+
+
+def get_chat_model(model: str = None, temperature: float = 0) -> BaseChatModel:
+    """
+    Process-wide chat model for (model, temperature), created on first use.
+    All OpenAI models share one HTTP connection pool; every call is counted in llm_stats().
+    temperature=0 models answer repeated prompts from the response cache (see agent.tools.llm_cache).
+    """
+    model = model or DEFAULT_MODEL
+    key = (llm_backend(), model, temperature)
+    if key not in _models:
+        with _models_lock:
+            if key not in _models:
+                callbacks = [_UsageRecorder(model)]
+                # Stub replies aren't worth keeping between runs
+                cache_path = ":memory:" if key[0] == "stub" else None
+                cache = False
+                if temperature == 0 and LLM_CACHE_ENABLED:
+                    cache = get_llm_cache(cache_path) if cache_path else get_llm_cache()
+                if key[0] == "stub":
+                    _models[key] = StubChatModel(model_name=model, callbacks=callbacks, cache=cache)
+                else:
+                    from langchain_openai import ChatOpenAI
+                    _models[key] = ChatOpenAI(
+                        model=model, temperature=temperature, api_key=os.getenv("OPENAI_API_KEY"),
+                        http_client=_get_http_client(), max_retries=LLM_MAX_RETRIES,
+                        stream_usage=True, callbacks=callbacks, cache=cache,
+                    )
+    return _models[key]
+
+
+class LazyChatModel:
+    """
+    Module-level stand-in for a chat model: `llm = lazy_chat_model(...)` costs nothing at import
+    and resolves to get_chat_model() on first attribute access (llm.invoke, llm.stream, ...).
+    """
+
+    def __init__(self, model: str = None, temperature: float = 0):
+        self.model = model
+        self.temperature = temperature
+
+    def __getattr__(self, attr):
+        return getattr(get_chat_model(self.model, self.temperature), attr)
+
+    def __repr__(self):
+        return f"<LazyChatModel {self.model or DEFAULT_MODEL} temperature={self.temperature}>"
+
+
+def lazy_chat_model(model: str = None, temperature: float = 0) -> LazyChatModel:
+    return LazyChatModel(model, temperature)
+
+
+_stats: Dict[str, Dict[str, Any]] = {}
+_stats_lock = threading.Lock()
+
+
+def _empty_stats() -> Dict[str, Any]:
+    return {"calls": 0, "cached": 0, "errors": 0, "input_tokens": 0, "output_tokens": 0,
+            "total_ms": 0.0, "max_ms": 0.0}
+
+
+def _record(model: str, elapsed_ms: float, input_tokens: int = 0, output_tokens: int = 0,
+            error: bool = False, cached: bool = False):
+    with _stats_lock:
+        stats = _stats.setdefault(model, _empty_stats())
+        if cached:
+            stats["cached"] += 1
+            return
+        stats["calls"] += 1
+        stats["errors"] += int(error)
+        stats["input_tokens"] += input_tokens
+        stats["output_tokens"] += output_tokens
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+
+def llm_stats(model: Optional[str] = None) -> Dict:
+    """
+    Per-model counters for this process (or one model's, if given): calls that reached the model,
+    with their tokens and latency, and calls answered from the response cache.
+    """
+    with _stats_lock:
+        snapshot = {name: dict(stats) for name, stats in _stats.items()}
+    for stats in snapshot.values():
+        stats["total_ms"] = round(stats["total_ms"], 1)
+        stats["max_ms"] = round(stats["max_ms"], 1)
+        stats["avg_ms"] = round(stats["total_ms"] / stats["calls"], 1) if stats["calls"] else 0.0
+    if model:
+        return snapshot.get(model, {**_empty_stats(), "avg_ms": 0.0})
+    return snapshot
@@ -0,0 +1,419 @@
+import os
+import re
+import json
+import time
+import random
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlencode, urlparse
+from typing import Dict, List
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+
+load_dotenv()
+BASE_URL = "https://graph.facebook.com/v23.0"
+ACCESS_TOKEN = os.getenv("SYSTEM_ACCESS_TOKEN")
+AD_ACCOUNT_ID = os.getenv("fb_ad_account_id")
+
+# Graph API accepts at most 50 operations per batch request
+META_BATCH_LIMIT = 50
+
+# Shared session settings
+META_CONNECT_TIMEOUT = float(os.getenv("META_CONNECT_TIMEOUT", "5"))
+META_READ_TIMEOUT = float(os.getenv("META_READ_TIMEOUT", "60"))
+META_POOL_SIZE = int(os.getenv("META_POOL_SIZE", "32"))
+META_MAX_RETRIES = int(os.getenv("META_MAX_RETRIES", "4"))
+META_BACKOFF_BASE = float(os.getenv("META_BACKOFF_BASE", "0.5"))
+META_BACKOFF_MAX = float(os.getenv("META_BACKOFF_MAX", "30"))
+
+# HTTP statuses and Graph API error codes worth retrying
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+THROTTLING_ERROR_CODES = {4, 17, 32, 341, 613, 80000, 80001, 80002, 80003, 80004, 80005, 80006, 80008, 80009, 80014}
+
+# Max in-flight insights requests per ad account
+ACCOUNT_MAX_CONCURRENT = int(os.getenv("META_ACCOUNT_MAX_CONCURRENT", "16"))
+# Usage % reported by Meta above which requests to that account are spaced out
+ACCOUNT_USAGE_THROTTLE_PCT = 75
+# Graph object ids whose ad account has been learned from usage headers (oldest forgotten first)
+OBJECT_ACCOUNT_CACHE_SIZE = 10000
+
+
+def _entries_usage(entries) -> tuple:
+    """(highest usage %, seconds until access is regained) of one account's business use case entries."""
+    usage, regain_seconds = 0.0, 0
+    for entry in entries:
+        usage = max(usage, float(entry.get("call_count", 0)),
+                    float(entry.get("total_cputime", 0)), float(entry.get("total_time", 0)))
+        regain_seconds = max(regain_seconds, int(entry.get("estimated_time_to_regain_access", 0)) * 60)
+    return usage, regain_seconds
+
+
+def _business_use_case_accounts(headers) -> Dict[str, tuple]:
+    """{account id: (usage %, seconds until access is regained)} from X-Business-Use-Case-Usage."""
+    try:
+        business_usage = json.loads(headers.get("X-Business-Use-Case-Usage") or "{}")
+        return {account_id: _entries_usage(entries) for account_id, entries in business_usage.items()}
+    except (ValueError, TypeError, AttributeError):
+        return {}
+
+
+def _account_usage(headers) -> tuple:
+    """
+    Reads Meta's throttling headers and returns (highest usage %, seconds until access is regained).
+    Covers X-Ad-Account-Usage and X-Business-Use-Case-Usage.
+    """
+    usage, regain_seconds = 0.0, 0
+
+    try:
+        account_usage = json.loads(headers.get("X-Ad-Account-Usage") or "{}")
+        usage = max(usage, float(account_usage.get("acc_id_util_pct", 0)))
+        regain_seconds = max(regain_seconds, int(account_usage.get("reset_time_duration", 0)))
+    except (ValueError, TypeError, AttributeError):
+        pass
+
+    for account_usage, account_regain in _business_use_case_accounts(headers).values():
+        usage, regain_seconds = max(usage, account_usage), max(regain_seconds, account_regain)
+    return usage, regain_seconds
+
+
+class AccountRateLimiter:
+    """
+    Caps concurrent requests per ad account and pauses an account
+    when Meta reports its usage is close to the throttling limit.
+    """
+
+    def __init__(self, max_concurrent: int = ACCOUNT_MAX_CONCURRENT):
+        self.max_concurrent = max_concurrent
+        self._semaphores = {}
+        self._resume_at = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, account_id):
+        with self._lock:
+            if account_id not in self._semaphores:
+                self._semaphores[account_id] = threading.Semaphore(self.max_concurrent)
+            return self._semaphores[account_id]
+
+    def _wait(self, account_id) -> float:
+        return self._resume_at.get(account_id, 0) - time.monotonic()
+
+    @contextmanager
+    def slot(self, account_id):
+        semaphore = self._semaphore(account_id)
+        while True:
+            # Back off without holding a slot, so a paused account doesn't tie up its other callers' slots
+            wait = self._wait(account_id)
+            if wait > 0:
+                print(f"⏳ Meta account {account_id} near rate limit, waiting {wait:.0f}s")
+                time.sleep(wait)
+            semaphore.acquire()
+            if self._wait(account_id) <= 0:
+                break
+            # Paused again while queued for the slot
+            semaphore.release()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def record(self, account_id, headers):
+        self.record_usage(account_id, *_account_usage(headers))
+
+    def record_usage(self, account_id, usage: float, regain_seconds: int):
+        if usage < ACCOUNT_USAGE_THROTTLE_PCT and not regain_seconds:
+            return
+        # Back off harder the closer the account is to 100%
+        delay = max(regain_seconds, (usage - ACCOUNT_USAGE_THROTTLE_PCT) / (100 - ACCOUNT_USAGE_THROTTLE_PCT) * 60)
+        with self._lock:
+            self._resume_at[account_id] = max(self._resume_at.get(account_id, 0), time.monotonic() + delay)
+
+
+def _error_code(resp):
+    try:
+        return resp.json().get("error", {}).get("code")
+    except (ValueError, AttributeError):
+        return None
+
+
+def _response_json(resp):
+    """The decoded body, or an {"error"} payload when Graph sent something else (an HTML 502, an empty body)."""
+    try:
+        return resp.json()
+    except ValueError:
+        return {"error": {"message": f"Undecodable Graph response (HTTP {resp.status_code}): {resp.text[:200]!r}"}}
+
+
+def _endpoint_name(method: str, url: str) -> str:
+    """GET https://graph.facebook.com/v23.0/act_123/insights -> GET /act_{id}/insights"""
+    path = urlparse(url).path
+    path = re.sub(r"^/v\d+\.\d+", "", path)
+    path = re.sub(r"act_\d+", "act_{id}", path)
+    path = re.sub(r"/\d+(?=/|$)", "/{id}", path)
+    return f"{method.upper()} {path or '/'}"
+
+
+class MetaClient:
+    """
+    Shared Graph API client: one pooled keep-alive session, default connect/read timeouts,
+    retries with jittered exponential backoff, throttling based on Meta's usage headers,
+    and per-endpoint latency stats.
+
+    GETs are retried on network errors, 5xx and throttling. Other methods are only retried
+    when the request never reached Meta or Meta rejected it for throttling, unless the caller
+    passes idempotent=True.
+    """
+
+    def __init__(self, pool_size: int = META_POOL_SIZE, max_retries: int = META_MAX_RETRIES,
+                 timeout=(META_CONNECT_TIMEOUT, META_READ_TIMEOUT)):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limiter = AccountRateLimiter()
+        self._object_accounts = {}
+        self._object_accounts_lock = threading.Lock()
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def _throttle_key(self, url: str, data) -> tuple:
+        """
+        (limiter key, object id) for a request: its ad account when the URL (or every operation of a
+        batch) names one, else the account Meta last billed the object's calls to, else the object
+        itself; only calls naming neither (e.g. /search) share the app-wide key.
+        """
+        batch = data.get("batch", "") if isinstance(data, dict) else ""
+        accounts = set(re.findall(r"act_(\d+)", f"{url} {batch}"))
+        if len(accounts) == 1:
+            return accounts.pop(), None
+        match = re.match(r"/(?:v\d+\.\d+/)?(\d+)(?=/|$)", urlparse(url).path)
+        if match:
+            object_id = match.group(1)
+            return self._object_accounts.get(object_id, f"object:{object_id}"), object_id
+        return "app", None
+
+    def _record_usage(self, throttle_key: str, object_id, headers):
+        self.limiter.record(throttle_key, headers)
+        # Object-level calls are billed to the ad account's business use case; throttle that account
+        accounts = _business_use_case_accounts(headers)
+        for account_id, (usage, regain_seconds) in accounts.items():
+            self.limiter.record_usage(account_id, usage, regain_seconds)
+        if object_id and len(accounts) == 1:
+            with self._object_accounts_lock:
+                if len(self._object_accounts) >= OBJECT_ACCOUNT_CACHE_SIZE:
+                    self._object_accounts.pop(next(iter(self._object_accounts)))
+                self._object_accounts[object_id] = next(iter(accounts))
+
+    def _backoff(self, attempt: int, resp=None) -> float:
+        # Full jitter: uniform in [0, base * 2^attempt], capped
+        delay = random.uniform(0, min(META_BACKOFF_MAX, META_BACKOFF_BASE * (2 ** attempt)))
+        if resp is not None:
+            retry_after = resp.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+        return delay
+
+    def _record(self, endpoint: str, elapsed: float, failed: bool, retried: bool):
+        with self._stats_lock:
+            stats = self._stats.setdefault(endpoint, {"calls": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["calls"] += 1
+            stats["errors"] += int(failed)
+            stats["retries"] += int(retried)
+            stats["total_ms"] += elapsed * 1000
+            stats["max_ms"] = max(stats["max_ms"], elapsed * 1000)
+
+    def request(self, method: str, url: str, idempotent: bool = None, **kwargs) -> requests.Response:
+        """Same signature as requests.request; returns the final response once retries are exhausted."""
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in ("GET", "HEAD", "DELETE")
+        kwargs.setdefault("timeout", self.timeout)
+        endpoint = _endpoint_name(method, url)
+        throttle_key, object_id = self._throttle_key(url, kwargs.get("data"))
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            resp = None
+            try:
+                with self.limiter.slot(throttle_key):
+                    resp = self.session.request(method, url, **kwargs)
+            except requests.ConnectionError as e:
+                # Only a connect timeout is known not to have reached Meta, so only it is retried for any
+                # method; other connection errors (e.g. a reset) may come after the request was sent
+                error, retryable = e, idempotent or isinstance(e, requests.ConnectTimeout)
+            except requests.Timeout as e:
+                error, retryable = e, idempotent
+            else:
+                error = None
+                self._record_usage(throttle_key, object_id, resp.headers)
+                throttled = resp.status_code == 429 or _error_code(resp) in THROTTLING_ERROR_CODES
+                retryable = throttled or (idempotent and resp.status_code in RETRYABLE_STATUSES)
+            elapsed = time.perf_counter() - started
+
+            failed = error is not None or resp.status_code >= 400
+            will_retry = failed and retryable and attempt < self.max_retries
+            self._record(endpoint, elapsed, failed, will_retry)
+            if not will_retry:
+                if error is not None:
+                    raise error
+                return resp
+
+            delay = self._backoff(attempt, resp)
+            print(f"🔁 Meta {endpoint} failed ({error or resp.status_code}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def latency_stats(self) -> Dict[str, Dict]:
+        """Per-endpoint call counts, errors, retries and average/max latency in ms."""
+        with self._stats_lock:
+            return {
+                endpoint: {**stats, "avg_ms": round(stats["total_ms"] / stats["calls"], 1)}
+                for endpoint, stats in self._stats.items()
+            }
+
+
+# One client (and connection pool) per process, shared by every Graph API call site
+meta_api = MetaClient()
+
+
+def _encode_body(body: Dict) -> str:
+    """Batch item bodies are form-encoded strings; nested values are sent as JSON."""
+    return urlencode({
+        key: json.dumps(value) if isinstance(value, (dict, list)) else value
+        for key, value in body.items()
+    })
+
+
+def _demux_item(item) -> Dict:
+    """
+    Turns one batch response item into the same shape a standalone call returns:
+    the decoded JSON body on success, or {"error": {...}} on failure.
+    """
+    if item is None:
+        # Meta returns null for operations it did not get to before timing out
+        return {"error": {"message": "Batch operation was not processed", "code": None, "status": None}}
+
+    try:
+        body = json.loads(item.get("body") or "{}")
+    except ValueError:
+        body = {"raw": item.get("body")}
+
+    status = item.get("code", 200)
+    if status >= 400 or (isinstance(body, dict) and "error" in body):
+        error = body.get("error", {}) if isinstance(body, dict) else {}
+        return {"error": {
+            "message": error.get("message", f"HTTP {status}"),
+            "type": error.get("type"),
+            "code": error.get("code"),
+            "error_subcode": error.get("error_subcode"),
+            "status": status,
+        }}
+    return body
+
+
+class MetaBatch:
+    """
+    Collects Graph API operations and sends them as batch requests of up to 50.
+    Results come back in the order operations were added.
+    """
+
+    def __init__(self, access_token: str = None):
+        self.access_token = access_token or ACCESS_TOKEN
+        self.operations = []
+
+    def add(self, method: str, relative_url: str, body: Dict = None, name: str = None) -> int:
+        operation = {"method": method.upper(), "relative_url": relative_url.lstrip("/")}
+        if body:
+            operation["body"] = _encode_body(body)
+        if name:
+            operation["name"] = name
+        self.operations.append(operation)
+        return len(self.operations) - 1
+
+    def get(self, relative_url: str, params: Dict = None, name: str = None) -> int:
+        if params:
+            relative_url = f"{relative_url}?{urlencode(params)}"
+        return self.add("GET", relative_url, name=name)
+
+    def post(self, relative_url: str, body: Dict = None, name: str = None) -> int:
+        return self.add("POST", relative_url, body, name=name)
+
+    def execute(self) -> List[Dict]:
+        results = []
+        for start in range(0, len(self.operations), META_BATCH_LIMIT):
+            chunk = self.operations[start:start + META_BATCH_LIMIT]
+            resp = meta_api.post(
+                f"{BASE_URL}/",
+                idempotent=all(operation["method"] == "GET" for operation in chunk),
+                data={"access_token": self.access_token, "batch": json.dumps(chunk), "include_headers": "false"},
+            )
+            payload = _response_json(resp)
+            if resp.status_code != 200 or not isinstance(payload, list):
+                # The whole batch was rejected (bad token, malformed batch, a proxy error page, ...)
+                error = _demux_item({"code": resp.status_code, "body": json.dumps(payload)})
+                results.extend([error] * len(chunk))
+                continue
+            results.extend(_demux_item(item) for item in payload)
+        self.operations = []
+        return results
+
+
+def batch_request(operations: List[Dict], access_token: str = None) -> List[Dict]:
+    """
+    Runs [{"method", "relative_url", "body"?}, ...] through the batch endpoint.
+    Returns one result per operation, in order.
+    """
+    batch = MetaBatch(access_token)
+    for operation in operations:
+        batch.add(operation["method"], operation["relative_url"], operation.get("body"), operation.get("name"))
+    return batch.execute()
+
+
+def fetch_account_insights(fields: List[str], meta_campaign_ids: List[str] = None, date_preset: str = "today",
+                           ad_account_id: str = None, on_response=None) -> Dict[str, Dict]:
+    """
+    One account-level /act_{id}/insights?level=campaign query (following pagination)
+    instead of one call per campaign. Returns {meta_campaign_id: insights_row}.
+    on_response, if given, is called with every raw response (e.g. to read throttling headers).
+    """
+    params = {
+        "access_token": ACCESS_TOKEN,
+        "level": "campaign",
+        "fields": ",".join(dict.fromkeys(["campaign_id", *fields])),
+        "date_preset": date_preset,
+        "limit": 500,
+    }
+    if meta_campaign_ids:
+        params["filtering"] = json.dumps([
+            {"field": "campaign.id", "operator": "IN", "value": list(meta_campaign_ids)}
+        ])
+
+    rows = {}
+    url = f"{BASE_URL}/act_{ad_account_id or AD_ACCOUNT_ID}/insights"
+    while url:
+        resp = meta_api.get(url, params=params)
+        if on_response:
+            on_response(resp)
+        payload = _response_json(resp)
+        if resp.status_code != 200 or "error" in payload:
+            raise requests.HTTPError(f"Meta insights error: {payload}", response=resp)
+        for row in payload.get("data", []):
+            rows[row["campaign_id"]] = row
+        # paging.next already carries every query parameter
+        url = payload.get("paging", {}).get("next")
+        params = None
+    return rows
@@ -0,0 +1,402 @@
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from agent.tools.optimization.metric_history import FATIGUE_CTR_DROP_PCT
+
+
+# Batch versions of analyze_campaign_metrics and decide_campaign_action for backtesting rules over many
+# metric snapshots. Every threshold below mirrors the scalar rules in metrics_analyzer / decision_maker;
+# keep them in step (the parity tests in agent/tests.py compare both paths row for row).
+# Unlike the scalar tools, nothing here sends alerts or touches the database: a row without
+# "ctr_trend_pct" is scored as having no CTR history rather than looked up.
+
+# Metric columns the rules read, with the default the scalar path uses for a missing key
+METRIC_DEFAULTS = {
+    "ctr": 0,
+    "purchase_roas": 0,
+    "cpc": 0,
+    "spend": 0,
+    "purchases": 0,
+    "frequency": 0,
+    "impressions": 0,
+    "clicks": 0,
+    "days_running": 1,
+    "ctr_trend_pct": np.nan,  # None (no history) is NaN, which never trips a threshold
+}
+
+# In the order analyze_campaign_metrics appends them
+FLAGS = [
+    "critically_low_ctr", "low_ctr", "creative_fatigue",
+    "zero_roas_high_spend", "zero_roas_early", "unprofitable_roas", "marginal_roas",
+    "high_cpc", "moderate_cpc",
+    "severe_ad_fatigue", "ad_fatigue", "low_frequency_high_spend",
+    "no_conversions_significant_spend", "no_conversions_moderate_spend", "low_conversion_rate",
+    "high_spend_low_return", "scaling_opportunity", "multiple_issues",
+]
+FLAG_INDEX = {flag: i for i, flag in enumerate(FLAGS)}
+
+STATUSES = ["critical", "underperforming", "performing", "excellent"]
+STATUS_EMOJI = ["🔴", "🟡", "🟢", "🟢"]
+
+# One recommendation (or none) per rule section, in the order the scalar path appends them
+RECOMMENDATIONS = [
+    [  # CTR
+        "🔴 CTR critically low (<0.5%). Creative needs immediate overhaul - test new hooks, visuals, and copy.",
+        "🟡 CTR below industry average. Test more engaging creatives and stronger hooks.",
+        "🟢 CTR is decent. Room for improvement with creative optimization.",
+        "🟢 Strong CTR! Your creative is resonating well with the audience.",
+        "🟢 Excellent CTR! Your creative is highly engaging.",
+    ],
+    [  # Creative fatigue; the second is formatted per row
+        "🟡 Low CTR + high frequency indicates creative fatigue. Refresh ads immediately.",
+        "🟡 CTR down {drop:.0f}% from its recent baseline at {frequency:.1f} frequency "
+        "indicates creative fatigue. Refresh ads soon.",
+    ],
+    [  # ROAS
+        "🔴 No ROAS after significant spend. Pause and investigate conversion tracking.",
+        "🟡 No ROAS yet - normal for new campaigns. Monitor closely.",
+        "🔴 ROAS below breakeven. Optimize targeting, landing page, or pause campaign.",
+        "🟡 ROAS near breakeven. Optimize for better profitability.",
+        "🟢 Good ROAS! Campaign is profitable.",
+        "🟢 Excellent ROAS! Scale this campaign carefully.",
+    ],
+    [  # CPC
+        "🔴 CPC too high. Refine targeting, improve quality score, or test new audiences.",
+        "🟡 CPC is moderate. Look for optimization opportunities.",
+        "🟢 CPC is reasonable for your market.",
+        "🟢 Excellent CPC! Very cost-efficient traffic.",
+    ],
+    [  # Frequency
+        "🔴 Severe ad fatigue (3.5+ frequency). Immediately refresh creative or expand audience.",
+        "🟡 High frequency detected. Plan creative refresh or audience expansion.",
+        "🟢 Frequency is optimal - good reach without oversaturation.",
+        "🟡 Low frequency despite high spend. Audience might be too broad.",
+        "🟢 Efficient frequency - reaching fresh audiences.",
+    ],
+    [  # Conversions
+        "🔴 No conversions after $15+ spend. Check conversion tracking, landing page, and offer.",
+        "🟡 No conversions yet. Monitor closely and check funnel optimization.",
+        "🟡 Early stage - allow time for conversion data.",
+        "🔴 Low conversion rate (<1%). Optimize landing page, pricing, or offer.",
+        "🟡 Conversion rate needs improvement. Test landing page elements.",
+        "🟢 Good conversion rate. Consider scaling.",
+        "🟢 Excellent conversion rate! Scale with confidence.",
+    ],
+    [  # Spend velocity
+        "🟡 High daily spend with low ROAS. Consider reducing budget until optimized.",
+        "🟢 Low spend with efficient CPC. Consider increasing budget.",
+    ],
+    ["🟢 🎯 Campaign is firing on all cylinders! Consider scaling."],
+    ["🔴 Multiple performance issues detected. Pause and restructure campaign."],
+]
+
+# decision_maker's rule order; "default" is its fallback edit_creative
+DECISIONS = ["pause", "scale", "clone", "edit_creative", "change_audience", "revise_offer",
+             "optimize_budget", "wait", "default"]
+DECISION_PRIORITY = ["critical", "high", "high", "medium", "medium", "medium", "low", "low", "medium"]
+CONFIDENCES = ["low", "medium", "high"]
+PROFITABILITY = ["low", "medium", "high"]
+
+_CRITICAL_FLAGS = ["zero_roas_high_spend", "no_conversions_significant_spend", "multiple_issues", "critically_low_ctr"]
+_CREATIVE_FLAGS = ["critically_low_ctr", "low_ctr", "creative_fatigue", "severe_ad_fatigue", "weak_creative"]
+_AUDIENCE_FLAGS = ["bad_audience_match", "high_cpc", "low_frequency_high_spend"]
+_OFFER_FLAGS = ["conversion_dropoff", "low_conversion_rate"]
+
+
+def _value(metrics: dict, column: str, default):
+    value = metrics.get(column, default)
+    return np.nan if value is None else value
+
+
+def metrics_columns(metrics_list: Sequence[dict]) -> Dict[str, np.ndarray]:
+    """Columnar float arrays (one per METRIC_DEFAULTS key) from a list of metric dicts."""
+    return {
+        column: np.fromiter((_value(metrics, column, default) for metrics in metrics_list), dtype=np.float64,
+                            count=len(metrics_list))
+        for column, default in METRIC_DEFAULTS.items()
+    }
+
+
+def _columns(columns: Mapping[str, Sequence[float]]) -> Dict[str, np.ndarray]:
+    size = len(next(iter(columns.values())))
+    return {
+        column: np.asarray(columns[column], dtype=np.float64) if column in columns else np.full(size, float(default))
+        for column, default in METRIC_DEFAULTS.items()
+    }
+
+
+def _derived(c: Dict[str, np.ndarray]):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        conversion_rate = np.where(c["clicks"] > 0, c["purchases"] / c["clicks"] * 100, 0.0)
+        cost_per_conversion = np.where(c["purchases"] > 0, c["spend"] / c["purchases"], 0.0)
+        daily_spend = np.where(c["days_running"] > 0, c["spend"] / c["days_running"], c["spend"])
+    return conversion_rate, cost_per_conversion, daily_spend
+
+
+def score_metrics(columns: Mapping[str, Sequence[float]]) -> Dict[str, np.ndarray]:
+    """
+    analyze_campaign_metrics over whole columns (see metrics_columns). Returns arrays:
+    score (int), status (index into STATUSES), flags (bool, rows x FLAGS),
+    recommendations (rows x sections, index into RECOMMENDATIONS[section] or -1 for none),
+    conversion_rate, cost_per_conversion and daily_spend.
+    """
+    c = _columns(columns)
+    ctr, roas, cpc, spend = c["ctr"], c["purchase_roas"], c["cpc"], c["spend"]
+    conversions, frequency = c["purchases"], c["frequency"]
+    conversion_rate, cost_per_conversion, daily_spend = _derived(c)
+    size = len(ctr)
+    none = np.full(size, -1)
+
+    ctr_rec = np.select([ctr < 0.5, ctr < 0.9, ctr < 1.5, ctr < 2.5], [0, 1, 2, 3], 4)
+    ctr_declining = c["ctr_trend_pct"] <= -FATIGUE_CTR_DROP_PCT
+    fatigue = (frequency > 1.5) & ((ctr < 1.0) | ctr_declining)
+    roas_rec = np.select([(roas == 0) & (spend > 15), roas == 0, roas < 2.0, roas < 3.0, roas < 5.0],
+                         [0, 1, 2, 3, 4], 5)
+    cpc_rec = np.select([cpc > 2.0, cpc > 1.0, cpc > 0.5], [0, 1, 2], 3)
+    frequency_rec = np.select([frequency >= 3.5, frequency >= 2.0, frequency >= 1.5,
+                               (frequency < 1.2) & (spend > 20), frequency < 1.2], [0, 1, 2, 3, 4], -1)
+    no_conversions = conversions == 0
+    conversion_rec = np.select([no_conversions & (spend > 15), no_conversions & (spend > 10), no_conversions,
+                                conversion_rate < 1.0, conversion_rate < 2.0, conversion_rate < 5.0],
+                               [0, 1, 2, 3, 4, 5], 6)
+    spend_rec = np.select([(daily_spend > 15) & (roas < 3.0), (daily_spend < 10) & (cpc < 0.5)], [0, 1], -1)
+    firing = (ctr > 2.5) & (roas > 3.0) & (conversion_rate > 2.5)
+    multiple_issues = (ctr < 1.0) & (roas < 2.0) & (frequency > 2.5)
+
+    score = (50
+             + np.array([-25, -15, 5, 15, 20])[ctr_rec]
+             + np.array([-30, -10, -20, 0, 20, 30])[roas_rec]
+             + np.array([-15, -5, 5, 10])[cpc_rec]
+             + np.array([-25, -15, 5, -5, 10, 0])[frequency_rec]  # -1 (no rule matched) picks the trailing 0
+             + np.array([-35, -20, -5, -15, 0, 10, 20])[conversion_rec]
+             - 10 * (spend_rec == 0) + 15 * firing - 15 * multiple_issues)
+    score = np.clip(score, 0, 100).astype(np.int64)
+
+    flags = np.zeros((size, len(FLAGS)), dtype=bool)
+    for flag, mask in (
+        ("critically_low_ctr", ctr_rec == 0), ("low_ctr", ctr_rec == 1), ("creative_fatigue", fatigue),
+        ("zero_roas_high_spend", roas_rec == 0), ("zero_roas_early", roas_rec == 1),
+        ("unprofitable_roas", roas_rec == 2), ("marginal_roas", roas_rec == 3),
+        ("high_cpc", cpc_rec == 0), ("moderate_cpc", cpc_rec == 1),
+        ("severe_ad_fatigue", frequency_rec == 0), ("ad_fatigue", frequency_rec == 1),
+        ("low_frequency_high_spend", frequency_rec == 3),
+        ("no_conversions_significant_spend", conversion_rec == 0),
+        ("no_conversions_moderate_spend", conversion_rec == 1), ("low_conversion_rate", conversion_rec == 3),
+        ("high_spend_low_return", spend_rec == 0), ("scaling_opportunity", firing),
+        ("multiple_issues", multiple_issues),
+    ):
+        flags[:, FLAG_INDEX[flag]] = mask
+
+    recommendations = np.stack([
+        ctr_rec, np.where(fatigue, np.where(ctr < 1.0, 0, 1), none), roas_rec, cpc_rec, frequency_rec, conversion_rec, spend_rec,
+        np.where(firing, 0, none), np.where(multiple_issues, 0, none),
+    ], axis=1)
+
+    return {
+        "score": score,
+        "status": np.select([score < 30, score < 50, score < 75], [0, 1, 2], 3),
+        "flags": flags,
+        "recommendations": recommendations,
+        "conversion_rate": conversion_rate,
+        "cost_per_conversion": cost_per_conversion,
+        "daily_spend": daily_spend,
+    }
+
+
+def _flag_masks(flags: np.ndarray, names: List[str]) -> np.ndarray:
+    known = [FLAG_INDEX[name] for name in names if name in FLAG_INDEX]
+    return flags[:, known].any(axis=1)
+
+
+def decide_actions(columns: Mapping[str, Sequence[float]], scores: Dict[str, np.ndarray],
+                   flag_masks: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+    """
+    decide_campaign_action over whole columns, given score_metrics() output for the same rows.
+    Returns arrays: decision (index into DECISIONS), confidence (CONFIDENCES) and profitability (PROFITABILITY).
+    flag_masks (group name -> bool array) replaces the flag-group tests when the analyses didn't come
+    from score_metrics; see decide_actions_batch.
+    """
+    c = _columns(columns)
+    ctr, roas, cpc, spend = c["ctr"], c["purchase_roas"], c["cpc"], c["spend"]
+    conversions, frequency, days_running = c["purchases"], c["frequency"], c["days_running"]
+    clicks, impressions = c["clicks"], c["impressions"]
+    conversion_rate, _, daily_spend = _derived(c)
+    score, flags = scores["score"], scores["flags"]
+    excellent = scores["status"] == STATUSES.index("excellent")
+
+    if flag_masks is None:
+        flag_masks = {
+            "critical": _flag_masks(flags, _CRITICAL_FLAGS),
+            "creative": _flag_masks(flags, _CREATIVE_FLAGS),
+            "audience": _flag_masks(flags, _AUDIENCE_FLAGS),
+            "offer": _flag_masks(flags, _OFFER_FLAGS),
+            "scaling": flags[:, FLAG_INDEX["scaling_opportunity"]],
+        }
+    scaling = flag_masks["scaling"]
+
+    pause = (((spend >= 15) & (conversions == 0) & (days_running >= 3))
+             | ((spend >= 30) & (roas < 0.5)) | flag_masks["critical"])
+    scale = (((roas >= 4.0) & (score >= 80) & (conversions >= 5) & scaling & (spend >= 30))
+             | ((roas >= 3.5) & (score >= 75) & (conversions >= 3) & (days_running >= 2) & (spend >= 20)))
+    clone = ((excellent & (roas >= 4.0) & (conversions >= 5) & (score >= 85))
+             | ((roas >= 5.0) & (conversions >= 3) & (score >= 80) & scaling))
+    creative = flag_masks["creative"] | ((ctr < 0.9) & (clicks > 50)) | (frequency >= 3.0)
+    audience = flag_masks["audience"] | ((cpc > 1.5) & (conversion_rate < 1.5)) | ((roas >= 2.0) & (cpc > 2.0))
+    offer = flag_masks["offer"] | ((ctr >= 1.5) & (conversion_rate < 1.0) & (clicks > 30))
+    budget = (((daily_spend > 20) & (roas < 2.5) & (score < 60))
+              | ((daily_spend < 15) & (roas > 4.0) & (cpc < 0.8)))
+    wait = (((days_running < 2) & (spend < 20))
+            | ((spend < 10) & (conversions == 0) & (impressions < 1000)))
+
+    return {
+        "decision": np.select([pause, scale, clone, creative, audience, offer, budget, wait],
+                              list(range(8)), DECISIONS.index("default")),
+        "confidence": np.select([(spend >= 30) & (conversions >= 3) & (days_running >= 3),
+                                 (spend >= 20) & (days_running >= 2)], [2, 1], 0),
+        "profitability": np.select([roas >= 3.0, roas >= 1.5], [2, 1], 0),
+    }
+
+
+def _recommendation(metrics: dict, section: int, rec: int) -> str:
+    if (section, rec) == (1, 1):
+        return RECOMMENDATIONS[1][1].format(drop=-metrics["ctr_trend_pct"], frequency=metrics.get("frequency", 0))
+    return RECOMMENDATIONS[section][rec]
+
+
+def analyze_metrics_batch(metrics_list: List[dict]) -> List[dict]:
+    """Same dicts as analyze_campaign_metrics for each metrics dict (without sending alerts)."""
+    scores = score_metrics(metrics_columns(metrics_list))
+    score = scores["score"].tolist()
+    status = scores["status"].tolist()
+    flags = scores["flags"].tolist()
+    recommendations = scores["recommendations"].tolist()
+    conversion_rate = scores["conversion_rate"].tolist()
+    cost_per_conversion = scores["cost_per_conversion"].tolist()
+    daily_spend = scores["daily_spend"].tolist()
+
+    analyses = []
+    for i, metrics in enumerate(metrics_list):
+        row_flags = [flag for flag, is_set in zip(FLAGS, flags[i]) if is_set]
+        priority_actions = []
+        if "critically_low_ctr" in row_flags or "severe_ad_fatigue" in row_flags:
+            priority_actions.append("URGENT: Refresh creative immediately")
+        if "zero_roas_high_spend" in row_flags or "no_conversions_significant_spend" in row_flags:
+            priority_actions.append("URGENT: Check conversion tracking and landing page")
+        if "scaling_opportunity" in row_flags:
+            priority_actions.append("OPPORTUNITY: Scale budget by 20-30%")
+
+        row_status, emoji = STATUSES[status[i]], STATUS_EMOJI[status[i]]
+        analyses.append({
+            "meta_campaign_id": metrics.get("meta_campaign_id"),
+            "status": row_status,
+            "status_emoji": emoji,
+            "score": score[i],
+            "metrics": {
+                "roas": metrics.get("purchase_roas", 0),
+                "ctr": metrics.get("ctr", 0),
+                "cpc": metrics.get("cpc", 0),
+                "conversion_rate": round(conversion_rate[i], 2),
+                "cost_per_conversion": round(cost_per_conversion[i], 2),
+                "frequency": metrics.get("frequency", 0),
+                "daily_spend": round(daily_spend[i], 2),
+            },
+            "flags": row_flags,
+            "recommendations": [_recommendation(metrics, section, rec) for section, rec in enumerate(recommendations[i])
+                                if rec >= 0],
+            "priority_actions": priority_actions,
+            "analysis_summary": f"{emoji} Campaign is {row_status} with {score[i]}/100 health score",
+        })
+    return analyses
+
+
+def _decision_reason(decision_maker, name, metrics, analysis, conversion_rate, daily_spend):
+    # Reasons quote the metrics as given (e.g. "3 days", not "3.0 days"), so they're formatted from the row
+    roas = metrics.get("purchase_roas", 0)
+    spend = metrics.get("spend", 0)
+    conversions = metrics.get("purchases", 0)
+    ctr = metrics.get("ctr", 0)
+    cpc = metrics.get("cpc", 0)
+    score = analysis.get("score", 0)
+    flags = analysis.get("flags", [])
+    if name == "pause":
+        return decision_maker._get_pause_reason(spend, conversions, roas, flags)
+    if name == "scale":
+        return decision_maker._get_scale_reason(roas, score, conversions)
+    if name == "clone":
+        return decision_maker._get_clone_reason(roas, conversions, score)
+    if name == "edit_creative":
+        return decision_maker._get_creative_reason(flags, ctr, metrics.get("frequency", 0))
+    if name == "change_audience":
+        return decision_maker._get_audience_reason(flags, cpc, conversion_rate)
+    if name == "revise_offer":
+        return decision_maker._get_offer_reason(flags, conversion_rate, ctr)
+    if name == "optimize_budget":
+        return decision_maker._get_budget_reason(daily_spend, roas, cpc)
+    if name == "wait":
+        return decision_maker._get_wait_reason(spend, metrics.get("days_running", 1), conversions)
+    return "Campaign performance needs improvement. Start with creative optimization."
+
+
+def decide_actions_batch(metrics_list: List[dict], analysis_list: Optional[List[dict]] = None) -> List[dict]:
+    """
+    Same dicts as decide_campaign_action(metrics, analysis) for each pair (without sending alerts).
+    Without analysis_list the analyses come from analyze_metrics_batch.
+    """
+    from agent.tools.optimization import decision_maker
+
+    if analysis_list is None:
+        analysis_list = analyze_metrics_batch(metrics_list)
+    columns = metrics_columns(metrics_list)
+    # Analyses may carry flags the analyzer never sets (e.g. from an LLM); test the groups on the lists
+    flag_sets = [set(analysis.get("flags", [])) for analysis in analysis_list]
+    group_mask = lambda names: np.fromiter((not flag_set.isdisjoint(names) for flag_set in flag_sets), dtype=bool,
+                                           count=len(flag_sets))
+    scores = {
+        "score": np.fromiter((analysis.get("score", 0) for analysis in analysis_list), dtype=np.float64,
+                             count=len(analysis_list)),
+        "status": np.array([STATUSES.index(analysis["status"]) if analysis.get("status") in STATUSES else -1
+                            for analysis in analysis_list]),
+        "flags": np.zeros((len(analysis_list), len(FLAGS)), dtype=bool),
+    }
+    actions = decide_actions(columns, scores, flag_masks={
+        "critical": group_mask(_CRITICAL_FLAGS),
+        "creative": group_mask(_CREATIVE_FLAGS),
+        "audience": group_mask(_AUDIENCE_FLAGS),
+        "offer": group_mask(_OFFER_FLAGS),
+        "scaling": group_mask(["scaling_opportunity"]),
+    })
+    decision = actions["decision"].tolist()
+    confidence = actions["confidence"].tolist()
+    profitability = actions["profitability"].tolist()
+    conversion_rate, _, daily_spend = (values.tolist() for values in _derived(columns))
+
+    decisions = []
+    for i, (metrics, analysis) in enumerate(zip(metrics_list, analysis_list)):
+        roas = metrics.get("purchase_roas", 0)
+        spend = metrics.get("spend", 0)
+        conversions = metrics.get("purchases", 0)
+        flags = analysis.get("flags", [])
+        name = DECISIONS[decision[i]]
+        reason = _decision_reason(decision_maker, name, metrics, analysis, conversion_rate[i], daily_spend[i])
+        name = "edit_creative" if name == "default" else name
+        decisions.append({
+            "meta_campaign_id": metrics.get("meta_campaign_id"),
+            "decision": name,
+            "reason": reason,
+            "priority": DECISION_PRIORITY[decision[i]],
+            "confidence": CONFIDENCES[confidence[i]],
+            "metrics_summary": {
+                "roas": roas,
+                "spend": spend,
+                "conversions": conversions,
+                "score": analysis.get("score", 0),
+            },
+            "profitability": PROFITABILITY[profitability[i]],
+            "next_review": decision_maker._get_next_review_timeframe(name),
+            "expected_outcome": decision_maker._get_expected_outcome(name, roas),
+            "flags": flags,
+            "priority_actions": analysis.get("priority_actions", []),
+            "recommendations": analysis.get("recommendations", []),
+        })
+    return decisions
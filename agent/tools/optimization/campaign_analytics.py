@@ -28,7 +28,7 @@ from typing import Dict
 from openai import OpenAI
 from agent.tools.rag_setup import setup_product_rag_chroma
 from langchain.chains import RetrievalQA
-from langchain.chat_models import ChatOpenAI
+from agent.tools.llm_provider import lazy_chat_model
 
 
 load_dotenv()
@@ -36,7 +36,9 @@ campaign_db_name = os.getenv("CHROMA_DB_BASE_PATH_CAMPAIGN", "./chroma_campaign_
 db_name = os.getenv("CHROMA_DB_BASE_PATH", "./chroma_db")
 persist_dir = db_name  # or another env variable if you want
 MODEL = os.getenv("GPT_MODEL", "gpt-4o-mini")
-#openai = OpenAI()
+llm = lazy_chat_model(MODEL, temperature=0)
+# Ad copy should vary between regenerations, so it gets a sampling model that skips the response cache
+copy_llm = lazy_chat_model(MODEL, temperature=1)
 
 
 
@@ -72,7 +74,7 @@ def generate_campaign_summary(campaign_id: str) -> str:
     """
 
     result = llm.invoke(content)
-    return result
+    return result.content
 
 
 @tool
@@ -118,11 +120,7 @@ def generate_product_adcopy_and_headline_cta(campaign_id: str) -> str:
     ]
 
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages
-        )
-        raw = response.choices[0].message.content
+        raw = copy_llm.invoke(messages).content
         return json.loads(re.sub(r"```json|```", "", raw).strip())
     except Exception as e:
         return {"error": str(e)}
@@ -1,5 +1,100 @@
-from agent.models import Product, OptimizationLog
-from agent.tools.optimization.scheduler import send_campaign_alert
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch, Q
+
+from agent.models import AdsCreatives, OptimizationLog
+
+
+# Logs fetched per query while streaming a product's history
+LOG_PAGE_SIZE = 500
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _logs(product_id):
+    # Newest first, on the (product, -timestamp) index; id breaks timestamp ties so cursors are exact
+    return OptimizationLog.objects.filter(product_id=product_id)\
+        .select_related("campaign__product")\
+        .prefetch_related(Prefetch("campaign__creatives", queryset=AdsCreatives.objects.order_by("id")))\
+        .order_by("-timestamp", "-id")
+
+
+def _log_row(log) -> dict:
+    campaign = log.campaign
+    # From the prefetch; creatives.first() would query again for every log
+    creatives = list(campaign.creatives.all())
+    creative = creatives[0] if creatives else None
+    return {
+        "product_name": campaign.product.name,
+        "platform": campaign.platform,
+        "ad_type": campaign.ad_type,
+        "audience": campaign.audience,
+        "objective": campaign.objective,
+        "budget": float(campaign.budget),
+        "creative_meta": {
+            "headline": campaign.headline,
+            "ad_copy": campaign.ad_copy,
+            "type": getattr(creative, "creative_type", None),
+            "hash": getattr(creative, "file_hash", None),
+        } if creative else None,
+        "start_metrics": log.metrics_snapshot,
+        "action_taken": log.action,
+        "reason": log.reason,
+        "resulting_metrics": campaign.result_metrics,
+        "roas": campaign.purchase_roas,
+        "conversion_rate": campaign.conversion_rate,
+        "final_outcome": campaign.status,
+        "timestamp": log.timestamp.isoformat()
+    }
+
+
+def _cursor(log) -> str:
+    # "<microseconds since epoch>_<id>" of the last log on a page; URL-safe as it is
+    return f"{(log.timestamp - _EPOCH) // _MICROSECOND}_{log.id}"
+
+
+def _after_cursor(logs, cursor: str):
+    """Logs older than the one the cursor points at (raises ValueError on a malformed cursor)."""
+    microseconds, log_id = cursor.split("_")
+    timestamp = _EPOCH + timedelta(microseconds=int(microseconds))
+    return logs.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=int(log_id)))
+
+
+def product_logs_page(product_id, cursor: Optional[str] = None, limit: int = 100) -> dict:
+    """
+    One page of a product's optimization history, newest first: {"results": [...], "next_cursor"}.
+    Pass next_cursor back for the following page; it is None after the last one.
+    A page costs the same few queries however long the history is.
+    """
+    logs = _logs(product_id)
+    if cursor:
+        logs = _after_cursor(logs, cursor)
+    page = list(logs[:limit + 1])
+    return {
+        "results": [_log_row(log) for log in page[:limit]],
+        "next_cursor": _cursor(page[limit - 1]) if len(page) > limit else None,
+    }
+
+
+def iter_product_logs(product_id, page_size: int = LOG_PAGE_SIZE) -> Iterator[dict]:
+    """Every optimization log of a product as history rows, newest first, holding one page in memory at a time."""
+    cursor = None
+    while True:
+        page = product_logs_page(product_id, cursor, limit=page_size)
+        yield from page["results"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return
+
+
+def export_product_logs_jsonl(product_id, page_size: int = LOG_PAGE_SIZE) -> Iterator[str]:
+    """iter_product_logs as JSON lines, for offline analysis."""
+    for row in iter_product_logs(product_id, page_size=page_size):
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
 
 
 def get_product_specific_logs(product_id: str):
@@ -7,39 +102,6 @@ def get_product_specific_logs(product_id: str):
     Fetches past campaign optimization logs for a product as structured dicts.
     Useful for LangChain agents to analyze what ad strategies worked or failed.
     Each log includes platform, audience, creatives, metrics, and actions taken.
+    Large histories are better read with iter_product_logs or product_logs_page.
     """
-    logs = OptimizationLog.objects.filter(product_id=product_id)\
-        .select_related("campaign", "product")\
-        .prefetch_related("creative_used")\
-        .order_by("-timestamp")
-
-    formatted_logs = []
-
-    for log in logs:
-        campaign = log.campaign
-        creative = log.campaign.creatives.first()
-        formatted_logs.append({
-            "product_name": campaign.product.name,
-            "platform": campaign.platform,
-            "ad_type": campaign.ad_type,
-            "audience": campaign.audience,
-            "objective": campaign.objective,
-            "budget": float(campaign.budget),
-            "creative_meta": {
-                "headline": campaign.headline,
-                "ad_copy": campaign.ad_copy,
-                "type": getattr(creative, "creative_type", None),
-                "hash": getattr(creative, "file_hash", None),
-            } if creative else None,
-            "start_metrics": log.metrics_snapshot,
-            "action_taken": log.action,
-            "reason": log.reason,
-            "resulting_metrics": campaign.result_metrics,
-            "roas": campaign.purchase_roas,
-            "conversion_rate": campaign.conversion_rate,
-            "final_outcome": campaign.status,
-            "timestamp": log.timestamp.isoformat()
-        })
-        send_campaign_alert(campaign.product.name, campaign.ad_type)
-
-    return formatted_logs
+    return list(iter_product_logs(product_id))
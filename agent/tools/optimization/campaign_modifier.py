@@ -50,6 +50,7 @@ from facebook_business.adobjects.ad import Ad
 from django.db import transaction
 import requests
 import logging
+from agent.tools.meta_client import MetaBatch, meta_api
 
 logger = logging.getLogger(__name__)
 
@@ -62,18 +63,13 @@ persist_dir = db_name  # or another env variable if you want
 MODEL = os.getenv("GPT_MODEL", "gpt-4o-mini")
 
 import os
-from langchain_openai import ChatOpenAI
+from agent.tools.llm_provider import lazy_chat_model
 
 print("MODEL:", MODEL)
 print("API_KEY exists:", bool(os.getenv("OPENAI_API_KEY")))
 print("Environment proxy vars:", {k: v for k, v in os.environ.items() if 'proxy' in k.lower()})
 
-try:
-    llm = ChatOpenAI(model=MODEL, temperature=0, api_key=os.getenv("OPENAI_API_KEY"))
-    print("ChatOpenAI initialized successfully")
-except Exception as e:
-    print("Error:", e)
-    print("Exception type:", type(e))
+llm = lazy_chat_model(MODEL, temperature=0)
 
 
 # 🔐 Your credentials
@@ -161,7 +157,7 @@ def pause_campaign(decision_data: Dict) -> dict:
     }
 
     try:
-        resp = requests.post(url, data=payload)
+        resp = meta_api.post(url, data=payload, idempotent=True)
         resp.raise_for_status()
         # Update the Campaign database accodingly
         campaign = agent_models.Campaign.objects.get(meta_campaign_id=meta_campaign_id)
@@ -220,7 +216,7 @@ def scale_campaign(decision_data: Dict = None) -> Dict:
 
         # 🔍 Fetch adset ID and current budget
         adset_url = f"{BASE_URL}/{meta_campaign_id}?fields=adsets.limit(1){{id,daily_budget}}&access_token={ACCESS_TOKEN}"
-        adset_resp = requests.get(adset_url)
+        adset_resp = meta_api.get(adset_url)
         adset_resp.raise_for_status()
         adsets = adset_resp.json().get("adsets", {}).get("data", [])
 
@@ -253,7 +249,7 @@ def scale_campaign(decision_data: Dict = None) -> Dict:
             "daily_budget": new_budget,
             "access_token": ACCESS_TOKEN
         }
-        budget_resp = requests.post(budget_url, data=payload)
+        budget_resp = meta_api.post(budget_url, data=payload, idempotent=True)
         budget_resp.raise_for_status()
         meta_campaign_id = decision_data.get("meta_campaign_id")
         campaign = agent_models.Campaign.objects.get(meta_campaign_id=meta_campaign_id)
@@ -317,7 +313,7 @@ def clone_campaign(decision_data: Dict = None) -> Dict:
             "status_option": "INHERITED"  # Start with same status as original
         }
 
-        response = requests.post(url, json=payload)
+        response = meta_api.post(url, json=payload)
         response.raise_for_status()
         clone_data = response.json()
 
@@ -535,25 +531,29 @@ def refresh_creative(decision_data: Dict):
 
 
 def _pause_old_ad(meta_adset_id):
-    """Pause the active ad in the adset"""
+    """Pause the active ads in the adset (one batch request) and return the first paused ad id"""
     try:
         url = f"{BASE_URL}/{meta_adset_id}/ads"
         params = {"access_token": ACCESS_TOKEN, "fields": "id,name,status"}
-        response = requests.get(url, params=params, timeout=30)
+        response = meta_api.get(url, params=params)
         response.raise_for_status()
 
-        for ad in response.json().get("data", []):
-            if ad["status"] == "ACTIVE":
-                pause_url = f"{BASE_URL}/{ad['id']}"
-                pause_resp = requests.post(
-                    pause_url,
-                    params={"access_token": ACCESS_TOKEN},
-                    json={"status": "PAUSED"},
-                    timeout=30
-                )
-                pause_resp.raise_for_status()
-                logger.info(f"Paused old ad: {ad['id']}")
-                return ad["id"]
+        active_ads = [ad["id"] for ad in response.json().get("data", []) if ad["status"] == "ACTIVE"]
+        if not active_ads:
+            return None
+
+        batch = MetaBatch(ACCESS_TOKEN)
+        for ad_id in active_ads:
+            batch.post(ad_id, {"status": "PAUSED"})
+
+        paused = []
+        for ad_id, result in zip(active_ads, batch.execute()):
+            if "error" in result:
+                logger.warning(f"Failed to pause ad {ad_id}: {result['error']}")
+            else:
+                logger.info(f"Paused old ad: {ad_id}")
+                paused.append(ad_id)
+        return paused[0] if paused else None
     except Exception as e:
         logger.warning(f"Failed to pause old ad: {str(e)}")
     return None
@@ -569,11 +569,10 @@ def _create_new_ad(meta_adset_id, meta_creative_id, headline):
             "status": "ACTIVE"
         }
         url = f"{BASE_URL}/act_{AD_ACCOUNT_ID}/ads"
-        response = requests.post(
+        response = meta_api.post(
             url,
             headers={"Authorization": f"Bearer {ACCESS_TOKEN}"},
             json=payload,
-            timeout=30
         )
         response.raise_for_status()
 
@@ -641,7 +640,7 @@ def update_audience_targeting(decision_data: Dict):
 
         # Use LangChain LLM
         try:
-            response_text = llm.invoke(prompt).strip()
+            response_text = llm.invoke(prompt).content.strip()
 
             if response_text.startswith("```"):
                 response_text = response_text.split("\n", 1)[1].rsplit("\n", 1)[0]
@@ -676,10 +675,11 @@ def update_audience_targeting(decision_data: Dict):
 
         # 3. Update AdSet targeting on Meta
         update_url = f"{BASE_URL}/{adset_id}"
-        response = requests.post(
+        response = meta_api.post(
             update_url,
             params={"access_token": ACCESS_TOKEN},
-            json={"targeting": targeting}
+            json={"targeting": targeting},
+            idempotent=True,
         )
         response.raise_for_status()
 
@@ -855,26 +855,14 @@ def optimize_campaign_budget(decision_data: Dict, config: Dict = None):
         if abs(new_budget - current_budget) < config['min_change']:
             return {"status": "noop", "message": "Budget change below threshold"}
 
-        # Update Meta (with basic retry)
-        success = False
-        for attempt in range(2):
-            try:
-                response = requests.post(
-                    f"{BASE_URL}/{adset_id}",
-                    params={"access_token": ACCESS_TOKEN},
-                    json={"daily_budget": int(new_budget * 100)},
-                    timeout=30
-                )
-                response.raise_for_status()
-                success = True
-                break
-            except requests.RequestException as e:
-                if attempt == 1:  # Last attempt
-                    raise e
-                time.sleep(1)
-
-        if not success:
-            return {"status": "failed", "error": "Meta API update failed"}
+        # Update Meta (the shared client retries with backoff)
+        response = meta_api.post(
+            f"{BASE_URL}/{adset_id}",
+            params={"access_token": ACCESS_TOKEN},
+            json={"daily_budget": int(new_budget * 100)},
+            idempotent=True,
+        )
+        response.raise_for_status()
 
         # Update database
         campaign.budget = new_budget
@@ -410,9 +410,9 @@ def _create_decision(decision, reason, metrics, analysis, priority):
         "priority_actions": analysis.get("priority_actions", []),
         "recommendations": analysis.get("recommendations", [])
     }
-    from agent.tools.optimization.scheduler import send_campaign_alert
+    from agent.tools.alert_outbox import queue_alert
 
-    send_campaign_alert(decision,reason)
+    queue_alert(f"Campaign {metrics.get('meta_campaign_id')}: {decision}", f"<p>{reason}</p>")
 
     return decision_data
 
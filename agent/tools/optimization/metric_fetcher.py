@@ -3,12 +3,14 @@ from django.utils import timezone as django_timezone
 import requests
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List
 
 import glob
 from dotenv import load_dotenv
 # imports for langchain, plotly and Chroma
 from agent.tools.system_prompt import analyze_system_prompt
+from agent.tools.meta_client import fetch_account_insights, meta_api
 from openai import OpenAI
 from datetime import datetime, timedelta, timezone
 from langchain.tools import tool
@@ -32,6 +34,7 @@ from langchain.tools import tool
 from typing import Dict
 
 from agent.tools.rag_setup import setup_product_rag_chroma
+from agent.tools.optimization.metric_history import ctr_trends, record_snapshots, rollup_metrics
 from langchain.chains import RetrievalQA
 from langchain.chat_models import ChatOpenAI
 
@@ -72,67 +75,70 @@ AD_ACCOUNT_ID = os.getenv("fb_ad_account_id")
 
 
 
-@tool
-def fetch_campaign_metrics(meta_campaign_id: str) -> dict:
-    """
-    Fetch performance metrics for a Meta campaign and update the Campaign model.
-    Returns a structured dictionary of metrics or an error object.
-    """
 
+INSIGHT_FIELDS = [
+    'campaign_name',
+    'impressions',
+    'reach',
+    'frequency',
+    'clicks',
+    'ctr',
+    'cpc',
+    'spend',
+    'inline_link_clicks',
+    'actions',
+    'purchase_roas'
+]
+
+# Worker threads used when collecting metrics for many campaigns at once
+METRICS_MAX_WORKERS = int(os.getenv("METRICS_MAX_WORKERS", "16"))
+# Campaign ids filtered into one account-level insights query
+INSIGHTS_CAMPAIGNS_PER_QUERY = 100
+def _request_campaign_insights(meta_campaign_id: str):
+    """Network only: GET /{meta_campaign_id}/insights."""
     url = f"{BASE_URL}/{meta_campaign_id}/insights"
     params = {
         'access_token': ACCESS_TOKEN,
-        'fields': ','.join([
-            'campaign_name',
-            'impressions',
-            'reach',
-            'frequency',
-            'clicks',
-            'ctr',
-            'cpc',
-            'spend',
-            'inline_link_clicks',
-            'actions',
-            'purchase_roas'
-        ]),
+        'fields': ','.join(INSIGHT_FIELDS),
         'date_preset': 'today'  # change to 'last_7d' or 'yesterday' for better signal
     }
+    return meta_api.get(url, params=params)
 
-    resp = requests.get(url, params=params)
 
+def _parse_insights_response(resp):
+    """Returns (row, error) from an insights response."""
     if resp.status_code != 200:
         print("❌ Meta API Error:")
         print(resp.json())
-        return {"error": resp.json()}
+        return None, resp.json()
 
     data = resp.json().get('data', [])
     if not data:
-        return {"error": "No data returned from Meta."}
+        return None, "No data returned from Meta."
+    return data[0], None
 
-    row = data[0]
 
-    # Handle ROAS value safely
+def _metrics_from_row(meta_campaign_id: str, row: dict, campaign=None) -> dict:
+    """Build the structured metrics dict from an insights row and the local campaign record."""
     spend = float(row.get("spend", 0))
 
     # ⬇️ Get local revenue from DB
-    try:
-        campaign = agent_models.Campaign.objects.get(meta_campaign_id=meta_campaign_id)
+    if campaign is not None:
         purchases = int(campaign.purchases or 0)  # ← read from your model
         start_date = campaign.created_at  # Already a datetime object
         now = datetime.now(timezone.utc)
         days_running = max(1, (now - start_date).days)
         revenue = float(campaign.revenue or 0)
-    except agent_models.Campaign.DoesNotExist:
+    else:
         revenue = 0
         purchases = 0
+        days_running = 1
 
     # 💡 Calculate ROAS
     roas = round(revenue / spend, 2) if spend > 0 and revenue > 0 else 0.0
 
-
-
     # Final structured result
-    metrics = {
+    return {
         "meta_campaign_id": meta_campaign_id,
         "campaign_name": row.get("campaign_name", ""),
         "impressions": int(row.get("impressions", 0)),
@@ -141,26 +147,106 @@ def fetch_campaign_metrics(meta_campaign_id: str) -> dict:
         "clicks": int(row.get("inline_link_clicks", row.get("clicks", 0))),
         "ctr": float(row.get("ctr", 0)),
         "cpc": float(row.get("cpc", 0)),
-        "spend": float(row.get("spend", 0)),
+        "spend": spend,
         "purchases": purchases,
         "purchase_roas": roas,
         "profit": round(revenue - spend, 2),
-        "days_running":days_running
+        "days_running": days_running
 
     }
 
+
+def _apply_metrics(campaign, metrics: dict):
+    campaign.result_metrics = metrics
+    campaign.purchase_roas = metrics["purchase_roas"]
+    campaign.updated_at = django_timezone.now()
+
+
+@tool
+def fetch_campaign_metrics(meta_campaign_id: str) -> dict:
+    """
+    Fetch performance metrics for a Meta campaign and update the Campaign model.
+    Returns a structured dictionary of metrics or an error object.
+    """
+    resp = _request_campaign_insights(meta_campaign_id)
+    row, error = _parse_insights_response(resp)
+    if error:
+        return {"error": error}
+
+    campaign = agent_models.Campaign.objects.filter(meta_campaign_id=meta_campaign_id).first()
+    metrics = _metrics_from_row(meta_campaign_id, row, campaign)
+
     # ⏱️ Update campaign summary in your Django model
-    try:
-        campaign.result_metrics = metrics
-        campaign.purchase_roas = roas
-        campaign.updated_at = timezone.now()
+    if campaign is not None:
+        _apply_metrics(campaign, metrics)
         campaign.save()
-    except agent_models.Campaign.DoesNotExist:
+        # 📈 Keep the fetch in the campaign's history instead of only overwriting result_metrics
+        record_snapshots([metrics], [campaign])
+    else:
         print(f"⚠️ Campaign with ID {meta_campaign_id} not found in DB.")
 
+    metrics["ctr_trend_pct"] = ctr_trends([meta_campaign_id])[meta_campaign_id]
     return metrics
 
 
+def collect_campaign_metrics(campaigns, max_workers: int = METRICS_MAX_WORKERS) -> dict:
+    """
+    Fetches insights for many campaigns with account-level insights queries
+    (up to INSIGHTS_CAMPAIGNS_PER_QUERY campaigns each), run concurrently on a bounded
+    thread pool, and writes all results back with a single bulk update.
+    Per-account concurrency and usage-based throttling are handled by the shared meta_api client.
+    Returns {"metrics": [...], "errors": {meta_campaign_id: error}}.
+    """
+    campaigns = [campaign for campaign in campaigns if campaign.meta_campaign_id]
+    metrics_list, errors, updated = [], {}, []
+
+    # Campaign rows don't store their ad account; everything lives under fb_ad_account_id
+    chunks = [
+        (AD_ACCOUNT_ID, campaigns[start:start + INSIGHTS_CAMPAIGNS_PER_QUERY])
+        for start in range(0, len(campaigns), INSIGHTS_CAMPAIGNS_PER_QUERY)
+    ]
+
+    def fetch(account_id, chunk):
+        return fetch_account_insights(
+            INSIGHT_FIELDS,
+            [campaign.meta_campaign_id for campaign in chunk],
+            ad_account_id=account_id,
+        )
+
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+            futures = {pool.submit(fetch, account_id, chunk): chunk for account_id, chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    print(f"❌ Meta insights query failed: {e}")
+                    errors.update({campaign.meta_campaign_id: str(e) for campaign in chunk})
+                    continue
+
+                for campaign in chunk:
+                    row = rows.get(campaign.meta_campaign_id)
+                    if not row:
+                        errors[campaign.meta_campaign_id] = "No data returned from Meta."
+                        continue
+                    metrics = _metrics_from_row(campaign.meta_campaign_id, row, campaign)
+                    _apply_metrics(campaign, metrics)
+                    updated.append(campaign)
+                    metrics_list.append(metrics)
+
+    # ⏱️ One write for the whole batch
+    if updated:
+        agent_models.Campaign.objects.bulk_update(updated, ["result_metrics", "purchase_roas", "updated_at"])
+        record_snapshots(metrics_list, updated)
+        rollup_metrics()
+
+    trends = ctr_trends([metrics["meta_campaign_id"] for metrics in metrics_list])
+    for metrics in metrics_list:
+        metrics["ctr_trend_pct"] = trends[metrics["meta_campaign_id"]]
+
+    return {"metrics": metrics_list, "errors": errors}
+
 
 @tool
 def fetch_all_active_campaign_metrics() -> list[dict]:
@@ -168,40 +254,10 @@ def fetch_all_active_campaign_metrics() -> list[dict]:
     Fetch metrics for all active Meta campaigns in the DB.
     Returns a list of metric dictionaries (one per campaign).
     """
-    metrics_list = []
     active_campaigns = agent_models.Campaign.objects.filter(status="active")
+    collected = collect_campaign_metrics(active_campaigns)
 
-    for campaign in active_campaigns:
-        meta_campaign_id = campaign.meta_campaign_id
-        metrics = fetch_campaign_metrics(meta_campaign_id)
-
-        if "error" not in metrics:
-            metrics_list.append(metrics)
-        else:
-            print(f"⚠️ Skipping campaign {meta_campaign_id}: {metrics['error']}")
-
-    return metrics_list
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    for meta_campaign_id, error in collected["errors"].items():
+        print(f"⚠️ Skipping campaign {meta_campaign_id}: {error}")
 
+    return collected["metrics"]
@@ -0,0 +1,182 @@
+import os
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.db.models import Avg, Count, ExpressionWrapper, F, FloatField, Max, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from agent import models as agent_models
+from agent.tools.optimization.performance_analytics import invalidate_performance_reports
+
+
+# Raw snapshots are kept this long (long enough for the fatigue baseline), then only their rollups remain
+METRICS_RAW_RETENTION_DAYS = int(os.getenv("METRICS_RAW_RETENTION_DAYS", "14"))
+# Hourly rollups are kept this long; daily rollups are kept for good
+METRICS_HOURLY_RETENTION_DAYS = int(os.getenv("METRICS_HOURLY_RETENTION_DAYS", "90"))
+# CTR over the last FATIGUE_RECENT_HOURS is compared with the FATIGUE_BASELINE_DAYS before them
+FATIGUE_RECENT_HOURS = int(os.getenv("FATIGUE_RECENT_HOURS", "24"))
+FATIGUE_BASELINE_DAYS = int(os.getenv("FATIGUE_BASELINE_DAYS", "7"))
+# A CTR this much (percent) below its baseline counts as creative fatigue once frequency is up
+FATIGUE_CTR_DROP_PCT = float(os.getenv("FATIGUE_CTR_DROP_PCT", "20"))
+
+# Rates are averaged over a period; totals are Meta's "today so far" figures, so a period keeps their peak
+RATE_FIELDS = ["frequency", "ctr", "cpc", "purchase_roas"]
+TOTAL_FIELDS = ["impressions", "reach", "clicks", "purchases", "spend", "revenue"]
+METRIC_FIELDS = TOTAL_FIELDS + RATE_FIELDS
+
+
+def _snapshot_values(metrics: dict) -> dict:
+    values = {field: metrics.get(field) or 0 for field in METRIC_FIELDS}
+    # The revenue behind the reported ROAS, so it sums across campaigns and days where ROAS can't
+    values["revenue"] = metrics.get("revenue") or round(values["spend"] * values["purchase_roas"], 2)
+    return values
+
+
+def record_snapshots(metrics_list: List[dict], campaigns: Iterable, fetched_at=None) -> int:
+    """
+    Appends one snapshot per metrics dict (as built by metric_fetcher) for the matching campaign,
+    folds the metrics into the products' history digests and drops cached performance reports.
+    """
+    from agent.tools.history_digest import record_campaign_metrics
+
+    fetched_at = fetched_at or timezone.now()
+    by_meta_id = {campaign.meta_campaign_id: campaign for campaign in campaigns}
+    pairs = [(by_meta_id[metrics["meta_campaign_id"]], metrics)
+             for metrics in metrics_list if metrics.get("meta_campaign_id") in by_meta_id]
+    agent_models.CampaignMetricSnapshot.objects.bulk_create([
+        agent_models.CampaignMetricSnapshot(
+            campaign=campaign, fetched_at=fetched_at, **_snapshot_values(metrics)
+        )
+        for campaign, metrics in pairs
+    ])
+    record_campaign_metrics(pairs)
+    if pairs:
+        invalidate_performance_reports()
+    return len(pairs)
+
+
+def _weighted(field: str):
+    return ExpressionWrapper(Sum(F(field) * F("samples")) * 1.0 / Sum("samples"), output_field=FloatField())
+
+
+def _snapshot_aggregates() -> dict:
+    return {"samples": Count("id"), "frequency_max": Max("frequency"),
+            **{field: Avg(field) for field in RATE_FIELDS}, **{field: Max(field) for field in TOTAL_FIELDS}}
+
+
+def _rollup_aggregates() -> dict:
+    return {"samples": Sum("samples"), "frequency_max": Max("frequency_max"),
+            **{field: _weighted(field) for field in RATE_FIELDS}, **{field: Max(field) for field in TOTAL_FIELDS}}
+
+
+def _grouped(queryset, group: list, aggregates: dict) -> List[dict]:
+    # Aggregates are aliased while grouping, since Django won't annotate a name that is also a model field
+    rows = queryset.values(*group).annotate(**{f"agg_{name}": expression for name, expression in aggregates.items()})
+    return [{**{key: row[key] for key in group}, **{name: row[f"agg_{name}"] for name in aggregates}} for row in rows]
+
+
+def _save_rollups(period: str, rows: List[dict]) -> int:
+    rollups = [agent_models.CampaignMetricRollup(period=period, period_start=row.pop("start"), **row) for row in rows]
+    agent_models.CampaignMetricRollup.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=["campaign", "period", "period_start"],
+        update_fields=["samples", "frequency_max", *METRIC_FIELDS],
+    )
+    return len(rollups)
+
+
+def rollup_metrics(now=None) -> Dict[str, int]:
+    """
+    Summarizes completed hours of snapshots into hourly rollups and completed days of those into daily
+    rollups (picking up from the last period already rolled), then prunes raw snapshots and hourly rollups
+    past their retention. Safe to run as often as wanted.
+    """
+    now = now or timezone.now()
+    hour_start = now.replace(minute=0, second=0, microsecond=0)
+    day_start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    rollups = agent_models.CampaignMetricRollup.objects
+
+    snapshots = agent_models.CampaignMetricSnapshot.objects.filter(fetched_at__lt=hour_start)
+    last_hour = rollups.filter(period="hour").aggregate(last=Max("period_start"))["last"]
+    if last_hour:
+        snapshots = snapshots.filter(fetched_at__gte=last_hour)
+    hourly = _save_rollups("hour", _grouped(snapshots.annotate(start=TruncHour("fetched_at")),
+                                            ["campaign_id", "start"], _snapshot_aggregates()))
+
+    hours = rollups.filter(period="hour", period_start__lt=day_start)
+    last_day = rollups.filter(period="day").aggregate(last=Max("period_start"))["last"]
+    if last_day:
+        hours = hours.filter(period_start__gte=last_day)
+    daily = _save_rollups("day", _grouped(hours.annotate(start=TruncDay("period_start")),
+                                          ["campaign_id", "start"], _rollup_aggregates()))
+
+    pruned = agent_models.CampaignMetricSnapshot.objects.filter(
+        fetched_at__lt=min(hour_start, now - timedelta(days=METRICS_RAW_RETENTION_DAYS))
+    ).delete()[0]
+    pruned += rollups.filter(
+        period="hour", period_start__lt=min(day_start, now - timedelta(days=METRICS_HOURLY_RETENTION_DAYS))
+    ).delete()[0]
+    if daily:
+        # Reports read finished days from the daily rollups
+        invalidate_performance_reports()
+    return {"hourly": hourly, "daily": daily, "pruned": pruned}
+
+
+def metric_history(campaign_id: int, since, until=None, period: Optional[str] = None) -> List[dict]:
+    """
+    One campaign's metrics between since and until, oldest first: raw snapshots (period=None)
+    or "hour" / "day" rollups. Each row has "at" (fetch time or period start) and the metric fields.
+    """
+    until = until or timezone.now()
+    if period is None:
+        rows = agent_models.CampaignMetricSnapshot.objects.filter(
+            campaign_id=campaign_id, fetched_at__gte=since, fetched_at__lt=until
+        ).order_by("fetched_at").values(*METRIC_FIELDS, at=F("fetched_at"))
+    else:
+        rows = agent_models.CampaignMetricRollup.objects.filter(
+            campaign_id=campaign_id, period=period, period_start__gte=since, period_start__lt=until
+        ).order_by("period_start").values("samples", "frequency_max", *METRIC_FIELDS, at=F("period_start"))
+    return list(rows)
+
+
+def window_aggregates(campaign_ids: Iterable[int], since, until=None) -> Dict[int, dict]:
+    """
+    Per campaign over [since, until), in one query: samples, rates averaged over the samples,
+    frequency_max and the peak of each total. Reads raw snapshots while they still cover `since`,
+    otherwise hourly rollups, otherwise daily ones. Campaigns without data in the window are left out.
+    """
+    now = timezone.now()
+    until = until or now
+    if since >= now - timedelta(days=METRICS_RAW_RETENTION_DAYS):
+        rows = _grouped(agent_models.CampaignMetricSnapshot.objects.filter(
+            campaign_id__in=campaign_ids, fetched_at__gte=since, fetched_at__lt=until
+        ), ["campaign_id"], _snapshot_aggregates())
+    else:
+        period = "hour" if since >= now - timedelta(days=METRICS_HOURLY_RETENTION_DAYS) else "day"
+        rows = _grouped(agent_models.CampaignMetricRollup.objects.filter(
+            campaign_id__in=campaign_ids, period=period, period_start__gte=since, period_start__lt=until
+        ), ["campaign_id"], _rollup_aggregates())
+    return {row.pop("campaign_id"): row for row in rows}
+
+
+def ctr_trends(meta_campaign_ids: Iterable[str], now=None) -> Dict[str, Optional[float]]:
+    """
+    Percent change of each campaign's CTR over the last FATIGUE_RECENT_HOURS against the
+    FATIGUE_BASELINE_DAYS before, from local history (negative = falling); None without enough history.
+    """
+    now = now or timezone.now()
+    ids = dict(agent_models.Campaign.objects.filter(meta_campaign_id__in=list(meta_campaign_ids))
+               .values_list("id", "meta_campaign_id"))
+    recent_start = now - timedelta(hours=FATIGUE_RECENT_HOURS)
+    recent = window_aggregates(ids, recent_start, now)
+    baseline = window_aggregates(ids, recent_start - timedelta(days=FATIGUE_BASELINE_DAYS), recent_start)
+
+    trends = {meta_campaign_id: None for meta_campaign_id in meta_campaign_ids}
+    for campaign_id, meta_campaign_id in ids.items():
+        if campaign_id in recent and baseline.get(campaign_id, {}).get("ctr"):
+            trends[meta_campaign_id] = round(
+                (recent[campaign_id]["ctr"] - baseline[campaign_id]["ctr"]) / baseline[campaign_id]["ctr"] * 100, 2
+            )
+    return trends
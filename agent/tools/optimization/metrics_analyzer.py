@@ -77,7 +77,7 @@ def analyze_campaign_metrics(metrics: dict) -> dict:
     Analyze Meta campaign metrics with adaptive scoring and smart flagging.
     Provides actionable insights for campaign optimization and send a brief email summary.
     """
-    from agent.tools.optimization.scheduler import send_campaign_alert
+    from agent.tools.alert_outbox import queue_alert
 
     # ----------------------------
     # ✅ Extract Raw Metrics
@@ -96,6 +96,12 @@ def analyze_campaign_metrics(metrics: dict) -> dict:
     cpm = metrics.get("cpm", 0)
     campaign_objective = metrics.get("objective", "conversions")  # Default to conversions
     days_running = metrics.get("days_running", 1)  # How long campaign has been active
+    # CTR change vs the campaign's own recent history; the fetcher attaches it, else read it from local history
+    if "ctr_trend_pct" in metrics:
+        ctr_trend = metrics["ctr_trend_pct"]
+    else:
+        from agent.tools.optimization.metric_history import ctr_trends
+        ctr_trend = ctr_trends([meta_campaign_id])[meta_campaign_id]
 
     # ----------------------------
     # ✅ Calculate Derived Metrics
@@ -145,10 +151,17 @@ def analyze_campaign_metrics(metrics: dict) -> dict:
         score += 20
         recommendations.append("🟢 Excellent CTR! Your creative is highly engaging.")
 
-    # Creative fatigue detection
-    if ctr < 1.0 and frequency > 1.5:
+    # Creative fatigue detection: low CTR, or CTR falling against its baseline, once people see the ads repeatedly
+    from agent.tools.optimization.metric_history import FATIGUE_CTR_DROP_PCT
+    ctr_declining = ctr_trend is not None and ctr_trend <= -FATIGUE_CTR_DROP_PCT
+    if frequency > 1.5 and (ctr < 1.0 or ctr_declining):
         flags.append("creative_fatigue")
-        recommendations.append("🟡 Low CTR + high frequency indicates creative fatigue. Refresh ads immediately.")
+        if ctr < 1.0:
+            recommendations.append("🟡 Low CTR + high frequency indicates creative fatigue. Refresh ads immediately.")
+        else:
+            recommendations.append(
+                f"🟡 CTR down {-ctr_trend:.0f}% from its recent baseline at {frequency:.1f} frequency "
+                f"indicates creative fatigue. Refresh ads soon.")
 
     # ----------------------------
     # 2. ROAS Analysis — Profitability
@@ -336,7 +349,12 @@ def analyze_campaign_metrics(metrics: dict) -> dict:
         "priority_actions": priority_actions,
         "analysis_summary": f"{status_emoji} Campaign is {status} with {score}/100 health score"
     }
-    send_campaign_alert(flags,recommendations)
+    # Queued, not sent: the alert outbox emails one digest per optimization run in the background
+    queue_alert(
+        f"{status_emoji} Campaign {meta_campaign_id} is {status} ({score}/100)",
+        f"<p>Flags: {', '.join(flags) or 'none'}</p>"
+        f"<ul>{''.join(f'<li>{recommendation}</li>' for recommendation in recommendations)}</ul>",
+    )
     return analysis
 
 
@@ -0,0 +1,132 @@
+import os
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from django.core.cache import cache
+from django.db.models import F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from agent import models as agent_models
+
+
+# Days a report covers when no start date is given (today included)
+ANALYTICS_DEFAULT_DAYS = int(os.getenv("ANALYTICS_DEFAULT_DAYS", "30"))
+# Reports are also dropped on every metric write; the timeout bounds staleness in other processes
+ANALYTICS_CACHE_SECONDS = int(os.getenv("ANALYTICS_CACHE_SECONDS", "300"))
+
+# Report keys per grouping, with the campaign fields they come from
+ANALYTICS_GROUPS = {
+    "product": {"product_id": "campaign__product__product_id", "product_name": "campaign__product__name"},
+    "platform": {"platform": "campaign__platform"},
+    "day": {},
+}
+SUMMED_FIELDS = ["spend", "revenue", "impressions", "clicks", "purchases"]
+
+_VERSION_KEY = "performance_analytics:version"
+
+
+def invalidate_performance_reports() -> None:
+    """Drops every cached report; called whenever campaign metrics are written."""
+    cache.set(_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _version() -> str:
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(_VERSION_KEY, version, None)
+        version = cache.get(_VERSION_KEY, version)
+    return version
+
+
+def _with_rates(row: dict) -> dict:
+    spend, impressions, clicks = row["spend"], row["impressions"], row["clicks"]
+    return {
+        **row,
+        "spend": round(spend, 2),
+        "revenue": round(row["revenue"], 2),
+        "roas": round(row["revenue"] / spend, 2) if spend else 0.0,
+        "ctr": round(clicks / impressions * 100, 2) if impressions else 0.0,
+        "cvr": round(row["purchases"] / clicks * 100, 2) if clicks else 0.0,
+    }
+
+
+def _day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def campaign_performance(group_by: str, since: Optional[date] = None, until: Optional[date] = None,
+                         product_id: Optional[str] = None) -> dict:
+    """
+    Spend, revenue, impressions, clicks and purchases summed per product, platform or day between
+    since and until (dates, both included; default the last ANALYTICS_DEFAULT_DAYS), with ROAS, CTR
+    and CVR (percent) derived from the sums, plus the same for the whole range under "totals".
+    Optionally limited to one product (its product_id). Cached until the next metric write.
+    """
+    if group_by not in ANALYTICS_GROUPS:
+        raise ValueError(f"Unknown grouping {group_by!r} (use {', '.join(ANALYTICS_GROUPS)})")
+    until = until or timezone.localdate()
+    since = since or until - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    if since > until:
+        raise ValueError("since is after until")
+
+    key = f"performance_analytics:{_version()}:{group_by}:{since}:{until}:{product_id or ''}"
+    report = cache.get(key)
+    if report is None:
+        report = _campaign_performance(group_by, since, until, product_id)
+        cache.set(key, report, ANALYTICS_CACHE_SECONDS)
+    return report
+
+
+def _campaign_performance(group_by: str, since: date, until: date, product_id: Optional[str]) -> dict:
+    keys = ANALYTICS_GROUPS[group_by]
+    group = [*keys, "day"] if group_by == "day" else list(keys)
+    start, end = _day_start(since), _day_start(until + timedelta(days=1))
+
+    rollups = agent_models.CampaignMetricRollup.objects.all()
+    snapshots = agent_models.CampaignMetricSnapshot.objects.all()
+    if product_id:
+        rollups = rollups.filter(campaign__product__product_id=product_id)
+        snapshots = snapshots.filter(campaign__product__product_id=product_id)
+
+    # Finished days come from the daily rollups; days not rolled up yet (today) from the raw snapshots
+    last_day = agent_models.CampaignMetricRollup.objects.filter(period="day")\
+        .aggregate(last=Max("period_start"))["last"]
+    rolled_until = min(max(start, last_day + timedelta(days=1)), end) if last_day else start
+
+    groups = defaultdict(lambda: dict.fromkeys(SUMMED_FIELDS, 0))
+    # A daily rollup already holds a campaign's whole day, so it sums straight into the report rows
+    sums = rollups.filter(period="day", period_start__gte=start, period_start__lt=rolled_until)\
+        .annotate(day=TruncDate("period_start"), **{key: F(path) for key, path in keys.items()})\
+        .values(*group)\
+        .annotate(**{f"total_{field}": Sum(field) for field in SUMMED_FIELDS})
+    for row in sums:
+        totals = groups[tuple(row[key] for key in group)]
+        for field in SUMMED_FIELDS:
+            totals[field] += row[f"total_{field}"] or 0
+
+    # Snapshots hold "today so far" totals, so a campaign's day counts at its peak before summing
+    peaks = snapshots.filter(fetched_at__gte=rolled_until, fetched_at__lt=end)\
+        .annotate(day=TruncDate("fetched_at"), **{key: F(path) for key, path in keys.items()})\
+        .values("campaign_id", "day", *keys)\
+        .annotate(**{f"peak_{field}": Max(field) for field in SUMMED_FIELDS})
+    for row in peaks:
+        totals = groups[tuple(row[key] for key in group)]
+        for field in SUMMED_FIELDS:
+            totals[field] += row[f"peak_{field}"]
+
+    # Days in order, products and platforms biggest spend first
+    order = (lambda item: item[0]) if group_by == "day" else (lambda item: -item[1]["spend"])
+    results = [_with_rates({**dict(zip(group, values)), **totals})
+               for values, totals in sorted(groups.items(), key=order)]
+    overall = {field: sum(totals[field] for totals in groups.values()) for field in SUMMED_FIELDS}
+    return {
+        "group_by": group_by,
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "results": results,
+        "totals": _with_rates(overall),
+    }
@@ -1,10 +1,12 @@
 from typing import List, Dict
 from langchain.tools import tool
-from agent.tools.optimization.metric_fetcher import fetch_campaign_metrics
+from agent.tools.optimization.metric_fetcher import fetch_campaign_metrics, collect_campaign_metrics
+from agent.tools.meta_client import meta_api
 from agent.tools.optimization.metrics_analyzer import analyze_campaign_metrics
 from agent.tools.optimization.decision_maker import decide_campaign_action
 from agent.tools.optimization.campaign_modifier import modify_campaign_from_decision
 from agent.models import Campaign
+from agent.tools.alert_outbox import alert_run, queue_alert
 
 import smtplib
 from email.mime.text import MIMEText
@@ -27,21 +29,28 @@ def run_optimization():
 
 
     report = {"optimized": [], "skipped": [], "failed": []}
+    # Every alert raised during this pass goes out as one digest when it ends
+    with alert_run():
+        _optimize_active_campaigns(report)
+    report["meta_api_latency"] = meta_api.latency_stats()
+    return report
+
 
+def _optimize_active_campaigns(report: Dict):
     active_campaigns = Campaign.objects.filter(status="active")  # or your custom filter
 
-    for campaign in active_campaigns:
-        try:
-            # 1. Fetch metrics
-            metrics = fetch_campaign_metrics(campaign.meta_campaign_id)
-            if "error" in metrics:
-                report["skipped"].append({campaign.meta_campaign_id: metrics["error"]})
-                continue
+    # 1. Fetch metrics for every campaign concurrently, saved in one bulk write
+    collected = collect_campaign_metrics(active_campaigns)
+    for meta_campaign_id, error in collected["errors"].items():
+        report["skipped"].append({meta_campaign_id: error})
 
+    for metrics in collected["metrics"]:
+        meta_campaign_id = metrics["meta_campaign_id"]
+        try:
             # 2. Analyze
             analysis = analyze_campaign_metrics(metrics)
             if analysis.get("score", 0) < 20:  # Optional: skip dead campaigns
-                report["skipped"].append({campaign.meta_campaign_id: "Low health score"})
+                report["skipped"].append({meta_campaign_id: "Low health score"})
                 continue
 
             # 3. Decide
@@ -50,15 +59,13 @@ def run_optimization():
             # 4. Modify campaign
             result = modify_campaign_from_decision(decision)
             report["optimized"].append({
-                "campaign_id": campaign.meta_campaign_id,
+                "campaign_id": meta_campaign_id,
                 "decision": decision.get("decision"),
                 "result": result
             })
 
         except Exception as e:
-            report["failed"].append({campaign.meta_campaign_id: str(e)})
-
-    return report
+            report["failed"].append({meta_campaign_id: str(e)})
 
 
 
@@ -66,20 +73,12 @@ def run_optimization():
 @tool
 def send_campaign_alert(subject: str, html_message: str) -> Dict:
     """
-    Sends an email using Django's SMTP backend configured in settings.py.
+    Queues an alert email; the alert outbox sends it in the background through Django's SMTP backend,
+    together with other alerts of the same run.
     """
     try:
-
-        send_mail(
-            subject=subject,
-            message="",  # leave plain text blank if sending only HTML
-            from_email=from_email,
-            recipient_list=[to_email],
-            fail_silently=False,
-            html_message=html_message,
-        )
-
-        return {"status": "sent", "to": to_email, "subject": subject}
+        alert = queue_alert(subject, html_message)
+        return {"status": "queued", "to": to_email, "subject": subject, "alert_id": alert.id}
 
     except Exception as e:
         return {"status": "failed", "error": str(e)}
@@ -0,0 +1,182 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+from agent import models as agent_models
+
+
+# Columns copied onto Product as they are (list columns also accept a JSON array or "a|b|c" in CSV)
+TEXT_FIELDS = ["description", "product_type", "value", "url"]
+LIST_FIELDS = ["features", "useCases", "benefits"]
+DECIMAL_FIELDS = ["price", "discount_price", "budget"]
+# Base slugs looked up per query by allocate_slugs
+SLUG_QUERY_BATCH = 400
+
+
+def read_products(path: str, fmt: str = None) -> Iterator[dict]:
+    """Rows of a CSV (with a header) or JSONL product file; the format defaults to the file extension."""
+    fmt = fmt or Path(path).suffix.lstrip(".").lower()
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        elif fmt in ("jsonl", "ndjson"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError(f"Unsupported product file format: {fmt!r} (use csv or jsonl)")
+
+
+def _as_list(value) -> list:
+    if value in (None, ""):
+        return []
+    if isinstance(value, list):
+        return value
+    value = str(value).strip()
+    if value.startswith("["):
+        return json.loads(value)
+    return [item.strip() for item in value.split("|") if item.strip()]
+
+
+def _as_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in ("0", "false", "no", "")
+
+
+def _product_fields(row: dict) -> dict:
+    """Product field values from one import row; raises ValueError on a bad row."""
+    name = str(row.get("name") or "").strip()
+    if not name:
+        raise ValueError("missing name")
+    fields = {"name": name}
+    for field in TEXT_FIELDS:
+        if row.get(field) not in (None, ""):
+            fields[field] = str(row[field])
+    for field in LIST_FIELDS:
+        fields[field] = _as_list(row.get(field))
+    for field in DECIMAL_FIELDS:
+        if row.get(field) not in (None, ""):
+            try:
+                fields[field] = Decimal(str(row[field]))
+            except InvalidOperation:
+                raise ValueError(f"{field} is not a number: {row[field]!r}")
+    if row.get("is_active") not in (None, ""):
+        fields["is_active"] = _as_bool(row["is_active"])
+    return fields
+
+
+def allocate_slugs(names: List[str]) -> List[str]:
+    """
+    Unique slugs for new products, following Product.save's scheme (name, name-1, name-2, ...).
+    Only the slugs a base can collide with ("base" and "base-...") are fetched, a few hundred
+    bases per query, instead of an exists() probe per candidate.
+    """
+    # Room for a "-NNNNN" suffix within the column
+    length = agent_models.Product._meta.get_field("slug").max_length - 6
+    bases = [slugify(name)[:length].strip("-") or "product" for name in names]
+    if not bases:
+        return []
+    distinct = sorted(set(bases))
+    taken = set()
+    # Two parameters per base; SQLite caps the parameters of one query
+    for start in range(0, len(distinct), SLUG_QUERY_BATCH):
+        batch = distinct[start:start + SLUG_QUERY_BATCH]
+        matches = Q(slug__in=batch)
+        for base in batch:
+            matches |= Q(slug__startswith=f"{base}-")
+        taken.update(agent_models.Product.objects.filter(matches).values_list("slug", flat=True))
+
+    slugs, next_suffix = [], {}
+    for base in bases:
+        slug, counter = base, next_suffix.get(base, 0)
+        if counter:
+            slug = f"{base}-{counter}"
+        while slug in taken:
+            counter += 1
+            slug = f"{base}-{counter}"
+        next_suffix[base] = counter + 1
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def _get_or_create_by_name(model, names: Iterable[str], name_field: str, defaults) -> Dict[str, object]:
+    """{name: instance} for every name, bulk-creating the missing ones."""
+    names = set(names)
+    if not names:
+        return {}
+    existing = {getattr(obj, name_field): obj for obj in model.objects.filter(**{f"{name_field}__in": names})}
+    missing = [model(**{name_field: name}, **defaults(name)) for name in sorted(names - set(existing))]
+    # A name whose slug another row already has is skipped here and matched by slug below
+    model.objects.bulk_create(missing, ignore_conflicts=True)
+    if missing:
+        slugs = {slugify(name): name for name in names - set(existing)}
+        for obj in model.objects.filter(Q(**{f"{name_field}__in": slugs.values()}) | Q(slug__in=slugs)):
+            existing[getattr(obj, name_field)] = obj
+            if obj.slug in slugs:
+                existing.setdefault(slugs[obj.slug], obj)
+    return existing
+
+
+@transaction.atomic
+def import_products(rows: Iterable[dict], embed: bool = None, batch_size: int = 1000) -> dict:
+    """
+    Creates products from import rows (name, description, product_type, value, url, price,
+    discount_price, budget, is_active, features, useCases, benefits, tags, category) with bulk inserts:
+    slugs come from allocate_slugs, tags and categories are matched by name (missing ones are created),
+    and the new products are queued for embedding in one background sync when embed is on
+    (default PRODUCT_EMBEDDING_AUTOSYNC). Bad rows are skipped and reported; the rest is all-or-nothing.
+    Returns {"created", "product_ids", "tags_created", "errors": [{"row", "error"}]}.
+    """
+    embed = settings.PRODUCT_EMBEDDING_AUTOSYNC if embed is None else embed
+    parsed, errors = [], []
+    for number, row in enumerate(rows, start=1):
+        try:
+            row_tags = [str(tag).strip() for tag in _as_list(row.get("tags")) if str(tag).strip()]
+            parsed.append((_product_fields(row), row_tags, str(row.get("category") or "").strip()))
+        except (ValueError, TypeError) as e:
+            errors.append({"row": number, "error": str(e)})
+
+    tag_count = agent_models.Tag.objects.count()
+    tags = _get_or_create_by_name(agent_models.Tag, (tag for _, row_tags, _ in parsed for tag in row_tags),
+                                  "name", lambda name: {"slug": slugify(name)})
+    categories = _get_or_create_by_name(agent_models.Category, (category for _, _, category in parsed if category),
+                                        "title", lambda title: {})
+
+    slugs = allocate_slugs([fields["name"] for fields, _, _ in parsed])
+    products = agent_models.Product.objects.bulk_create(
+        [agent_models.Product(slug=slug, category=categories.get(category), **fields)
+         for slug, (fields, _, category) in zip(slugs, parsed)],
+        batch_size=batch_size,
+    )
+
+    Through = agent_models.Product.tags.through
+    Through.objects.bulk_create(
+        [Through(product_id=product.id, tag_id=tags[tag].id)
+         for product, (_, row_tags, _) in zip(products, parsed) for tag in dict.fromkeys(row_tags) if tag in tags],
+        batch_size=batch_size, ignore_conflicts=True,
+    )
+
+    # bulk_create skips post_save, so do what the Product signals would, once for the batch
+    from agent.signal import enqueue_product_embeddings
+    from agent.tools.product_resolver import invalidate_product_index
+
+    product_ids = [product.id for product in products]
+    invalidate_product_index()
+    if embed:
+        enqueue_product_embeddings(product_ids)
+
+    return {
+        "created": len(products),
+        "product_ids": product_ids,
+        "tags_created": agent_models.Tag.objects.count() - tag_count,
+        "errors": errors,
+    }
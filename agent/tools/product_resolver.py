@@ -0,0 +1,178 @@
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+from django.utils.text import slugify
+
+from agent import models as agent_models
+
+
+# Minimum trigram similarity for a fuzzy match to be accepted
+FUZZY_MATCH_THRESHOLD = 0.4
+# Signals only invalidate this process's index, so it is also rebuilt this often to pick up
+# products saved by other workers
+PRODUCT_INDEX_TTL_SECONDS = int(os.getenv("PRODUCT_INDEX_TTL_SECONDS", "60"))
+
+resolver_stats = {"exact": 0, "fuzzy": 0, "semantic": 0, "miss": 0}
+_stats_lock = threading.Lock()
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def normalize_name(text: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9 ]", " ", (text or "").lower())).strip()
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {normalize_name(text)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _build_index() -> dict:
+    names = {}
+    grams = {}
+    postings = defaultdict(set)
+    for product_id, name in agent_models.Product.objects.values_list("id", "name").iterator():
+        names[product_id] = name
+        grams[product_id] = _trigrams(name)
+        for gram in grams[product_id]:
+            postings[gram].add(product_id)
+    return {"names": names, "grams": grams, "postings": postings, "built_at": time.monotonic()}
+
+
+def _expired(index) -> bool:
+    return index is None or time.monotonic() - index["built_at"] >= PRODUCT_INDEX_TTL_SECONDS
+
+
+def get_product_index() -> dict:
+    """
+    Trigram index over product names, built once per process and rebuilt after invalidation
+    or once PRODUCT_INDEX_TTL_SECONDS old.
+    """
+    global _index
+    index = _index
+    if _expired(index):
+        with _index_lock:
+            if _expired(_index):
+                _index = _build_index()
+            index = _index
+    return index
+
+
+def invalidate_product_index():
+    """Drop the trigram index; called from the Product save/delete signals."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def _exact_match(name: str) -> Optional[agent_models.Product]:
+    slug = slugify(name)
+    products = agent_models.Product.objects.filter(name=name.strip())
+    if slug:
+        products = products | agent_models.Product.objects.filter(slug=slug)
+    return products.first()
+
+
+def _fuzzy_match(name: str, threshold: float = FUZZY_MATCH_THRESHOLD):
+    index = get_product_index()
+    query = _trigrams(name)
+    if not query:
+        return None, 0.0
+
+    # Only products sharing at least one trigram are scored
+    overlap = defaultdict(int)
+    for gram in query:
+        for product_id in index["postings"].get(gram, ()):
+            overlap[product_id] += 1
+
+    best_id, best_score = None, 0.0
+    for product_id, shared in overlap.items():
+        score = 2 * shared / (len(query) + len(index["grams"][product_id]))  # Dice coefficient
+        if score > best_score:
+            best_id, best_score = product_id, score
+
+    if best_id is None or best_score < threshold:
+        return None, best_score
+    return agent_models.Product.objects.filter(id=best_id).first(), best_score
+
+
+def _semantic_match(name: str) -> Optional[agent_models.Product]:
+    from agent.tools.fetch_product_by_name import fetch_product_by_name
+
+    result = fetch_product_by_name(name)
+    product_id = result.get("product_id")
+    if not product_id:
+        return None
+    return agent_models.Product.objects.filter(product_id=product_id).first()
+
+
+def resolve_product(name: str, semantic: bool = True) -> Optional[agent_models.Product]:
+    """
+    Resolves a user-typed product name in three tiers:
+    exact name/slug match, trigram fuzzy match, then vector search (only if the first two miss).
+    """
+    if not name or not name.strip():
+        return None
+
+    product = _exact_match(name)
+    if product:
+        _record("exact")
+        print(f"✅ Product resolved by exact match: {product.name}")
+        return product
+
+    product, score = _fuzzy_match(name)
+    if product:
+        _record("fuzzy")
+        print(f"✅ Product resolved by fuzzy match: {product.name} (score: {score:.2f})")
+        return product
+
+    if semantic:
+        product = _semantic_match(name)
+        if product:
+            _record("semantic")
+            print(f"✅ Product resolved by semantic search: {product.name}")
+            return product
+
+    _record("miss")
+    return None
+
+
+def _record(tier: str):
+    # Resolves run on request threads and job pool threads at once
+    with _stats_lock:
+        resolver_stats[tier] += 1
+
+
+def product_resolver_stats() -> Dict:
+    """How product names were resolved in this process, per tier."""
+    with _stats_lock:
+        return dict(resolver_stats)
+
+
+def product_payload(product: agent_models.Product) -> Dict:
+    """Same shape fetch_product_by_name returns, built from the DB row."""
+    from agent.tools.rag_setup import _product_document
+
+    return {
+        "title": product.name,
+        "description": _product_document(product).page_content,
+        "product_id": product.product_id,
+        "price": float(product.price),
+        "useCases": product.useCases or [],
+        "benefits": product.benefits or "General",
+    }
+
+
+def fetch_product(name: str) -> Dict:
+    """Tiered replacement for fetch_product_by_name used by the launch path."""
+    product = resolve_product(name)
+    if not product:
+        return {
+            "error": f"No product found matching '{name}'. Please check the name or try again."
+        }
+    return product_payload(product)
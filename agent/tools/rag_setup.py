@@ -1,17 +1,17 @@
 from agent import models as agent_models
 
 import os
+import json
+import hashlib
 import glob
 from dotenv import load_dotenv
 # imports for langchain, plotly and Chroma
 from agent.tools.system_prompt import analyze_system_prompt
 from langchain.tools import tool
-from shutil import rmtree
 
 from langchain_community.document_loaders import DirectoryLoader, TextLoader
 from langchain.text_splitter import CharacterTextSplitter,RecursiveCharacterTextSplitter
 from langchain.schema import Document
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_chroma import Chroma
 from sklearn.manifold import TSNE
 import numpy as np
@@ -21,6 +21,8 @@ from langchain.chains import ConversationalRetrievalChain
 from langchain_community.vectorstores.utils import filter_complex_metadata
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
+from agent.tools.vector_store import get_product_vectorstore, get_campaign_vectorstore
+from agent.tools.llm_provider import get_chat_model
 
 
 
@@ -31,113 +33,154 @@ campaign_db_name = os.getenv("CHROMA_DB_BASE_PATH_CAMPAIGN", "./chroma_campaign_
 persist_dir = db_name  # or another env variable if you want
 MODEL = os.getenv("GPT_MODEL", "gpt-4o-mini")
 
-@tool
-def setup_product_rag_chroma(product_name: str) -> str:
-    """Creates a Chroma vectorstore from all products for semantic search and retrieval.
-        It loads product data, formats it, embeds it, and stores it for use in RAG pipelines."""
-    products = agent_models.Product.objects.all()
-    docs = []
+# Chunks embedded per Chroma call during a sync
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+chunk_splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=100)
 
-    for product in products:
-        # ✅ Extract and safely transform product fields
-        tags = list(product.tags.values_list('name', flat=True))
-        category = product.category.title if product.category else None
-        features = product.features if product.features else []
-        useCases = product.useCases if product.useCases else []
-        benefits = product.benefits if product.benefits else []
 
-        price = product.price if product.price else None
-        features_str = ", ".join(features) if isinstance(features, list) else str(features)
+def _product_document(product) -> Document:
+    """Compose the embeddable document for a single product."""
+    features = product.features if product.features else []
+    useCases = product.useCases if product.useCases else []
+    benefits = product.benefits if product.benefits else []
 
-        use_cases_str = ", ".join(useCases) if isinstance(useCases, list) else str(useCases)
-        benefits_str = ", ".join(benefits) if isinstance(benefits, list) else str(benefits)
+    features_str = ", ".join(features) if isinstance(features, list) else str(features)
+    use_cases_str = ", ".join(useCases) if isinstance(useCases, list) else str(useCases)
+    benefits_str = ", ".join(benefits) if isinstance(benefits, list) else str(benefits)
 
-        # ✅ Compose document content for embedding
-        content = (
-            f"Name: {product.name}\n"
-            f"Description: {product.description or ''}\n"
-            f"useCases: {use_cases_str}\n"
-            f"benefits: {benefits_str}\n"
-        )
+    # ✅ Compose document content for embedding
+    content = (
+        f"Name: {product.name}\n"
+        f"Description: {product.description or ''}\n"
+        f"useCases: {use_cases_str}\n"
+        f"benefits: {benefits_str}\n"
+    )
 
-        # ✅ Add document with flat metadata (avoids Chroma metadata errors)
-        metadata = {
-            "id": product.id,
-            "name": product.name,
-            "product_id": product.product_id,
-            "price": float(product.price),
-            "is_active": product.is_active,
-            "date": product.date.isoformat(),
+    # ✅ Flat metadata (avoids Chroma metadata errors)
+    metadata = {
+        "id": product.id,
+        "name": product.name,
+        "product_id": product.product_id,
+        "price": float(product.price),
+        "is_active": product.is_active,
+        "date": product.date.isoformat(),
+    }
+    return Document(page_content=content, metadata=metadata)
 
+
+def _chunk_hash(doc: Document) -> str:
+    """Stable hash of a chunk's text and metadata, stored alongside it in Chroma."""
+    payload = json.dumps({"content": doc.page_content, "metadata": doc.metadata}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _product_chunks(products) -> dict:
+    """Split products into chunks keyed by '{product.id}_{chunk_index}', each tagged with its content hash."""
+    chunks = {}
+    for product in products:
+        for i, chunk in enumerate(chunk_splitter.split_documents([_product_document(product)])):
+            chunk.metadata["content_hash"] = _chunk_hash(chunk)
+            chunks[f"{product.id}_{i}"] = chunk
+    return chunks
+
+
+def _stored_chunk_hashes(vectorstore, product_ids=None) -> dict:
+    """Fetch {chunk_id: content_hash} for stored chunks, optionally restricted to some products."""
+    if product_ids is None:
+        stored = vectorstore.get(include=["metadatas"])
+        return {
+            chunk_id: (metadata or {}).get("content_hash")
+            for chunk_id, metadata in zip(stored["ids"], stored["metadatas"])
         }
 
-        # ✅ Clean metadata using LangChain utility to ensure all values are simple types
-        doc = Document(page_content=content, metadata=metadata)
+    hashes = {}
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), 500):
+        stored = vectorstore.get(where={"id": {"$in": product_ids[start:start + 500]}}, include=["metadatas"])
+        for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+            hashes[chunk_id] = (metadata or {}).get("content_hash")
+    return hashes
 
-        # ✅ Filter complex metadata
-        #doc = filter_complex_metadata(doc)
 
-        docs.append(doc)
+def sync_product_embeddings(product_ids=None, batch_size: int = EMBED_BATCH_SIZE) -> dict:
+    """
+    Incrementally syncs product chunks into the product vector DB.
+    Only new or changed chunks are embedded (compared by content hash), in batches;
+    chunks that no longer exist are deleted. Pass product_ids to sync just those products
+    (e.g. from a post_save), or leave it empty to reconcile the whole catalog.
+    """
+    vectorstore = get_product_vectorstore()
 
-    # 2. Split documents into chunks
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=100)
-    split_docs = splitter.split_documents(docs)
-    print(f'✅ Document split successful..........{split_docs[0]}')
+    products = agent_models.Product.objects.all()
+    if product_ids is not None:
+        product_ids = [int(pk) for pk in product_ids]
+        products = products.filter(id__in=product_ids)
 
-    print(f"Total number of chunks: {len(split_docs)}")
-    print(f"Document types found: {set(doc.metadata['name'] for doc in split_docs)}")
+    chunks = _product_chunks(products.iterator())
+    stored = _stored_chunk_hashes(vectorstore, product_ids)
 
-    # 3. Generate IDs per chunk
-    ids = [f"{doc.metadata['id']}_{i}" for i, doc in enumerate(split_docs)]
+    changed_ids = [chunk_id for chunk_id, chunk in chunks.items()
+                   if stored.get(chunk_id) != chunk.metadata["content_hash"]]
+    stale_ids = [chunk_id for chunk_id in stored if chunk_id not in chunks]
 
-    # 4. Setup embedding model
-    embeddings = OpenAIEmbeddings()
+    for start in range(0, len(changed_ids), batch_size):
+        batch_ids = changed_ids[start:start + batch_size]
+        vectorstore.add_documents([chunks[chunk_id] for chunk_id in batch_ids], ids=batch_ids)  # upsert
 
-    # 5. Persist to ChromaDB
-    if os.path.exists(db_name):  # ✅ db_name must be defined at module level or passed
-        vectorstore = Chroma(persist_directory=persist_dir, embedding_function=embeddings)
+    if stale_ids:
+        vectorstore.delete(ids=stale_ids)
 
-        existing = set()
-        if hasattr(vectorstore, 'get'):
-            all_data = vectorstore.get(include=['metadatas'])  # ✅ 'ids' is invalid include
-            existing = set(all_data.get('ids', []))  # Safe fallback
+    result = {
+        "embedded": len(changed_ids),
+        "deleted": len(stale_ids),
+        "unchanged": len(chunks) - len(changed_ids),
+    }
+    print(f"✅ Product vector DB synced: {result}")
+    return result
 
-        new_docs = []
-        new_ids = []
-        for doc, doc_id in zip(split_docs, ids):
-            if doc_id not in existing:
-                new_docs.append(doc)
-                new_ids.append(doc_id)
 
-        if new_docs:
-            vectorstore.add_documents(new_docs, ids=new_ids)  # ✅ Only add non-duplicate docs
-    else:
-        vectorstore = Chroma.from_documents(
-            split_docs,
-            embedding=embeddings,
-            persist_directory=persist_dir,
-            ids=ids
-        )
+def delete_product_embeddings(product_ids) -> int:
+    """Removes every stored chunk belonging to the given products."""
+    vectorstore = get_product_vectorstore()
+    stale_ids = list(_stored_chunk_hashes(vectorstore, product_ids))
+    if stale_ids:
+        vectorstore.delete(ids=stale_ids)
+    return len(stale_ids)
 
-    print(f"Vectorstore created with {vectorstore._collection.count()} documents")
+
+@tool
+def setup_product_rag_chroma(product_name: str) -> str:
+    """Creates or incrementally updates the Chroma vectorstore of all products for semantic search and retrieval.
+        Only new or changed products are re-embedded; removed products are dropped from the store."""
+    sync_product_embeddings()
+
+    vectorstore = get_product_vectorstore()
+    print(f"Vectorstore has {vectorstore._collection.count()} documents")
     print('✅ Vectorstore created and saved successfully.')
-    collection = vectorstore._collection
-    count = collection.count()
-    #print(f"There are {count:,} vectors in the vector store")
-    sample_embedding = collection.get(limit=1, include=["embeddings"])["embeddings"][0]
-    dimensions = len(sample_embedding)
-    #print(f"There are {count:,} vectors with {dimensions:,} dimensions in the vector store")
     return vectorstore
 
 
 #@tool
-def embed_campaign():
+def embed_campaign(batch_size: int = EMBED_BATCH_SIZE):
     """
-    Embed all campaigns into Chroma vector database with campaign metadata.
-    Performs a full rebuild each time.
+    Upsert campaigns into the campaign Chroma vector database with campaign metadata.
+    Campaigns are keyed on campaign_id and only re-embedded when their chunk's content hash changed
+    (including the product name, which can change without touching the campaign);
+    deleted campaigns are removed. The collection stays queryable throughout.
     """
-    campaigns = agent_models.Campaign.objects.all()
-    docs = []
+    campaign_vectorstore = get_campaign_vectorstore()
+
+    stored = campaign_vectorstore.get(include=["metadatas"])
+    stored_versions = {
+        chunk_id: (metadata or {}).get("content_hash")
+        for chunk_id, metadata in zip(stored["ids"], stored["metadatas"])
+    }
+
+    campaigns = agent_models.Campaign.objects.select_related("product").order_by("id").iterator(chunk_size=500)
+
+    seen_ids = set()
+    pending_docs, pending_ids = [], []
+    embedded = 0
 
     for campaign in campaigns:
         content = (
@@ -154,44 +197,42 @@ def embed_campaign():
         metadata = {
             "campaign_id": str(campaign.campaign_id),
             "campaign_product_name": str(campaign.product.name),
-            "meta_campaign_id": campaign.meta_campaign_id,
+            "meta_campaign_id": campaign.meta_campaign_id or "",
             "status": campaign.status,
+            "updated_at": campaign.updated_at.isoformat(),
         }
 
-        docs.append(Document(page_content=content, metadata=metadata))
-        print('docs---->',docs)
-    # Split all documents together
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=100)
-    split_docs = splitter.split_documents(docs)
-
-    print(f'✅ Split into {len(split_docs)} chunks.')
-
-    # Generate unique IDs
-    ids = [f"{doc.metadata['campaign_id']}_{i}" for i, doc in enumerate(split_docs)]
-
-    # Rebuild Chroma DB
-    if os.path.exists(campaign_db_name):
-        rmtree(campaign_db_name)
-        print(f"🧹 Wiped old vector DB at {campaign_db_name}")
-
-    embeddings = OpenAIEmbeddings()
-
-    campaign_vectorstore = Chroma.from_documents(
-        split_docs,
-        embedding=embeddings,
-        persist_directory=campaign_db_name,
-        ids=ids
-    )
-
-    print(f"✅ campaign_vectorstore now has {campaign_vectorstore._collection.count()} documents.")
+        chunks = chunk_splitter.split_documents([Document(page_content=content, metadata=metadata)])
+        for i, chunk in enumerate(chunks):
+            chunk_id = f"{campaign.campaign_id}_{i}"
+            seen_ids.add(chunk_id)
+            chunk.metadata["content_hash"] = _chunk_hash(chunk)
+            if stored_versions.get(chunk_id) == chunk.metadata["content_hash"]:
+                continue
+            pending_docs.append(chunk)
+            pending_ids.append(chunk_id)
+
+        if len(pending_ids) >= batch_size:
+            campaign_vectorstore.add_documents(pending_docs, ids=pending_ids)  # upsert
+            embedded += len(pending_ids)
+            pending_docs, pending_ids = [], []
+
+    if pending_ids:
+        campaign_vectorstore.add_documents(pending_docs, ids=pending_ids)
+        embedded += len(pending_ids)
+
+    stale_ids = [chunk_id for chunk_id in stored_versions if chunk_id not in seen_ids]
+    if stale_ids:
+        campaign_vectorstore.delete(ids=stale_ids)
+
+    print(f"✅ Campaign vector DB synced: {embedded} embedded, {len(stale_ids)} deleted, "
+          f"{campaign_vectorstore._collection.count()} documents.")
     return campaign_vectorstore
 
 
-
-
 def fetch_product_from_prompt(user_prompt: str):
     vs = setup_product_rag_chroma()
-    llm = ChatOpenAI(temperature=0.7, model_name=MODEL)
+    llm = get_chat_model(MODEL, temperature=0.7)
 
     retriever = vs.as_retriever(search_kwargs={"k": 5})
     qa_chain = RetrievalQA.from_chain_type(
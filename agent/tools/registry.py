@@ -0,0 +1,86 @@
+import importlib
+import threading
+
+
+class LazyTool:
+    """
+    Stand-in for a tool function or class that lives in a heavy module.
+    The module is imported the first time the tool is called (or an attribute is read),
+    so importing the graph doesn't pull in every tool's dependencies.
+    """
+
+    def __init__(self, module: str, name: str):
+        self.module = module
+        self.name = name
+        self._target = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = getattr(importlib.import_module(self.module), self.name)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self.resolve(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._target is not None else "not loaded"
+        return f"<LazyTool {self.module}.{self.name} ({state})>"
+
+
+# Where each tool used by the agent graph is implemented
+TOOL_MODULES = {
+    # Campaign launch
+    "analyze_product_audience": "agent.tools.analyze_product",
+    "create_campaign_from_analysis": "agent.tools.campaign",
+    "create_campaign_on_meta": "agent.tools.launch_campaign",
+    "ads_set_meta": "agent.tools.launch_campaign",
+    "resolve_audience_targeting": "agent.tools.launch_campaign",
+    "prepare_ad_creative": "agent.tools.launch_campaign",
+    "create_ad_creative": "agent.tools.launch_campaign",
+    "create_ad": "agent.tools.launch_campaign",
+    # Optimization
+    "generate_product_adcopy_and_headline_cta": "agent.tools.optimization.campaign_analytics",
+    "generate_campaign_summary": "agent.tools.optimization.campaign_analytics",
+    "fetch_campaign_metrics": "agent.tools.optimization.metric_fetcher",
+    "analyze_campaign_metrics": "agent.tools.optimization.metrics_analyzer",
+    "decide_campaign_action": "agent.tools.optimization.decision_maker",
+    "modify_campaign_from_decision": "agent.tools.optimization.campaign_modifier",
+    # Outreach
+    "EmailOutreachManager": "agent.tools.backdoor.email_compose.cold_outreach",
+    "EmailFollowUpManager": "agent.tools.backdoor.email_compose.outreach_followup",
+    "EmailWarmUpManager": "agent.tools.backdoor.email_compose.inbox_warmup",
+    "MockLead": "agent.tools.backdoor.email_compose.inbox_warmup",
+    "filter_valid_leads": "agent.tools.backdoor.email_compose.inbox_warmup",
+    "load_smtp_configs": "agent.tools.backdoor.email_compose.inbox_warmup",
+    "setup_django": "agent.tools.backdoor.email_compose.inbox_warmup",
+    # Scraping
+    "google_map_scraping": "agent.tools.backdoor.scraper",
+    "instagram_scraping": "agent.tools.backdoor.scraper",
+    # SEO
+    "SEOBlogGenerator": "agent.tools.backdoor.seo_generator.seo_blog_generator",
+    "fetch_sitemap_urls": "agent.tools.backdoor.seo_generator.check_index_status",
+    "check_indexed": "agent.tools.backdoor.seo_generator.check_index_status",
+    "send_alert": "agent.tools.backdoor.seo_generator.check_index_status",
+}
+
+_tools = {}
+_tools_lock = threading.Lock()
+
+
+def lazy_tool(name: str) -> LazyTool:
+    """Shared LazyTool for a registered tool name."""
+    with _tools_lock:
+        if name not in _tools:
+            _tools[name] = LazyTool(TOOL_MODULES[name], name)
+        return _tools[name]
+
+
+def loaded_tools() -> list:
+    """Names of registered tools whose module has been imported by a call so far."""
+    return sorted(name for name, tool in _tools.items() if tool._target is not None)
@@ -0,0 +1,149 @@
+import os
+import re
+import unicodedata
+from datetime import timedelta
+from typing import Dict, List
+
+from django.utils import timezone
+
+from agent import models as agent_models
+from agent.tools.meta_client import MetaBatch
+
+
+# How long a cached name -> ID mapping (or a cached "no match") is trusted
+TARGETING_CACHE_TTL_DAYS = int(os.getenv("TARGETING_CACHE_TTL_DAYS", "30"))
+
+# /search parameters per targeting kind
+SEARCH_PARAMS = {
+    "interest": {"type": "adinterest"},
+    "behavior": {"type": "adTargetingCategory", "class": "behaviors", "limit": 25},
+}
+
+targeting_cache_stats = {"hits": 0, "misses": 0}
+
+_NORMALIZED_NAME_LENGTH = agent_models.TargetingEntity._meta.get_field("normalized_name").max_length
+
+
+def normalize_targeting_name(name) -> str:
+    """
+    Cache key for a targeting name: case-folded with whitespace collapsed, keeping every letter
+    (accented and non-Latin names stay distinct). Empty for a blank name, which is never cached.
+    """
+    folded = unicodedata.normalize("NFKC", str(name or "")).casefold()
+    return re.sub(r"\s+", " ", folded).strip()[:_NORMALIZED_NAME_LENGTH]
+
+
+def _fresh_cutoff():
+    return timezone.now() - timedelta(days=TARGETING_CACHE_TTL_DAYS)
+
+
+def _store(entries: List[agent_models.TargetingEntity]):
+    if entries:
+        agent_models.TargetingEntity.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=["kind", "normalized_name"],
+            update_fields=["name", "meta_id", "fetched_at"],
+        )
+
+
+def _search_remote(missing: Dict[tuple, str]) -> Dict[tuple, agent_models.TargetingEntity]:
+    """One batch of /search calls for every (kind, normalized_name) not in the cache."""
+    keys = list(missing)
+    batch = MetaBatch()
+    for kind, normalized in keys:
+        batch.get("search", {"q": missing[(kind, normalized)], **SEARCH_PARAMS[kind]})
+
+    now = timezone.now()
+    found = {}
+    for (kind, normalized), response in zip(keys, batch.execute()):
+        if "error" in response:
+            # Not cached: a failed lookup says nothing about whether the name exists
+            print(f"⚠️ {kind.title()} lookup failed for '{missing[(kind, normalized)]}':", response["error"])
+            continue
+        data = response.get("data", [])
+        match = data[0] if data else {}
+        found[(kind, normalized)] = agent_models.TargetingEntity(
+            kind=kind,
+            normalized_name=normalized,
+            name=match.get("name") or missing[(kind, normalized)],
+            meta_id=match.get("id"),
+            fetched_at=now,
+        )
+    _store(list(found.values()))
+    return found
+
+
+def resolve_targeting(names_by_kind: Dict[str, List[str]]) -> Dict[str, List[Dict]]:
+    """
+    Maps targeting names to Meta IDs, e.g. {"interest": ["Yoga"], "behavior": [...]}
+    -> {"interest": [{"id": "...", "name": "Yoga"}], "behavior": [...]}.
+    Fresh cache rows answer locally; everything else goes out in a single batch request.
+    Names Meta has no match for are dropped, as are duplicate IDs.
+    """
+    wanted = {}
+    for kind, names in names_by_kind.items():
+        for name in names or []:
+            normalized = normalize_targeting_name(name)
+            if normalized:
+                wanted.setdefault((kind, normalized), name)
+
+    cached = {}
+    if wanted:
+        rows = agent_models.TargetingEntity.objects.filter(
+            kind__in={kind for kind, _ in wanted},
+            normalized_name__in={normalized for _, normalized in wanted},
+            fetched_at__gte=_fresh_cutoff(),
+        )
+        cached = {(row.kind, row.normalized_name): row for row in rows if (row.kind, row.normalized_name) in wanted}
+
+    missing = {key: name for key, name in wanted.items() if key not in cached}
+    targeting_cache_stats["hits"] += len(cached)
+    targeting_cache_stats["misses"] += len(missing)
+    if missing:
+        cached.update(_search_remote(missing))
+
+    results = {kind: [] for kind in names_by_kind}
+    seen = set()
+    for key in wanted:
+        entity = cached.get(key)
+        if entity is None or not entity.meta_id or (entity.kind, entity.meta_id) in seen:
+            continue
+        seen.add((entity.kind, entity.meta_id))
+        results[entity.kind].append({"id": entity.meta_id, "name": entity.name})
+    return results
+
+
+def warm_targeting_cache(campaigns=None) -> int:
+    """
+    Seeds the cache from the targeting of previously launched ad sets
+    (one batch of GET /{adset_id}?fields=targeting). Returns the number of entries stored.
+    """
+    if campaigns is None:
+        campaigns = agent_models.Campaign.objects.exclude(meta_adset_id__isnull=True).exclude(meta_adset_id="")
+    adset_ids = list(dict.fromkeys(campaign.meta_adset_id for campaign in campaigns if campaign.meta_adset_id))
+    if not adset_ids:
+        return 0
+
+    batch = MetaBatch()
+    for adset_id in adset_ids:
+        batch.get(adset_id, {"fields": "targeting"})
+
+    now = timezone.now()
+    entries = {}
+    for adset_id, response in zip(adset_ids, batch.execute()):
+        if "error" in response:
+            print(f"⚠️ Could not read targeting for ad set {adset_id}:", response["error"])
+            continue
+        targeting = response.get("targeting", {})
+        for kind, field in (("interest", "interests"), ("behavior", "behaviors")):
+            for item in targeting.get(field, []):
+                normalized = normalize_targeting_name(item.get("name"))
+                if normalized and item.get("id"):
+                    entries[(kind, normalized)] = agent_models.TargetingEntity(
+                        kind=kind, normalized_name=normalized, name=item["name"], meta_id=item["id"], fetched_at=now,
+                    )
+
+    _store(list(entries.values()))
+    print(f"🔥 Warmed targeting cache with {len(entries)} entries from {len(adset_ids)} ad sets")
+    return len(entries)
@@ -0,0 +1,60 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+from langchain_chroma import Chroma
+
+from agent.tools.embedding_cache import get_embeddings
+
+
+load_dotenv()
+db_name = os.getenv("CHROMA_DB_BASE_PATH", "./chroma_db")
+campaign_db_name = os.getenv("CHROMA_DB_BASE_PATH_CAMPAIGN", "./chroma_campaign_db")
+
+# One open Chroma handle per persist directory, shared by every request in the process
+_vectorstores = {}
+_lock = threading.Lock()
+
+
+def get_vectorstore(persist_directory: str, embedding_function=None) -> Chroma:
+    """
+    Returns the process-wide Chroma handle for a persist directory.
+    The collection is opened on first use and kept warm until invalidated.
+    """
+    key = os.path.abspath(persist_directory)
+    vectorstore = _vectorstores.get(key)
+    if vectorstore is not None:
+        return vectorstore
+
+    with _lock:
+        vectorstore = _vectorstores.get(key)
+        if vectorstore is None:
+            vectorstore = Chroma(
+                persist_directory=persist_directory,
+                embedding_function=embedding_function or get_embeddings(),
+            )
+            _vectorstores[key] = vectorstore
+    return vectorstore
+
+
+def get_product_vectorstore() -> Chroma:
+    """Product collection used by fetch_product_by_name and setup_product_rag_chroma."""
+    return get_vectorstore(db_name)
+
+
+def get_campaign_vectorstore() -> Chroma:
+    """Campaign collection used by fetch_campaign_by_name and embed_campaign."""
+    return get_vectorstore(campaign_db_name)
+
+
+def invalidate_vectorstores(persist_directory: str = None):
+    """
+    Drops cached handles so the next lookup reopens the collection.
+    Call after a re-embed that replaces the collection on disk.
+    Invalidates every handle when no directory is given.
+    """
+    with _lock:
+        if persist_directory is None:
+            _vectorstores.clear()
+        else:
+            _vectorstores.pop(os.path.abspath(persist_directory), None)
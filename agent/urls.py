@@ -12,6 +12,13 @@ urlpatterns = [
     path('user/register/', views.RegisterView.as_view()),
     path("email-open/<str:email>", views.email_open_view, name="email_open"),
     path("genesis-agent/", views.run_genesis_agent),
+    path("genesis-agent/stream/", views.stream_genesis_agent),
+    path("genesis-agent/intent-stats/", views.genesis_agent_intent_stats),
+    path("genesis-agent/jobs/<str:job_id>/", views.genesis_agent_job_status),
+    path("genesis-agent/jobs/<str:job_id>/stream/", views.stream_genesis_agent_job),
+    path("genesis-agent/runs/<str:run_id>/resume/", views.resume_genesis_agent),
+    path("products/<str:product_id>/history/", views.product_history),
+    path("analytics/campaigns/<str:group_by>/", views.campaign_analytics),
     path("healthz/", views.health_check),
 
     path("chat/", views.chatbot_page),
@@ -20,9 +20,20 @@ from rest_framework.response import Response
 from rest_framework import status
 from agent.tools.langgraph import campaign_agent_executor  # <-- Your compiled LangGraph
 from agent.tools.langgraph import CampaignAgentState  # TypedDict
+from agent.tools.agent_jobs import (
+    enqueue_agent_job, job_payload, prune_expired_checkpoints, resume_agent_job, resume_events, resume_point,
+    run_config, tail_agent_job, timing_trace,
+)
+from agent.tools.intent_router import route_command, intent_stats
+from agent.tools.llm_provider import llm_stats
+from agent.tools.llm_cache import llm_cache_stats
+from agent.tools.optimization.campaign_log import LOG_PAGE_SIZE, export_product_logs_jsonl, product_logs_page
+from agent.tools.optimization.performance_analytics import campaign_performance
 from .models import *
 from django.contrib.auth import get_user_model
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date
 
 import json
 import traceback  # ✅ Add this import at the top
@@ -53,8 +64,42 @@ def chatbot_page(request):
 
 
 
+TYPE_TO_PROMPT = {
+    "google_scrape": "Scrape Google Maps for {input}",
+    "instagram_scraping": "Scrape Instagram for {input}",
+    "send_email": "Send an email to {input}",
+    "send_outreach": "Send outreach to {input}",
+    "followup_outreach": "Send followup outreach to {input}",
+    "warmup_emails": "Warm up email inboxes",
+    "launch_campaign": "Launch a campaign for {input}",
+    "publish_blog_post": "Generate and deploy a blog post for {input}",
+    "check_indexing_status": "Check if SEO blog posts have been indexed by Google",
+}
+
+
+def build_initial_state(data):
+    """Returns (initial_state, error) for a chat request body."""
+    if "type" in data and "args" in data:
+        intent_type = data["type"]
+        input_text = data["args"].get("input", "")
+        prompt = TYPE_TO_PROMPT.get(intent_type)
+        nl_input = prompt.format(input=input_text) if prompt else input_text
+        # Known commands carry their intent already; intent_node then skips the LLM
+        routed = route_command(intent_type, data["args"]) or {}
+        return {"user_input": nl_input, **routed}, None
+
+    user_input = data.get("user_input", "")
+    if not user_input:
+        return None, "user_input is required"
+    return {"user_input": user_input}, None
+
+
 @csrf_exempt
 def run_genesis_agent(request):
+    """
+    Runs the agent graph. With "async": true in the body (or ?async=1) the run is queued
+    and a job id is returned right away; poll /api/genesis-agent/jobs/<job_id>/ for progress.
+    """
     print('---hitting---')
 
     if request.method != "POST":
@@ -64,35 +109,36 @@ def run_genesis_agent(request):
         # ✅ Parse JSON from request.body instead of request.data
         data = json.loads(request.body)
 
-        if "type" in data and "args" in data:
-            intent_type = data["type"]
-            args = data["args"]
-            input_text = args.get("input", "")
-
-            type_to_prompt = {
-                "google_scrape": f"Scrape Google Maps for {input_text}",
-                "instagram_scraping": f"Scrape Instagram for {input_text}",
-                "send_email": f"Send an email to {input_text}",
-                "send_outreach": f"Send outreach to {input_text}",
-                "followup_outreach": f"Send followup outreach to {input_text}",
-                "warmup_emails": f"Warm up email inboxes",
-                "launch_campaign": f"Launch a campaign for {input_text}",
-                "publish_blog_post": f"Generate and deploy a blog post for {input_text}",
-                "check_indexing_status": "Check if SEO blog posts have been indexed by Google"
-            }
-
-            nl_input = type_to_prompt.get(intent_type, input_text)
-            initial_state = {"user_input": nl_input}
-        else:
-            user_input = data.get("user_input", "")
-            if not user_input:
-                return JsonResponse({"error": "user_input is required"}, status=400)
-            initial_state = {"user_input": user_input}
-
-        result = campaign_agent_executor.invoke(initial_state)
+        initial_state, error = build_initial_state(data)
+        if error:
+            return JsonResponse({"error": error}, status=400)
+
+        if data.get("async") or request.GET.get("async") in ("1", "true"):
+            job = enqueue_agent_job(initial_state, user=request.user)
+            return JsonResponse({
+                "job_id": job.job_id,
+                "status": job.status,
+                "status_url": f"/api/genesis-agent/jobs/{job.job_id}/",
+            }, status=202)
+
+        config = run_config()
+        try:
+            result = campaign_agent_executor.invoke(initial_state, config)
+        except Exception as e:
+            # A node raised (e.g. a parallel launch branch); the steps that finished are checkpointed
+            if resume_point(config["configurable"]["thread_id"]) is None:
+                raise
+            result = {"error": str(e)}
+        prune_expired_checkpoints()
         final_result = result.get("result", "⚠️ No response generated")
 
-        return JsonResponse({"result": final_result}, status=200)
+        response = {"result": final_result, "run_id": config["configurable"]["thread_id"],
+                    "timings": timing_trace(result.get("timings", []))}
+        if result.get("error"):
+            # The run stopped at the failing node; POST to resume_url to continue from there
+            response["error"] = result["error"]
+            response["resume_url"] = f"/api/genesis-agent/runs/{response['run_id']}/resume/"
+        return JsonResponse(response, status=200)
 
     except json.JSONDecodeError as e:
         print(f"❌ JSON Parse Error: {e}")
@@ -104,9 +150,174 @@ def run_genesis_agent(request):
         print(traceback.format_exc())  # ✅ Now this will work
         return JsonResponse({"error": str(e)}, status=500)
 
+
+# Seconds without an event before a keep-alive is sent, so proxies don't drop idle streams
+STREAM_HEARTBEAT_SECONDS = 15
+
+
+def _render_stream(request, events):
+    """Streams events as server-sent events, or JSON lines with ?format=jsonl / Accept: application/x-ndjson."""
+    jsonl = request.GET.get("format") == "jsonl" or "application/x-ndjson" in request.headers.get("Accept", "")
+
+    def render(event):
+        if event is None:
+            return '{"event": "heartbeat"}\n' if jsonl else ": keep-alive\n\n"
+        payload = json.dumps(event, cls=DjangoJSONEncoder)
+        return f"{payload}\n" if jsonl else f"event: {event['event']}\ndata: {payload}\n\n"
+
+    response = StreamingHttpResponse(
+        (render(event) for event in events), content_type="application/x-ndjson" if jsonl else "text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: don't buffer the stream
+    return response
+
+
+@csrf_exempt
+def stream_genesis_agent(request):
+    """
+    Same input as /api/genesis-agent/, but queued as a job and streamed while it runs:
+    node transitions, LLM tokens and the final result.
+    The run belongs to the job pool, so a dropped connection doesn't stop it; follow it again with
+    /api/genesis-agent/jobs/<job_id>/stream/ or poll the status URL from the start event.
+    Server-sent events by default; ?format=jsonl (or Accept: application/x-ndjson) for JSON lines.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON in request body"}, status=400)
+
+    initial_state, error = build_initial_state(data)
+    if error:
+        return JsonResponse({"error": error}, status=400)
+
+    job = enqueue_agent_job(initial_state, user=request.user, tokens=True)
+
+    def events():
+        # First bytes go out immediately, before any node has run
+        yield {"event": "start", "job_id": job.job_id, "status_url": f"/api/genesis-agent/jobs/{job.job_id}/"}
+        yield from tail_agent_job(job.job_id, heartbeat_seconds=STREAM_HEARTBEAT_SECONDS)
+
+    return _render_stream(request, events())
+
+
+def stream_genesis_agent_job(request, job_id):
+    """Streams a queued job's saved steps and its result (no LLM tokens); finished jobs send only what they saved."""
+    if not AgentJob.objects.filter(job_id=job_id).exists():
+        return JsonResponse({"error": "Job not found"}, status=404)
+    return _render_stream(request, tail_agent_job(job_id, heartbeat_seconds=STREAM_HEARTBEAT_SECONDS))
+
+
+def genesis_agent_job_status(request, job_id):
+    """Job status plus the node results saved so far (?after=<step id> returns only newer steps)."""
+    try:
+        job = AgentJob.objects.get(job_id=job_id)
+    except AgentJob.DoesNotExist:
+        return JsonResponse({"error": "Job not found"}, status=404)
+
+    after = request.GET.get("after")
+    return JsonResponse(job_payload(job, int(after) if after and after.isdigit() else None))
+
+@csrf_exempt
+def resume_genesis_agent(request, run_id):
+    """
+    Continues a failed run from the node that failed, reusing the product, audience and campaign
+    state checkpointed before it. Optional body {"state": {...}} overrides state values first.
+    run_id is the run_id of a /api/genesis-agent/ response or a job id; jobs are requeued (202).
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    try:
+        data = json.loads(request.body or b"{}")
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON in request body"}, status=400)
+    updates = data.get("state") or None
+
+    try:
+        job = AgentJob.objects.filter(job_id=run_id).first()
+        if job:
+            node = resume_agent_job(job, updates)
+            return JsonResponse({
+                "job_id": job.job_id,
+                "status": "queued",
+                "resumed_from": node,
+                "status_url": f"/api/genesis-agent/jobs/{job.job_id}/",
+            }, status=202)
+
+        response = {"run_id": run_id}
+        for event in resume_events(run_id, updates):
+            if event["event"] == "resume":
+                response["resumed_from"] = event["node"]
+            elif event["event"] == "result":
+                response.update(result=event["result"], error=event["error"], timings=event["timings"])
+        return JsonResponse(response, status=200)
+
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=409)
+    except Exception as e:
+        print(f"❌ Resume Error: {e}")
+        print(traceback.format_exc())
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+def product_history(request, product_id):
+    """
+    A product's optimization history, newest first: JSON pages (?limit=, then ?cursor=<next_cursor>),
+    or with ?format=jsonl the whole history streamed as JSON lines.
+    """
+    try:
+        product = Product.objects.only("id").get(product_id=product_id)
+    except Product.DoesNotExist:
+        return JsonResponse({"error": "Product not found"}, status=404)
+
+    if request.GET.get("format") == "jsonl" or "application/x-ndjson" in request.headers.get("Accept", ""):
+        response = StreamingHttpResponse(export_product_logs_jsonl(product.id), content_type="application/x-ndjson")
+        response["Content-Disposition"] = f'attachment; filename="{product_id}-history.jsonl"'
+        return response
+
+    try:
+        limit = min(int(request.GET.get("limit", 100)), LOG_PAGE_SIZE)
+        page = product_logs_page(product.id, request.GET.get("cursor"), limit=max(limit, 1))
+    except ValueError:
+        return JsonResponse({"error": "Invalid limit or cursor"}, status=400)
+    return JsonResponse(page)
+
+
+def _date_param(request, name):
+    value = request.GET.get(name)
+    if not value:
+        return None
+    day = parse_date(value)  # raises ValueError itself on an impossible date
+    if day is None:
+        raise ValueError(f"{name} must be a YYYY-MM-DD date")
+    return day
+
+
+def campaign_analytics(request, group_by):
+    """
+    Campaign spend, revenue, ROAS, CTR and CVR per product, platform or day (?since=&until= as
+    YYYY-MM-DD, ?product=<product_id>), aggregated in the database and cached until the next metric write.
+    """
+    try:
+        report = campaign_performance(group_by, _date_param(request, "since"), _date_param(request, "until"),
+                                      product_id=request.GET.get("product"))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(report)
+
+
 def health_check(request):
     return JsonResponse({"status": "ok"})
 
+
+def genesis_agent_intent_stats(request):
+    """How intent_node resolved requests in this worker process (structured / keyword / LLM), plus LLM usage and cache hits."""
+    return JsonResponse({**intent_stats(), "llm": llm_stats(), "llm_cache": llm_cache_stats()})
+
 def email_open_view(request, email):
     print("📩 Tracking pixel hit!")
     print(f"📧 Raw email from URL: {email}")
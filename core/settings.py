@@ -32,6 +32,9 @@ API_KEY= env('API_KEY')
 API_SECRET= env('API_SECRET')
 SITE_URL = os.getenv("SITE_URL", "http://localhost:8000")
 
+# Re-embed a product into the vector DB whenever it is saved or deleted
+PRODUCT_EMBEDDING_AUTOSYNC = os.getenv("PRODUCT_EMBEDDING_AUTOSYNC", "False") == "True"
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -19,6 +19,7 @@ from agent.tools.database_update import update_campaign_fields
 # run_rag.py
 #from agent.tools.langchain import get_genesis_agent
 from agent.tools.langgraph import campaign_agent_executor
+from agent.tools.agent_jobs import run_config
 
 from agent.tools.optimization.scheduler import run_optimization
 from agent.tools.optimization.metric_fetcher import fetch_campaign_metrics
@@ -60,7 +61,7 @@ if __name__ == "__main__":
             print("👋 Goodbye!")
             break
 
-        state = campaign_agent_executor.invoke({"user_input": user_input})
+        state = campaign_agent_executor.invoke({"user_input": user_input}, run_config())
         print("\n🤖 Final Output:")
         if "error" in state:
             print("❌ Error:", state["error"])